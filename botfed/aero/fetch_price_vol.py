@@ -1,11 +1,11 @@
 import pandas as pd
 import numpy as np
 
-import requests
 import pandas as pd
 import numpy as np
 from ..coingecko.get_price_history import get_price_history
 from ..binance.universe import coin_to_binance_contract
+from ..core.http_client import get_client
 from .vars import STABLECOINS
 
 
@@ -34,7 +34,7 @@ def get_perp_price_series(asset, interval="1d", limit=365):
     url = "https://fapi.binance.com/fapi/v1/klines"
     params = {"symbol": symbol, "interval": interval, "limit": limit}
 
-    resp = requests.get(url, params=params)
+    resp = get_client().get(url, params=params, weight=5)
     resp.raise_for_status()
     data = resp.json()
 
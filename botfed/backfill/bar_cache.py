@@ -0,0 +1,361 @@
+"""
+Memory-mapped cache of daily / hourly bars for the whole universe.
+
+Research runs keep re-parsing the same monthly CSVs
+(../data/binance_ohlcv/spot/1d/{SYM_USDT}/{YYYYMM}.csv). The cache keeps
+one raw (time x coin) array per field on a regular time grid,
+
+    {root}/{name}/meta.json            grid, coins, generation, source files
+    {root}/{name}/{field}.{gen}.bin    float64, row = bar, column = coin
+
+and open_cache() maps them read-only with np.memmap: opening is a few
+syscalls, slices are views, and every process reading the cache shares the
+same page cache.
+
+build_cache() is incremental: source files are checked by size and mtime
+against meta.json and only new or changed files are decoded. Coins are
+only ever appended, so column numbers stay valid. Every build writes a new
+generation of arrays: the old ones are copied over as raw memory (into a
+bigger grid if needed, without re-parsing anything), the rows a changed
+file covered before are cleared, the decoded files are written, and then
+meta.json is renamed into place pointing at the new generation. Readers
+that have the old generation mapped keep it until they reopen, and never
+see a half-updated array. A file that disappeared from the source
+triggers a full rebuild. BarCache.is_stale() runs the same check without
+building.
+
+Sources: csv_source() for the CSV tree, store_source() for an OHLCVStore.
+
+    python -m botfed.backfill.bar_cache --interval 1d
+"""
+
+import argparse
+import json
+import os
+from typing import Callable, Dict, List, Tuple
+
+import fastparquet
+import numpy as np
+import pandas as pd
+
+from ..logger import get_logger
+from .ohlcv_store import OHLCVStore, interval_ms, to_ms
+
+logger = get_logger(__name__)
+
+ROOT_DIR = "../data/bar_cache"
+SPOT_DIR = "../data/binance_ohlcv/spot"
+FIELDS = ("open", "high", "low", "close", "volume", "quote_volume")
+DTYPE = np.float64
+META_NAME = "meta.json"
+
+
+class BarSource:
+    """Files per coin and how to decode one into arrays of open_time (ms)
+    and FIELDS. Plain arrays rather than a DataFrame: sources are many small
+    files and per-frame overhead would dominate."""
+
+    def __init__(
+        self,
+        files: Callable[[], List[Tuple[str, str]]],
+        read: Callable[[str], Dict[str, np.ndarray]],
+    ):
+        self.files = files
+        self.read = read
+
+
+def _time_ms(col: pd.Series) -> np.ndarray:
+    if pd.api.types.is_numeric_dtype(col):
+        return col.to_numpy(np.int64)
+    ts = pd.to_datetime(col, utc=True, format="ISO8601")
+    return ts.to_numpy("datetime64[ms]").astype(np.int64)
+
+
+def read_bar_csv(fpath: str) -> Dict[str, np.ndarray]:
+    """Monthly spot CSV (fetch_klines layout, open_time as datetime or ms)
+    or the spot_daily layout with a timestamp column."""
+    wanted = {"open_time", "timestamp", "date", *FIELDS}
+    df = pd.read_csv(fpath, usecols=lambda c: c in wanted)
+    time_col = next(c for c in ("open_time", "timestamp", "date") if c in df)
+    out = {"open_time": _time_ms(df[time_col])}
+    for field in FIELDS:
+        out[field] = df[field].to_numpy(DTYPE) if field in df else np.nan
+    return out
+
+
+def csv_source(root_dir: str = SPOT_DIR, interval: str = "1d") -> BarSource:
+    base = os.path.join(root_dir, interval)
+
+    def files():
+        out = []
+        for coin in sorted(os.listdir(base)):
+            cdir = os.path.join(base, coin)
+            if os.path.isdir(cdir):
+                out += [
+                    (coin, os.path.join(cdir, f))
+                    for f in sorted(os.listdir(cdir))
+                    if f.endswith(".csv")
+                ]
+        return out
+
+    return BarSource(files, read_bar_csv)
+
+
+def store_source(store: OHLCVStore) -> BarSource:
+    def files():
+        return [
+            (ticker, store.path(ticker, month))
+            for ticker in store.tickers()
+            for month in store.months(ticker)
+        ]
+
+    def read(fpath):
+        df = fastparquet.ParquetFile(fpath).to_pandas(
+            columns=["open_time", "open", "high", "low", "close", "volume"]
+            + ["quote_asset_volume"]
+        )
+        df = df.rename(columns={"quote_asset_volume": "quote_volume"})
+        return {col: df[col].to_numpy() for col in df}
+
+    return BarSource(files, read)
+
+
+def _array_path(path: str, field: str, gen: int) -> str:
+    return os.path.join(path, f"{field}.{gen}.bin")
+
+
+def _stat(fpath: str) -> List[int]:
+    st = os.stat(fpath)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class BarCache:
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_NAME)) as f:
+            self.meta = json.load(f)
+        self.coins: List[str] = self.meta["coins"]
+        self.col = {coin: j for j, coin in enumerate(self.coins)}
+        self.step_ms = self.meta["step_ms"]
+        self.t0_ms = self.meta["t0_ms"]
+        self.n_times = self.meta["n_times"]
+        shape = (self.n_times, len(self.coins))
+        self.arrays: Dict[str, np.memmap] = {}
+        if self.n_times and self.coins:
+            self.arrays = {
+                field: np.memmap(
+                    _array_path(path, field, self.meta["gen"]),
+                    DTYPE,
+                    mode="r",
+                    shape=shape,
+                )
+                for field in self.meta["fields"]
+            }
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        return pd.date_range(
+            pd.Timestamp(self.t0_ms, unit="ms", tz="UTC"),
+            periods=self.n_times,
+            freq=pd.Timedelta(milliseconds=self.step_ms),
+        )
+
+    def rows(self, start=None, end=None) -> slice:
+        """Row slice of bars with start <= open_time < end."""
+        lo = 0 if start is None else (to_ms(start) - self.t0_ms) // self.step_ms
+        hi = (
+            self.n_times
+            if end is None
+            else -(-(to_ms(end) - self.t0_ms) // self.step_ms)
+        )
+        return slice(
+            int(np.clip(lo, 0, self.n_times)), int(np.clip(hi, 0, self.n_times))
+        )
+
+    def get(self, field: str, start=None, end=None, coins=None) -> np.ndarray:
+        """(time, coin) array; a view of the mapped file unless coins picks
+        columns."""
+        arr = self.arrays[field][self.rows(start, end)]
+        if coins is not None:
+            arr = arr[:, [self.col[c] for c in coins]]
+        return arr
+
+    def frame(self, field: str, start=None, end=None, coins=None) -> pd.DataFrame:
+        rows = self.rows(start, end)
+        return pd.DataFrame(
+            self.get(field, start, end, coins),
+            index=self.index[rows],
+            columns=coins if coins is not None else self.coins,
+            copy=False,
+        )
+
+    def is_stale(self, source: BarSource) -> bool:
+        """Whether any source file was added, removed or changed since the
+        cache was built."""
+        files = source.files()
+        if len(files) != len(self.meta["sources"]):
+            return True
+        return any(
+            self.meta["sources"].get(fpath, [None])[:2] != _stat(fpath)
+            for _, fpath in files
+        )
+
+
+def open_cache(name: str = "spot_1d", root: str = ROOT_DIR) -> BarCache:
+    return BarCache(os.path.join(root, name))
+
+
+def _write_meta(path: str, meta: Dict):
+    tmp = os.path.join(path, META_NAME + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, META_NAME))
+
+
+def _empty_meta(interval: str, step_ms: int) -> Dict:
+    return {
+        "interval": interval,
+        "step_ms": step_ms,
+        "t0_ms": None,
+        "n_times": 0,
+        "coins": [],
+        "fields": list(FIELDS),
+        "gen": 0,
+        # fpath -> [size, mtime_ns, coin, first open_time, last open_time]
+        "sources": {},
+    }
+
+
+def build_cache(
+    source: BarSource,
+    name: str = "spot_1d",
+    interval: str = "1d",
+    root: str = ROOT_DIR,
+    full: bool = False,
+) -> BarCache:
+    """Bring the cache up to date with source, decoding only new or changed
+    files (everything with full, or when a source file is gone)."""
+    path = os.path.join(root, name)
+    os.makedirs(path, exist_ok=True)
+    step_ms = interval_ms(interval)
+    meta = None
+    if not full and os.path.exists(os.path.join(path, META_NAME)):
+        with open(os.path.join(path, META_NAME)) as f:
+            meta = json.load(f)
+        if (
+            meta["step_ms"] != step_ms
+            or meta["fields"] != list(FIELDS)
+            or "gen" not in meta
+        ):
+            meta = None
+    files = source.files()
+    present = {fpath for _, fpath in files}
+    if meta is not None and any(f not in present for f in meta["sources"]):
+        logger.info(f"BarCache {name}: source files removed, full rebuild")
+        meta = None
+    if meta is None:
+        old_gen = None
+        if os.path.exists(os.path.join(path, META_NAME)):
+            with open(os.path.join(path, META_NAME)) as f:
+                old_gen = json.load(f).get("gen")
+        meta = _empty_meta(interval, step_ms)
+        # a rebuild still gets a new generation, readers keep the old one
+        meta["gen"] = 0 if old_gen is None else old_gen + 1
+        fresh = True
+    else:
+        fresh = False
+
+    changed = [
+        (coin, fpath, _stat(fpath))
+        for coin, fpath in files
+        if meta["sources"].get(fpath, [None])[:2] != _stat(fpath)
+    ]
+    if not changed and not fresh:
+        logger.info(f"BarCache {name}: up to date")
+        return BarCache(path)
+    decoded = []
+    for coin, fpath, stat in changed:
+        try:
+            bars = source.read(fpath)
+        except Exception as e:
+            logger.warning(f"BarCache {name}: skipping {fpath}: {e}")
+            continue
+        decoded.append((coin, fpath, stat, bars))
+
+    # grid covering the old one and the new data, coins appended
+    old_t0, old_n, old_gen = meta["t0_ms"], meta["n_times"], meta["gen"]
+    old_coins = list(meta["coins"])
+    times = [d["open_time"] for _, _, _, d in decoded if len(d["open_time"])]
+    lo = [t.min() // step_ms * step_ms for t in times]
+    hi = [t.max() // step_ms * step_ms + step_ms for t in times]
+    if old_n:
+        lo.append(old_t0)
+        hi.append(old_t0 + old_n * step_ms)
+    t0 = int(min(lo)) if lo else 0
+    n_times = int((max(hi) - t0) // step_ms) if hi else 0
+    coins = old_coins + sorted({coin for coin, _, _, _ in decoded} - set(old_coins))
+    col = {coin: j for j, coin in enumerate(coins)}
+    shape = (n_times, len(coins))
+    gen = old_gen if fresh else old_gen + 1
+
+    arrays = {}
+    if n_times and coins:
+        for field in FIELDS:
+            new = np.memmap(_array_path(path, field, gen), DTYPE, "w+", shape=shape)
+            new[:] = np.nan
+            if not fresh and old_n and old_coins:
+                old = np.memmap(
+                    _array_path(path, field, old_gen),
+                    DTYPE,
+                    mode="r",
+                    shape=(old_n, len(old_coins)),
+                )
+                off = (old_t0 - t0) // step_ms
+                new[off : off + old_n, : len(old_coins)] = old
+                del old
+            arrays[field] = new
+
+    for coin, fpath, stat, bars in decoded:
+        # rows the previous version of the file filled, it may have shrunk
+        prev = meta["sources"].get(fpath)
+        if prev is not None and len(prev) == 5:
+            rows = slice((prev[3] - t0) // step_ms, (prev[4] - t0) // step_ms + 1)
+            for arr in arrays.values():
+                arr[rows, col[coin]] = np.nan
+        t = bars["open_time"]
+        idx = (t - t0) // step_ms
+        for field in FIELDS:
+            arrays[field][idx, col[coin]] = bars[field]
+        span = [int(t.min()), int(t.max())] if len(t) else [t0, t0 - step_ms]
+        meta["sources"][fpath] = stat + [coin] + span
+    for arr in arrays.values():
+        arr.flush()
+    arrays.clear()
+    meta.update(t0_ms=t0, n_times=n_times, coins=coins, gen=gen)
+    _write_meta(path, meta)
+    # old generations: open readers keep their mapping, the names go
+    for fname in os.listdir(path):
+        if fname.endswith(".bin") and not fname.endswith(f".{gen}.bin"):
+            os.remove(os.path.join(path, fname))
+    logger.info(
+        f"BarCache {name}: decoded {len(decoded)} files, "
+        f"{n_times} bars x {len(coins)} coins"
+    )
+    return BarCache(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv-root", default=SPOT_DIR)
+    parser.add_argument("--root", default=ROOT_DIR)
+    parser.add_argument("--interval", default="1d", choices=["1d", "1h"])
+    parser.add_argument("--full", action="store_true")
+    args = parser.parse_args()
+    build_cache(
+        csv_source(args.csv_root, args.interval),
+        name=f"spot_{args.interval}",
+        interval=args.interval,
+        root=args.root,
+        full=args.full,
+    )
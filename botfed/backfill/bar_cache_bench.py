@@ -0,0 +1,114 @@
+"""
+Loading a universe of daily bars from the monthly spot CSVs vs from the
+memory-mapped BarCache, on a synthetic tree in a temp dir. Also times the
+first build, an incremental rebuild after one file changed and the
+staleness check.
+
+    python -m botfed.backfill.bar_cache_bench --coins 300 --months 36
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from .bar_cache import build_cache, csv_source, open_cache
+
+
+def write_spot_tree(root, coins, months, interval="1d", seed=0):
+    """Monthly CSVs in the fetch_klines layout."""
+    rng = np.random.default_rng(seed)
+    freq = {"1d": "1D", "1h": "1h"}[interval]
+    start = pd.Timestamp("2022-01-01")
+    for coin in coins:
+        cdir = os.path.join(root, interval, coin)
+        os.makedirs(cdir, exist_ok=True)
+        for m in range(months):
+            mstart = start + pd.DateOffset(months=m)
+            open_time = pd.date_range(
+                mstart, mstart + pd.DateOffset(months=1), freq=freq
+            )
+            open_time = open_time[:-1]
+            close = 10 * np.exp(np.cumsum(rng.normal(0, 0.03, len(open_time))))
+            step = open_time[1] - open_time[0]
+            df = pd.DataFrame(
+                {
+                    "open_time": open_time,
+                    "open": close,
+                    "high": close * 1.02,
+                    "low": close * 0.98,
+                    "close": close,
+                    "volume": rng.uniform(1e3, 1e6, len(close)),
+                    "close_time": open_time + step - pd.Timedelta(milliseconds=1),
+                    "quote_volume": rng.uniform(1e4, 1e7, len(close)),
+                    "trades": rng.integers(100, 10000, len(close)),
+                }
+            )
+            df["date"] = df["close_time"].dt.tz_localize("UTC")
+            df["twap"] = df[["open", "high", "low", "close"]].mean(axis=1)
+            df.to_csv(os.path.join(cdir, f"{mstart.strftime('%Y%m')}.csv"), index=False)
+
+
+def load_csv_universe(root, interval) -> pd.DataFrame:
+    """What the research scripts do: read every monthly CSV per coin."""
+    base = os.path.join(root, interval)
+    closes = {}
+    for coin in sorted(os.listdir(base)):
+        cdir = os.path.join(base, coin)
+        df = pd.concat(
+            [pd.read_csv(os.path.join(cdir, f)) for f in sorted(os.listdir(cdir))]
+        )
+        df["date"] = pd.to_datetime(df["date"], utc=True, format="ISO8601")
+        closes[coin] = df.set_index("date")["close"]
+    return pd.concat(closes, axis=1)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--coins", type=int, default=300)
+    parser.add_argument("--months", type=int, default=36)
+    parser.add_argument("--interval", default="1d", choices=["1d", "1h"])
+    args = parser.parse_args()
+    coins = [f"C{i}_USDT" for i in range(args.coins)]
+    with tempfile.TemporaryDirectory() as tmp:
+        src_root = os.path.join(tmp, "spot")
+        cache_root = os.path.join(tmp, "cache")
+        write_spot_tree(src_root, coins, args.months, args.interval)
+        source = csv_source(src_root, args.interval)
+
+        ref, t_csv = timed(lambda: load_csv_universe(src_root, args.interval))
+        _, t_build = timed(
+            lambda: build_cache(source, "bench", args.interval, cache_root)
+        )
+        # one month of one coin rewritten
+        touched = os.path.join(src_root, args.interval, coins[0], "202201.csv")
+        os.utime(touched)
+        cache, t_stale = timed(lambda: open_cache("bench", cache_root).is_stale(source))
+        assert cache
+        _, t_incr = timed(
+            lambda: build_cache(source, "bench", args.interval, cache_root)
+        )
+        frame, t_open = timed(lambda: open_cache("bench", cache_root).frame("close"))
+        np.testing.assert_allclose(frame.to_numpy(), ref[frame.columns].to_numpy())
+
+        print(f"{args.coins} coins x {args.months} months of {args.interval} bars")
+        print(f"csv load + align          {t_csv:8.3f}s")
+        print(f"cache first build         {t_build:8.3f}s")
+        print(f"staleness check           {t_stale:8.3f}s")
+        print(f"incremental (1 file)      {t_incr:8.3f}s")
+        print(
+            f"open cache + close frame  {t_open:8.4f}s ({t_csv / t_open:.0f}x vs csv)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+"""
+Bulk import of the Binance public data archives (data.binance.vision).
+
+Years of 1m klines or aggTrades come as daily / monthly zip files, which is
+orders of magnitude faster than paging through the REST endpoints. The
+source is a local mirror or a URL prefix with the same layout:
+
+    {source}/data/futures/um/{daily,monthly}/klines/BTCUSDT/1m/BTCUSDT-1m-2024-01-01.zip
+    {source}/data/futures/um/{daily,monthly}/aggTrades/BTCUSDT/BTCUSDT-aggTrades-2024-01.zip
+    {source}/data/spot/...
+
+each zip next to a .CHECKSUM file ("<sha256>  <name>"). Planning picks
+monthly archives for whole past months and daily ones for the rest, and
+leaves out partitions the store already holds (days with a full set of
+klines in the OHLCVStore, days with a file in the TradeStore).
+
+Work is grouped per (ticker, month) and the groups run in worker processes,
+so no two processes write the same Parquet file. A worker downloads (URL
+source) or opens (local source) each archive, checks its sha256, then reads
+the CSV member as a stream, without extracting it: klines are merged into
+the month's OHLCVStore file once, aggTrades are written day by day as
+chunks come in. Spot archives without a header row and with microsecond
+timestamps (2025 on) are handled too.
+
+    python -m botfed.backfill.binance_archive ~/binance_mirror --tickers BTCUSDT,ETHUSDT \\
+        --sdate 20230101 --edate 20241231 --kind klines --interval 1m
+"""
+
+import argparse
+import concurrent.futures
+import datetime as dt
+import hashlib
+import multiprocessing
+import os
+import shutil
+import zipfile
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..core.http_client import get_client
+from ..logger import get_logger
+from .ohlcv_store import (
+    COLUMNS as KLINE_COLUMNS,
+    MS_PER_DAY,
+    OHLCVStore,
+    ROOT_DIR as OHLCV_ROOT_DIR,
+    interval_ms,
+)
+from .trade_store import COLUMNS as TRADE_COLUMNS
+from .trade_store import ROOT_DIR as TRADE_ROOT_DIR
+from .trade_store import TradeStore, day_key
+
+logger = get_logger(__name__)
+
+MARKET_PATHS = {"perps": "data/futures/um", "spot": "data/spot"}
+KINDS = ("klines", "aggTrades")
+CHUNK_ROWS = 1_000_000
+# ms timestamps are 13 digits, spot archives switched to 16 digit us
+US_THRESHOLD = 10**14
+
+
+class ChecksumError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Archive:
+    ticker: str
+    # YYYY-MM-DD for daily, YYYY-MM for monthly archives
+    date: str
+    rel_path: str
+
+    @property
+    def month(self) -> str:
+        return self.date[:7]
+
+    @property
+    def days(self) -> List[str]:
+        if len(self.date) == 10:
+            return [self.date]
+        start = dt.date.fromisoformat(self.date + "-01")
+        end = (start + dt.timedelta(days=32)).replace(day=1)
+        return [
+            (start + dt.timedelta(days=i)).isoformat()
+            for i in range((end - start).days)
+        ]
+
+
+def archive_path(market, kind, period, ticker, date, interval="1m") -> str:
+    base = f"{MARKET_PATHS[market]}/{period}/{kind}/{ticker}"
+    if kind == "klines":
+        return f"{base}/{interval}/{ticker}-{interval}-{date}.zip"
+    return f"{base}/{ticker}-{kind}-{date}.zip"
+
+
+def plan_archives(
+    tickers: List[str],
+    sdate: dt.date,
+    edate: dt.date,
+    market="perps",
+    kind="klines",
+    interval="1m",
+    today: dt.date = None,
+) -> List[Archive]:
+    """Archives covering [sdate, edate]: monthly for whole months that are
+    over, daily for the rest (monthly files appear after the month ends)."""
+    today = today or dt.datetime.now(dt.timezone.utc).date()
+    out = []
+    month = sdate.replace(day=1)
+    while month <= edate:
+        next_month = (month + dt.timedelta(days=32)).replace(day=1)
+        whole = sdate <= month and next_month - dt.timedelta(days=1) <= edate
+        for ticker in tickers:
+            if whole and next_month <= today.replace(day=1):
+                date = month.strftime("%Y-%m")
+                out.append(
+                    Archive(
+                        ticker,
+                        date,
+                        archive_path(market, kind, "monthly", ticker, date, interval),
+                    )
+                )
+                continue
+            day = max(month, sdate)
+            while day < next_month and day <= edate:
+                date = day.isoformat()
+                out.append(
+                    Archive(
+                        ticker,
+                        date,
+                        archive_path(market, kind, "daily", ticker, date, interval),
+                    )
+                )
+                day += dt.timedelta(days=1)
+        month = next_month
+    return out
+
+
+def local_tickers(source: str, market="perps", kind="klines") -> List[str]:
+    """Tickers present in a local mirror, daily or monthly."""
+    tickers = set()
+    for period in ("daily", "monthly"):
+        kdir = os.path.join(source, MARKET_PATHS[market], period, kind)
+        if os.path.isdir(kdir):
+            tickers.update(os.listdir(kdir))
+    return sorted(tickers)
+
+
+# skipping what the store holds
+
+
+def held_days(
+    market: str, kind: str, interval: str, store_root: str, ticker: str, sdate, edate
+) -> set:
+    """Days of [sdate, edate] the store already has in full."""
+    if kind == "aggTrades":
+        store = TradeStore(store_root, f"binance_{market}")
+        return set(store.days(ticker))
+    store = OHLCVStore(store_root, f"binance_{market}", interval)
+    end = edate + dt.timedelta(days=1)
+    df = store.read_ticker(ticker, sdate, end, columns=["open_time"])
+    if df is None:
+        return set()
+    per_day = MS_PER_DAY // interval_ms(interval)
+    counts = (df["open_time"].to_numpy() // MS_PER_DAY).astype(np.int64)
+    days, n = np.unique(counts, return_counts=True)
+    return {
+        day_key(int(d) * MS_PER_DAY) for d, k in zip(days, n) if k >= max(1, per_day)
+    }
+
+
+# reading one archive
+
+
+def _sha256(fpath: str) -> str:
+    h = hashlib.sha256()
+    with open(fpath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _parse_checksum(text: str) -> str:
+    return text.split()[0].strip().lower()
+
+
+def fetch_archive(
+    source: str, rel_path: str, cache_dir: str, require_checksum: bool = True
+) -> Optional[str]:
+    """Local path of a verified archive, None if the source doesn't have it.
+    URL sources are downloaded into cache_dir, hashing while streaming."""
+    if source.startswith(("http://", "https://")):
+        url = f"{source.rstrip('/')}/{rel_path}"
+        client = get_client()
+        resp = client.get(url, stream=True)
+        if resp.status_code == 404:
+            resp.close()
+            return None
+        resp.raise_for_status()
+        fpath = os.path.join(cache_dir, rel_path)
+        os.makedirs(os.path.dirname(fpath), exist_ok=True)
+        h = hashlib.sha256()
+        with open(fpath + ".tmp", "wb") as f:
+            for chunk in resp.iter_content(1 << 20):
+                h.update(chunk)
+                f.write(chunk)
+        os.replace(fpath + ".tmp", fpath)
+        digest = h.hexdigest()
+        resp = client.get(url + ".CHECKSUM")
+        expected = _parse_checksum(resp.text) if resp.status_code == 200 else None
+    else:
+        fpath = os.path.join(source, rel_path)
+        if not os.path.exists(fpath):
+            return None
+        digest = _sha256(fpath)
+        expected = None
+        if os.path.exists(fpath + ".CHECKSUM"):
+            with open(fpath + ".CHECKSUM") as f:
+                expected = _parse_checksum(f.read())
+    if expected is None:
+        if require_checksum:
+            raise ChecksumError(f"{rel_path}: no CHECKSUM")
+        logger.warning(f"{rel_path}: no CHECKSUM, not verified")
+    elif digest != expected:
+        if fpath.startswith(cache_dir or "\0"):
+            os.remove(fpath)
+        raise ChecksumError(f"{rel_path}: sha256 {digest} != {expected}")
+    return fpath
+
+
+def read_archive(fpath: str, names: List[str], chunksize=None) -> Iterator:
+    """DataFrames of the CSV in a zip, streamed from the archive. Archives
+    with and without a header row are both read by position."""
+    with zipfile.ZipFile(fpath) as zf:
+        member = zf.namelist()[0]
+        with zf.open(member) as f:
+            has_header = not f.readline()[:1].isdigit()
+        with zf.open(member) as f:
+            reader = pd.read_csv(
+                f,
+                header=None,
+                names=names,
+                usecols=range(len(names)),
+                skiprows=int(has_header),
+                chunksize=chunksize,
+            )
+            if chunksize is None:
+                yield reader
+            else:
+                yield from reader
+
+
+def _fix_ts(df: pd.DataFrame, ts_columns: List[str]) -> pd.DataFrame:
+    for col in ts_columns:
+        if len(df) and df[col].iloc[0] > US_THRESHOLD:
+            df[col] = df[col] // 1000
+    return df
+
+
+# workers
+
+
+@dataclass
+class ImportJob:
+    source: str
+    market: str
+    kind: str
+    interval: str
+    store_root: str
+    cache_dir: str
+    ticker: str
+    month: str
+    archives: List[Archive]
+    require_checksum: bool = True
+
+
+def _import_klines(job: ImportJob, result: Dict):
+    frames = []
+    for archive in job.archives:
+        fpath = _fetch(job, archive, result)
+        if fpath is None:
+            continue
+        for df in read_archive(fpath, KLINE_COLUMNS):
+            frames.append(_fix_ts(df, ["open_time", "close_time"]))
+        result["archives"] += 1
+        _drop_cached(job, fpath)
+    if frames:
+        df = pd.concat(frames, ignore_index=True)
+        store = OHLCVStore(job.store_root, f"binance_{job.market}", job.interval)
+        # one merge-write of the month file for all archives of the month
+        store.write(job.ticker, df, merge=True)
+        result["rows"] += len(df)
+
+
+def _import_trades(job: ImportJob, result: Dict):
+    store = TradeStore(job.store_root, f"binance_{job.market}")
+    for archive in job.archives:
+        fpath = _fetch(job, archive, result)
+        if fpath is None:
+            continue
+        # trades are in time order, a day is complete once a later one shows up
+        pending: Dict[str, List[pd.DataFrame]] = defaultdict(list)
+        for chunk in read_archive(fpath, TRADE_COLUMNS, chunksize=CHUNK_ROWS):
+            chunk = _fix_ts(chunk, ["transact_time"])
+            if chunk["is_buyer_maker"].dtype != bool:
+                chunk["is_buyer_maker"] = (
+                    chunk["is_buyer_maker"].astype(str).str.lower() == "true"
+                )
+            days = (chunk["transact_time"].to_numpy() // MS_PER_DAY).astype(np.int64)
+            for d in np.unique(days):
+                pending[day_key(int(d) * MS_PER_DAY)].append(chunk[days == d])
+            last = day_key(int(days[-1]) * MS_PER_DAY)
+            for day in [day for day in pending if day < last]:
+                result["rows"] += _write_trade_day(store, job.ticker, day, pending)
+        for day in list(pending):
+            result["rows"] += _write_trade_day(store, job.ticker, day, pending)
+        result["archives"] += 1
+        _drop_cached(job, fpath)
+
+
+def _write_trade_day(store, ticker, day, pending) -> int:
+    df = pd.concat(pending.pop(day), ignore_index=True)
+    store.write_day(ticker, day, df)
+    return len(df)
+
+
+def _fetch(job: ImportJob, archive: Archive, result: Dict) -> Optional[str]:
+    try:
+        fpath = fetch_archive(
+            job.source, archive.rel_path, job.cache_dir, job.require_checksum
+        )
+    except ChecksumError as e:
+        logger.error(f"binance_archive: {e}")
+        result["bad_checksum"].append(archive.rel_path)
+        return None
+    if fpath is None:
+        result["not_found"] += 1
+    return fpath
+
+
+def _drop_cached(job: ImportJob, fpath: str):
+    if job.cache_dir and fpath.startswith(job.cache_dir):
+        os.remove(fpath)
+
+
+def run_job(job: ImportJob) -> Dict:
+    result = {
+        "ticker": job.ticker,
+        "month": job.month,
+        "archives": 0,
+        "rows": 0,
+        "not_found": 0,
+        "bad_checksum": [],
+        "error": None,
+    }
+    try:
+        if job.kind == "klines":
+            _import_klines(job, result)
+        else:
+            _import_trades(job, result)
+    except Exception as e:
+        result["error"] = repr(e)
+    return result
+
+
+# entry point
+
+
+def import_archives(
+    source: str,
+    tickers: Optional[List[str]],
+    sdate: dt.date,
+    edate: dt.date,
+    market: str = "perps",
+    kind: str = "klines",
+    interval: str = "1m",
+    store_root: str = None,
+    cache_dir: str = None,
+    max_workers: int = None,
+    require_checksum: bool = True,
+) -> Dict:
+    """Import the archives of tickers over [sdate, edate] into the OHLCVStore
+    (klines) or TradeStore (aggTrades). Returns a summary with per-group
+    errors and the archives that failed their checksum."""
+    if kind not in KINDS:
+        raise ValueError(f"binance_archive: unknown kind {kind}")
+    if store_root is None:
+        store_root = OHLCV_ROOT_DIR if kind == "klines" else TRADE_ROOT_DIR
+    if tickers is None:
+        tickers = local_tickers(source, market, kind)
+    remote = source.startswith(("http://", "https://"))
+    tmp_cache = None
+    if remote and cache_dir is None:
+        tmp_cache = cache_dir = os.path.join(store_root, ".archive_cache")
+
+    archives = plan_archives(tickers, sdate, edate, market, kind, interval)
+    held = {
+        t: held_days(market, kind, interval, store_root, t, sdate, edate)
+        for t in tickers
+    }
+    todo = [a for a in archives if not set(a.days) <= held[a.ticker]]
+    groups: Dict[tuple, List[Archive]] = defaultdict(list)
+    for archive in todo:
+        groups[(archive.ticker, archive.month)].append(archive)
+    jobs = [
+        ImportJob(
+            source,
+            market,
+            kind,
+            interval,
+            store_root,
+            cache_dir,
+            ticker,
+            month,
+            group,
+            require_checksum,
+        )
+        for (ticker, month), group in sorted(groups.items())
+    ]
+    logger.info(
+        f"binance_archive: {len(archives)} archives, {len(archives) - len(todo)} "
+        f"held by the store, {len(todo)} to import in {len(jobs)} groups"
+    )
+
+    summary = {
+        "archives": 0,
+        "skipped": len(archives) - len(todo),
+        "rows": 0,
+        "not_found": 0,
+        "bad_checksum": [],
+        "errors": {},
+    }
+    # spawn: forked workers would share the parent's pooled HTTP connections
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        for result in pool.map(run_job, jobs):
+            summary["archives"] += result["archives"]
+            summary["rows"] += result["rows"]
+            summary["not_found"] += result["not_found"]
+            summary["bad_checksum"] += result["bad_checksum"]
+            if result["error"]:
+                key = f"{result['ticker']} {result['month']}"
+                summary["errors"][key] = result["error"]
+                logger.error(f"binance_archive: {key} failed: {result['error']}")
+            else:
+                logger.debug(f"binance_archive: {result}")
+    if tmp_cache is not None:
+        shutil.rmtree(tmp_cache, ignore_errors=True)
+    logger.info(f"binance_archive: done {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", help="local mirror dir or URL prefix")
+    parser.add_argument("--tickers", default=None, help="comma separated")
+    parser.add_argument("--sdate", required=True, help="YYYYMMDD")
+    parser.add_argument("--edate", required=True, help="YYYYMMDD (inclusive)")
+    parser.add_argument("--market", default="perps", choices=list(MARKET_PATHS))
+    parser.add_argument("--kind", default="klines", choices=KINDS)
+    parser.add_argument("--interval", default="1m")
+    parser.add_argument("--store-root", default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-checksum", action="store_true")
+    args = parser.parse_args()
+    import_archives(
+        args.source,
+        args.tickers.split(",") if args.tickers else None,
+        dt.datetime.strptime(args.sdate, "%Y%m%d").date(),
+        dt.datetime.strptime(args.edate, "%Y%m%d").date(),
+        market=args.market,
+        kind=args.kind,
+        interval=args.interval,
+        store_root=args.store_root,
+        max_workers=args.workers,
+        require_checksum=not args.no_checksum,
+    )
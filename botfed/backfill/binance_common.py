@@ -2,9 +2,13 @@ import os
 
 
 def check_file(outfile, interval_min=1, min_lines=2):
+    """Line count check of one file, see manifest.Manifest to avoid reading
+    every file when planning a backfill."""
     if os.path.exists(outfile):
-        with open(outfile, "r") as f:
-            num_lines = len(f.readlines())
+        with open(outfile, "rb") as f:
+            num_lines = sum(
+                chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b"")
+            )
             if min_lines > 0 and num_lines >= min_lines:
                 return True
             elif num_lines == 24 * 60 // interval_min + 1:
@@ -14,5 +18,3 @@ def check_file(outfile, interval_min=1, min_lines=2):
 
 def ticker_outpath(ticker, sdate, outdir):
     return f"{outdir}/{ticker.replace('/','')}/{sdate.strftime('%Y-%m-%d')}.csv"
-
-    
@@ -1,17 +1,16 @@
-import concurrent
 import os
 import pandas as pd
 import datetime as dt
-from concurrent.futures import ThreadPoolExecutor
 import random
-from .binance_common import check_file, ticker_outpath
-import requests
+from .binance_common import ticker_outpath
+from .kline_engine import KlineBackfill
+from .manifest import get_manifest, manifest_for, missing_ranges
 import time
 from dateutil.relativedelta import relativedelta
 from ..universe.bin import load_uni
+from ..core.http_client import get_client
 from ..logger import get_logger
 
-
 logger = get_logger(__name__)
 
 
@@ -35,7 +34,8 @@ def fetch_klines(ticker, interval_str, since=0, until=0):
         "endTime": int(until),
         "limit": 1500,
     }
-    response = requests.get(url, params=params)
+    # 1500 klines weigh 10
+    response = get_client().get(url, params=params, weight=10)
     return response.json()
 
 
@@ -83,10 +83,9 @@ def fetch_to_file(
     outfile,
     interval="1m",
     conditional_write=True,
-    sleep=10,
+    sleep=0,
 ):
-    interval_min = interval_to_minutes(interval)
-    if conditional_write and check_file(outfile, interval_min):
+    if conditional_write and manifest_for(outfile).is_complete(outfile):
         logger.debug(f"Skipping {outfile}")
         return outfile
     try:
@@ -117,14 +116,25 @@ def fetch_to_file(
     outdir = os.path.dirname(os.path.abspath(outfile))
     os.makedirs(outdir, exist_ok=True)
     df.to_csv(outfile, index=False)
+    manifest_for(outfile).record(
+        outfile,
+        rows=len(df),
+        first_ts=int(df["open_time"].iloc[0]) if len(df) else None,
+        last_ts=int(df["open_time"].iloc[-1]) if len(df) else None,
+    )
     time.sleep(sleep)
     return outfile
 
 
 def backfill_tickers(
-    tickers, sdate: dt.datetime, edate: dt.datetime, outdir=".", interval="1m"
+    tickers,
+    sdate: dt.datetime,
+    edate: dt.datetime,
+    outdir=".",
+    interval="1m",
+    max_in_flight=16,
+    store=None,
 ):
-    args = []
     if isinstance(sdate, str):
         sdate = dt.datetime.strptime(sdate, "%Y%m%d").replace(tzinfo=dt.timezone.utc)
         edate = dt.datetime.strptime(edate, "%Y%m%d").replace(tzinfo=dt.timezone.utc)
@@ -138,6 +148,7 @@ def backfill_tickers(
     else:
         # truncate to beginning of month
         step_size = relativedelta(months=1)
+    partitions = []
     for ticker in tickers:
         try:
             created_at = dt.datetime.fromtimestamp(
@@ -151,36 +162,17 @@ def backfill_tickers(
         else:
             rdate = rdate.replace(hour=0, minute=0, second=0, microsecond=0)
         while rdate.date() <= edate.date():
-            outfile = ticker_outpath(ticker, rdate, outdir)
-            if not check_file(outfile, min_lines=min_lines):
-                args.append(
-                    (
-                        ticker,
-                        rdate.timestamp() * 1000,
-                        (rdate + step_size).timestamp() * 1000,
-                        ticker_outpath(ticker, rdate, outdir),
-                    )
-                )
-            else:
-                logger.debug(f"Skipping {outfile}")
+            partitions.append((ticker, rdate, ticker_outpath(ticker, rdate, outdir)))
             rdate = rdate + step_size
             if rdate > dt.datetime.now(dt.timezone.utc):
                 break
-
-    num_jobs = len(args)
-    completed = 0
-    # random.shuffle(args)
-
-    with ThreadPoolExecutor() as exec:
-        logger.debug(f"Running with {exec._max_workers} workers")
-        logger.debug(f"launching {num_jobs} jobs")
-        jobs = [
-            exec.submit(fetch_to_file, arg[0], arg[1], arg[2], arg[3], interval, False)
-            for arg in args
-        ]
-        for _ in concurrent.futures.as_completed(jobs):
-            completed += 1
-            logger.debug(f"Completed {completed}/{num_jobs}")
+    # min_lines counted the header
+    missing = get_manifest(outdir).missing(partitions, min_rows=min_lines - 1)
+    for ticker, spans in missing_ranges(missing, step_size).items():
+        logger.debug(f"{ticker} missing {[(s.date(), e.date()) for s, e in spans]}")
+    KlineBackfill(interval, max_in_flight=max_in_flight, store=store).run(
+        missing, step_size
+    )
 
 
 if __name__ == "__main__":
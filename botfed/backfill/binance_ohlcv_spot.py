@@ -1,17 +1,31 @@
-import concurrent
 import time
 import os
 import pandas as pd
 import logging
 import datetime as dt
-from concurrent.futures import ThreadPoolExecutor
 import random
-import requests
-from .binance_common import check_file, ticker_outpath
-
+from .binance_common import ticker_outpath
+from .kline_engine import SPOT_MAX_LIMIT, SPOT_URL, KlineBackfill
+from .manifest import get_manifest, manifest_for, missing_ranges
+from ..core.http_client import get_client
 
 base_url = "https://api.binance.com"
 
+SPOT_COLUMNS = [
+    "open_time",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "close_time",
+    "quote_asset_volume",
+    "number_of_trades",
+    "taker_buy_base_asset_volume",
+    "taker_buy_quote_asset_volume",
+    "unused",
+]
+
 
 def fetch_klines(ticker: str, interval_str, since=0, until=0):
     endpoint = "/api/v3/klines"
@@ -23,7 +37,7 @@ def fetch_klines(ticker: str, interval_str, since=0, until=0):
         "endTime": int(until),
         "limit": 1000,
     }
-    response = requests.get(url, params=params)
+    response = get_client().get(url, params=params, weight=2)
     return response.json()
 
 
@@ -48,9 +62,9 @@ def fetch_ohlcv(ticker: str, from_ts, to_ts, interval_min=1):
 
 
 def fetch_to_file(
-    ticker, start_t, end_t, outfile, conditional_write=True, interval_min=1, sleep=3
+    ticker, start_t, end_t, outfile, conditional_write=True, interval_min=1, sleep=0
 ):
-    if conditional_write and check_file(outfile, interval_min):
+    if conditional_write and manifest_for(outfile).is_complete(outfile):
         return outfile
     try:
         ohlcv = fetch_ohlcv(ticker, start_t, end_t, interval_min=interval_min)
@@ -59,63 +73,43 @@ def fetch_to_file(
         return
     df = pd.DataFrame(
         ohlcv,
-        columns=[
-            "open_time",
-            "open",
-            "high",
-            "low",
-            "close",
-            "volume",
-            "close_time",
-            "quote_asset_volume",
-            "number_of_trades",
-            "taker_buy_base_asset_volume",
-            "taker_buy_quote_asset_volume",
-            "unused",
-        ],
+        columns=SPOT_COLUMNS,
     )
     # df['symbol'] = ticker
     logging.info(f"Writing {outfile}")
     outdir = os.path.dirname(os.path.abspath(outfile))
     os.makedirs(outdir, exist_ok=True)
     df.to_csv(outfile, index=False)
+    manifest_for(outfile).record(
+        outfile,
+        rows=len(df),
+        first_ts=int(df["open_time"].iloc[0]) if len(df) else None,
+        last_ts=int(df["open_time"].iloc[-1]) if len(df) else None,
+    )
     time.sleep(sleep)
     return outfile
 
 
-def backfill_tickers(tickers, sdate, edate, outdir="."):
-    args = []
+def backfill_tickers(tickers, sdate, edate, outdir=".", max_in_flight=16):
     sdate = dt.datetime.strptime(sdate, "%Y%m%d").replace(tzinfo=dt.timezone.utc)
     edate = dt.datetime.strptime(edate, "%Y%m%d").replace(tzinfo=dt.timezone.utc)
+    partitions = []
     for ticker in tickers:
         num = (edate - sdate).days + 1
         for i in range(num):
             rdate = sdate + dt.timedelta(days=i)
-            outfile = ticker_outpath(ticker, rdate, outdir)
-            if check_file(outfile):
-                continue
-            args.append(
-                (
-                    ticker,
-                    rdate.timestamp() * 1000,
-                    (rdate + dt.timedelta(days=1)).timestamp() * 1000,
-                    ticker_outpath(ticker, rdate, outdir),
-                )
-            )
-
-    num_jobs = len(args)
-    completed = 0
-    # random.shuffle(args)
-
-    with ThreadPoolExecutor() as exec:
-        logging.info(f"Running with {exec._max_workers} workers")
-        logging.info(f"launching {num_jobs} jobs")
-        jobs = [
-            exec.submit(fetch_to_file, arg[0], arg[1], arg[2], arg[3]) for arg in args
-        ]
-        for _ in concurrent.futures.as_completed(jobs):
-            completed += 1
-            logging.info(f"Completed {completed}/{num_jobs}")
+            partitions.append((ticker, rdate, ticker_outpath(ticker, rdate, outdir)))
+    missing = get_manifest(outdir).missing(partitions)
+    for ticker, spans in missing_ranges(missing, dt.timedelta(days=1)).items():
+        logging.info(f"{ticker} missing {[(s.date(), e.date()) for s, e in spans]}")
+    KlineBackfill(
+        "1m",
+        url=SPOT_URL,
+        max_limit=SPOT_MAX_LIMIT,
+        max_in_flight=max_in_flight,
+        columns=SPOT_COLUMNS,
+        spot=True,
+    ).run(missing, dt.timedelta(days=1))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,337 @@
+"""
+Concurrent kline backfill.
+
+Klines are indexed by time, so every page of a backfill is known up front:
+each missing partition (a day of 1m klines, a month of 1h, ...) is split in
+pages of at most `limit` klines and all pages, across tickers and days, are
+fetched by a pool of threads instead of paginating one call at a time.
+
+Throughput is bound by the API weight budget, not by round trips:
+
+- every request goes through the shared HttpClient, whose RateBudget for the
+  host charges the kline weight for the page size (KLINE_WEIGHTS) and
+  follows the X-MBX-USED-WEIGHT-1M header;
+- 429 / 418 block the budget for Retry-After and halve the number of
+  requests in flight (AdaptiveLimit), which then grows back by one per
+  `increase_every` successes;
+- errors are retried with exponential backoff per page.
+
+A partition is written once all its pages are in: to a temp file, renamed
+into place and recorded in the manifest, so reruns skip it and a crash never
+leaves a partial file. With a store, the klines are merged into the
+OHLCVStore too (deduplicated on open_time).
+
+See kline_standin.py for a local stand-in of the Binance kline endpoint and
+kline_engine_bench.py for throughput / rate limit compliance against it.
+"""
+
+import concurrent.futures
+import datetime as dt
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from ..core.http_client import NO_RETRY, RetryPolicy, HttpClient, get_client
+from ..logger import get_logger
+from .manifest import manifest_for
+from .ohlcv_store import OHLCVStore, interval_ms
+
+logger = get_logger(__name__)
+
+PERPS_URL = "https://fapi.binance.com/fapi/v1/klines"
+SPOT_URL = "https://api.binance.com/api/v3/klines"
+
+KLINE_COLUMNS = [
+    "open_time",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "close_time",
+    "quote_asset_volume",
+    "num_trades",
+    "taker_buy_base_asset_volume",
+    "taker_buy_quote_asset_volume",
+    "ignore",
+]
+
+# fapi/v1/klines weight by limit: [1, 100) 1, [100, 500) 2, [500, 1000] 5,
+# above 10. api/v3/klines is 2 regardless.
+KLINE_WEIGHTS = ((100, 1), (500, 2), (1001, 5), (1501, 10))
+PERPS_MAX_LIMIT = 1500
+SPOT_MAX_LIMIT = 1000
+SPOT_WEIGHT = 2
+
+
+def kline_weight(limit: int) -> int:
+    for bound, weight in KLINE_WEIGHTS:
+        if limit < bound:
+            return weight
+    return KLINE_WEIGHTS[-1][1]
+
+
+class AdaptiveLimit:
+    """Semaphore whose size is cut in half on throttling and grows back by
+    one every `increase_every` successes (AIMD)."""
+
+    def __init__(self, limit: int, min_limit: int = 1, increase_every: int = 20):
+        self.max_limit = limit
+        self.min_limit = min_limit
+        self.limit = limit
+        self.increase_every = increase_every
+        self.in_flight = 0
+        self.n_ok = 0
+        self.cond = threading.Condition()
+
+    def __enter__(self):
+        with self.cond:
+            while self.in_flight >= self.limit:
+                self.cond.wait()
+            self.in_flight += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify()
+
+    def on_success(self):
+        with self.cond:
+            self.n_ok += 1
+            if self.n_ok >= self.increase_every and self.limit < self.max_limit:
+                self.n_ok = 0
+                self.limit += 1
+                self.cond.notify()
+
+    def on_throttle(self):
+        with self.cond:
+            self.n_ok = 0
+            self.limit = max(self.min_limit, self.limit // 2)
+
+
+class BackfillStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.weight = 0
+        self.klines = 0
+        self.throttled = 0
+        self.retries = 0
+        self.failed_pages = 0
+        self.partitions = 0
+        self.failed_partitions = 0
+        self.t_start = time.perf_counter()
+
+    def add(self, **counts):
+        with self.lock:
+            for key, n in counts.items():
+                setattr(self, key, getattr(self, key) + n)
+
+    def summary(self) -> Dict:
+        elapsed = time.perf_counter() - self.t_start
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "requests": self.requests,
+            "weight": self.weight,
+            "klines": self.klines,
+            "klines_per_s": round(self.klines / elapsed) if elapsed else None,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "failed_pages": self.failed_pages,
+            "partitions": self.partitions,
+            "failed_partitions": self.failed_partitions,
+        }
+
+
+class _Partition:
+    def __init__(self, ticker, start_ms, end_ms, outfile, n_pages):
+        self.ticker = ticker
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.outfile = outfile
+        self.pages_left = n_pages
+        self.rows: List[list] = []
+        self.failed = False
+        self.lock = threading.Lock()
+
+
+class KlineBackfill:
+
+    def __init__(
+        self,
+        interval: str = "1m",
+        url: str = PERPS_URL,
+        max_limit: int = PERPS_MAX_LIMIT,
+        max_in_flight: int = 16,
+        max_attempts: int = 6,
+        retry: RetryPolicy = RetryPolicy(backoff_s=1, backoff_max_s=30),
+        client: HttpClient = None,
+        store: OHLCVStore = None,
+        columns: List[str] = KLINE_COLUMNS,
+        spot: bool = False,
+    ):
+        """spot: charge the spot kline weight (flat SPOT_WEIGHT) instead of
+        the perps one, which grows with the page size."""
+        self.interval = interval
+        self.url = url
+        self.max_limit = max_limit
+        self.max_in_flight = max_in_flight
+        self.max_attempts = max_attempts
+        self.retry = retry
+        self.client = client or get_client()
+        self.store = store
+        self.columns = columns
+        self.spot = spot
+        self.in_flight = AdaptiveLimit(max_in_flight)
+        self.stats = BackfillStats()
+        try:
+            self.step_ms = interval_ms(interval)
+        except KeyError:
+            # 1M: one page per partition
+            self.step_ms = None
+
+    # planning
+
+    def pages(self, start_ms: int, end_ms: int) -> List[Tuple[int, int, int]]:
+        """(start_ms, end_ms, limit) pages covering [start_ms, end_ms)."""
+        if self.step_ms is None:
+            return [(start_ms, end_ms, self.max_limit)]
+        n = math.ceil((end_ms - start_ms) / self.step_ms)
+        # equal pages, a 1m day is one page of 1440 rather than 1500 + rest
+        n_pages = max(1, math.ceil(n / self.max_limit))
+        per_page = math.ceil(n / n_pages)
+        out = []
+        for i in range(n_pages):
+            page_start = start_ms + i * per_page * self.step_ms
+            page_end = min(end_ms, page_start + per_page * self.step_ms)
+            if page_start < page_end:
+                out.append((page_start, page_end, per_page))
+        return out
+
+    def weight(self, limit: int) -> int:
+        return SPOT_WEIGHT if self.spot else kline_weight(limit)
+
+    # fetching
+
+    def _fetch_page(self, ticker, start_ms, end_ms, limit) -> Optional[list]:
+        params = {
+            "symbol": ticker,
+            "interval": self.interval,
+            "startTime": start_ms,
+            "endTime": end_ms - 1,
+            "limit": limit,
+        }
+        weight = self.weight(limit)
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.stats.add(retries=1)
+                time.sleep(self.retry.delay(attempt - 1))
+            with self.in_flight:
+                try:
+                    resp = self.client.get(
+                        self.url, params=params, weight=weight, retry=NO_RETRY
+                    )
+                except Exception as e:
+                    logger.warning(f"KlineBackfill: {ticker} {start_ms} failed: {e}")
+                    continue
+            self.stats.add(requests=1, weight=weight)
+            if resp.status_code in (418, 429):
+                # the client blocked the host's budget for Retry-After
+                self.stats.add(throttled=1)
+                self.in_flight.on_throttle()
+                logger.warning(
+                    f"KlineBackfill: {resp.status_code}, in flight limit "
+                    f"{self.in_flight.limit}"
+                )
+                continue
+            if resp.status_code >= 400:
+                logger.warning(
+                    f"KlineBackfill: {ticker} {start_ms} status {resp.status_code}: "
+                    f"{resp.text[:200]}"
+                )
+                if resp.status_code < 500:
+                    # bad symbol / params, retrying won't help
+                    break
+                continue
+            self.in_flight.on_success()
+            return resp.json()
+        self.stats.add(failed_pages=1)
+        return None
+
+    def _run_page(self, part: _Partition, start_ms, end_ms, limit):
+        rows = (
+            None
+            if part.failed
+            else self._fetch_page(part.ticker, start_ms, end_ms, limit)
+        )
+        with part.lock:
+            if rows is None:
+                part.failed = True
+            else:
+                part.rows.extend(rows)
+            part.pages_left -= 1
+            done = part.pages_left == 0
+        if done:
+            self._finish(part)
+
+    def _finish(self, part: _Partition):
+        if part.failed:
+            self.stats.add(failed_partitions=1)
+            logger.error(f"KlineBackfill: giving up on {part.outfile}")
+            return
+        df = pd.DataFrame(part.rows, columns=self.columns)
+        df = df[(df["open_time"] >= part.start_ms) & (df["open_time"] < part.end_ms)]
+        df = df.drop_duplicates("open_time").sort_values("open_time")
+        write_partition(df, part.outfile)
+        if self.store is not None and len(df):
+            self.store.write(part.ticker, df, merge=True)
+        self.stats.add(partitions=1, klines=len(df))
+        logger.debug(f"KlineBackfill: wrote {part.outfile} ({len(df)} klines)")
+
+    def run(self, partitions: List[Tuple[str, dt.datetime, str]], step) -> Dict:
+        """Fetch and write (ticker, start, outfile) partitions, each covering
+        [start, start + step). Returns stats().summary()."""
+        self.stats = BackfillStats()
+        jobs = []
+        for ticker, start, outfile in partitions:
+            start_ms = int(start.timestamp() * 1000)
+            end_ms = int((start + step).timestamp() * 1000)
+            pages = self.pages(start_ms, end_ms)
+            part = _Partition(ticker, start_ms, end_ms, outfile, len(pages))
+            jobs.extend((part, *page) for page in pages)
+        logger.info(
+            f"KlineBackfill: {len(partitions)} partitions, {len(jobs)} pages, "
+            f"{self.max_in_flight} in flight"
+        )
+        # days of different tickers interleave, so one failing symbol doesn't
+        # hold the whole pool
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_in_flight
+        ) as pool:
+            futures = [pool.submit(self._run_page, *job) for job in jobs]
+            for future in concurrent.futures.as_completed(futures):
+                exc = future.exception()
+                if exc is not None:
+                    logger.error(f"KlineBackfill: page error {exc!r}")
+        summary = self.stats.summary()
+        logger.info(f"KlineBackfill: done {summary}")
+        return summary
+
+
+def write_partition(df: pd.DataFrame, outfile: str):
+    """Write a kline CSV atomically and record it in the manifest."""
+    os.makedirs(os.path.dirname(os.path.abspath(outfile)), exist_ok=True)
+    tmp = f"{outfile}.{threading.get_ident()}.tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, outfile)
+    manifest_for(outfile).record(
+        outfile,
+        rows=len(df),
+        first_ts=int(df["open_time"].iloc[0]) if len(df) else None,
+        last_ts=int(df["open_time"].iloc[-1]) if len(df) else None,
+    )
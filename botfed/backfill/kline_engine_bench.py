@@ -0,0 +1,89 @@
+"""
+KlineBackfill against the local KlineStandIn: one request at a time vs many
+in flight, and a client that thinks the limit is twice what the server
+enforces (exercises the 429 / 418 handling). The stand-in uses a short
+weight window so the limit actually binds within a few seconds.
+tests/test_kline_engine.py checks the limits hold on smaller runs.
+
+    python -m botfed.backfill.kline_engine_bench --tickers 10 --days 10
+"""
+
+import argparse
+import datetime as dt
+import tempfile
+
+from ..core.http_client import HttpClient, RateBudget
+from .binance_common import ticker_outpath
+from .kline_engine import PERPS_MAX_LIMIT, SPOT_MAX_LIMIT, KlineBackfill
+from .kline_standin import KlineStandIn
+
+
+def run(
+    standin,
+    client_limit,
+    max_in_flight,
+    tickers,
+    days,
+    window_s,
+    headroom,
+    spot=False,
+):
+    client = HttpClient(weight_limits={})
+    client.budgets[standin.host] = RateBudget(client_limit, headroom, window_s)
+    sdate = dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc)
+    with tempfile.TemporaryDirectory() as outdir:
+        partitions = [
+            (t, sdate + dt.timedelta(days=d), None)
+            for t in tickers
+            for d in range(days)
+        ]
+        partitions = [(t, d, ticker_outpath(t, d, outdir)) for t, d, _ in partitions]
+        engine = KlineBackfill(
+            "1m",
+            url=standin.base_url + ("/api/v3/klines" if spot else "/fapi/v1/klines"),
+            max_limit=SPOT_MAX_LIMIT if spot else PERPS_MAX_LIMIT,
+            max_in_flight=max_in_flight,
+            client=client,
+            spot=spot,
+        )
+        return engine.run(partitions, dt.timedelta(days=1))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=10)
+    parser.add_argument("--days", type=int, default=10)
+    parser.add_argument("--weight-limit", type=int, default=600)
+    parser.add_argument("--window-s", type=float, default=5)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--in-flight", type=int, default=16)
+    args = parser.parse_args()
+    tickers = [f"T{i}USDT" for i in range(args.tickers)]
+
+    cases = [
+        ("serial", args.weight_limit, 1, 0.9),
+        (f"{args.in_flight} in flight", args.weight_limit, args.in_flight, 0.9),
+        ("client limit 2x", 2 * args.weight_limit, args.in_flight, 1.0),
+    ]
+    for name, client_limit, in_flight, headroom in cases:
+        standin = KlineStandIn(
+            args.weight_limit, args.window_s, latency_ms=args.latency_ms
+        ).start()
+        try:
+            summary = run(
+                standin,
+                client_limit,
+                in_flight,
+                tickers,
+                args.days,
+                args.window_s,
+                headroom,
+            )
+        finally:
+            standin.close()
+        print(f"{name:18s} engine {summary}")
+        print(f"{'':18s} server {standin.summary()}")
+
+
+if __name__ == "__main__":
+    main()
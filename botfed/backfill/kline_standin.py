@@ -0,0 +1,181 @@
+"""
+Local stand-in for the Binance kline endpoints, for exercising backfills
+without touching the real API.
+
+Serves /fapi/v1/klines and /api/v3/klines with synthetic klines and charges
+request weight per window like Binance does: the weight used is returned in
+X-MBX-USED-WEIGHT-1M, a request over the limit gets 429 with Retry-After,
+and requests still coming during that back-off get 418. Every window's
+weight is kept, so a caller can check that it never went over the limit.
+
+    standin = KlineStandIn(weight_limit=1200, window_s=5).start()
+    ... requests to standin.base_url ...
+    standin.close()
+    standin.summary()
+"""
+
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import parse_qs, urlsplit
+
+import orjson as json
+
+from ..logger import get_logger
+from .kline_engine import PERPS_MAX_LIMIT, SPOT_MAX_LIMIT, SPOT_WEIGHT, kline_weight
+from .ohlcv_store import interval_ms
+
+logger = get_logger(__name__)
+
+
+def synth_klines(symbol: str, interval: str, start_ms: int, end_ms: int, limit: int):
+    """Deterministic klines for [start_ms, end_ms], at most limit."""
+    step = interval_ms(interval)
+    first = -(-start_ms // step) * step
+    seed = sum(symbol.encode())
+    rows = []
+    t = first
+    while t <= end_ms and len(rows) < limit:
+        px = 100 + seed % 50 + (t // step) % 1000 / 100
+        rows.append(
+            [
+                t,
+                f"{px:.2f}",
+                f"{px * 1.001:.2f}",
+                f"{px * 0.999:.2f}",
+                f"{px:.2f}",
+                "10.0",
+                t + step - 1,
+                f"{px * 10:.2f}",
+                42,
+                "5.0",
+                f"{px * 5:.2f}",
+                "0",
+            ]
+        )
+        t += step
+    return rows
+
+
+class KlineStandIn:
+
+    def __init__(
+        self,
+        weight_limit: int = 2400,
+        window_s: float = 60,
+        latency_ms: float = 20,
+        jitter_ms: float = 5,
+        port: int = 0,
+    ):
+        self.weight_limit = weight_limit
+        self.window_s = window_s
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.lock = threading.Lock()
+        self.window = 0
+        self.used = 0
+        self.blocked_until = 0.0
+        self.window_weights: Dict[int, int] = {}
+        self.n_requests = 0
+        self.n_429 = 0
+        self.n_418 = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def host(self) -> str:
+        return f"127.0.0.1:{self.server.server_address[1]}"
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}"
+
+    def _charge(self, weight: int):
+        """(status, used, retry_after) for a request of `weight`."""
+        with self.lock:
+            tnow = time.time()
+            window = int(tnow // self.window_s)
+            if window != self.window:
+                self.window = window
+                self.used = 0
+            self.n_requests += 1
+            retry_after = (window + 1) * self.window_s - tnow
+            if tnow < self.blocked_until:
+                self.n_418 += 1
+                return 418, self.used, self.blocked_until - tnow
+            if self.used + weight > self.weight_limit:
+                self.n_429 += 1
+                self.blocked_until = (window + 1) * self.window_s
+                return 429, self.used, retry_after
+            self.used += weight
+            self.window_weights[window] = self.used
+            return 200, self.used, None
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body: bytes, headers: Dict):
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                if parts.path not in ("/fapi/v1/klines", "/api/v3/klines"):
+                    self._send(404, b'{"code":-1,"msg":"not found"}', {})
+                    return
+                q = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                spot = parts.path.startswith("/api")
+                max_limit = SPOT_MAX_LIMIT if spot else PERPS_MAX_LIMIT
+                limit = min(int(q.get("limit", 500)), max_limit)
+                weight = SPOT_WEIGHT if spot else kline_weight(limit)
+                status, used, retry_after = standin._charge(weight)
+                headers = {"X-MBX-USED-WEIGHT-1M": str(used)}
+                if status != 200:
+                    headers["Retry-After"] = str(max(1, round(retry_after)))
+                    self._send(status, b'{"code":-1003,"msg":"Too many"}', headers)
+                    return
+                delay_ms = standin.latency_ms + random.uniform(
+                    -standin.jitter_ms, standin.jitter_ms
+                )
+                time.sleep(max(0, delay_ms) / 1000)
+                rows = synth_klines(
+                    q["symbol"],
+                    q.get("interval", "1m"),
+                    int(q.get("startTime", 0)),
+                    int(q.get("endTime", time.time() * 1000)),
+                    limit,
+                )
+                self._send(200, json.dumps(rows), headers)
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def summary(self) -> Dict:
+        peak = max(self.window_weights.values(), default=0)
+        return {
+            "requests": self.n_requests,
+            "n_429": self.n_429,
+            "n_418": self.n_418,
+            "peak_window_weight": peak,
+            "weight_limit": self.weight_limit,
+        }
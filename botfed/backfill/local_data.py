@@ -6,16 +6,18 @@ from dateutil.relativedelta import relativedelta
 import os
 import concurrent.futures
 import numpy as np
-from .binance_common import check_file, ticker_outpath
+from .binance_common import ticker_outpath
+from .manifest import manifest_for
 from .binance_markets import get_bin_uni_local
 from ..binance.universe import coin_to_binance_contract, binance_contract_to_coin
 from .binance_backfill_perps import backfill_tickers, get_outdir
+from .ohlcv_store import OHLCVStore
 
 ROOT_DIR = "../data"
 
 
-def make_df(dfs, sample="1T"):
-    sample = "1T" if sample == "1m" else sample
+def make_df(dfs, sample="1min"):
+    sample = "1min" if sample in ("1m", "1T") else sample
     df_all = pd.DataFrame()
     for coin in dfs:
         df = dfs[coin].copy()
@@ -32,7 +34,7 @@ def make_df(dfs, sample="1T"):
         )
         group["low"] = df["low"].resample(sample).min()
         group["high"] = df["high"].resample(sample).max()
-        if sample == "1T":
+        if sample == "1min":
             group["ret_twap"] = group["twap"].pct_change()
             group["ret_twap_forward"] = group["ret_twap"].shift(-2)
         else:
@@ -75,6 +77,7 @@ def process_coin(
     else:
         delta = dt.timedelta(days=1)
 
+    frames = []
     while date.date() <= edate.date():
         fpath = ticker_outpath(
             ticker,
@@ -82,18 +85,51 @@ def process_coin(
             os.path.join(root_dir, f"binance_ohlcv/{type_}/{interval.lower()}"),
         )
         date = date + delta
-        min_lines = 24 * 60 if interval == "1m" else 1
-        if not check_file(fpath, min_lines=min_lines):
+        min_rows = 24 * 60 - 1 if interval == "1m" else 1
+        manifest = manifest_for(fpath)
+        if not manifest.is_complete(fpath, min_rows=min_rows):
             backfill_tickers(
                 [ticker], sdate, edate, outdir=get_outdir(interval), interval=interval
             )
             time.sleep(1)
-        if not check_file(fpath):
+        if not manifest.is_complete(fpath, verify=True):
             continue
-        if df is None:
-            df = pd.read_csv(fpath)
-        else:
-            df = pd.concat([df, pd.read_csv(fpath)])
+        frames.append(pd.read_csv(fpath))
+    if frames:
+        df = pd.concat(frames)
+    return _finish_coin(df, coin, sdate, interval)
+
+
+def process_coin_store(
+    coin: str,
+    sdate: dt.datetime,
+    edate: dt.datetime,
+    store: OHLCVStore,
+    type_,
+    interval="1m",
+):
+    """process_coin reading the same date range from an OHLCVStore."""
+    ticker = coin_to_binance_contract(coin)
+    if type_ == "spot":
+        ticker = ticker.replace("USDT", "_USDT")
+    if interval != "1m":
+        start = sdate.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end = edate.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end += relativedelta(months=1)
+    else:
+        start = sdate.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = edate.replace(hour=0, minute=0, second=0, microsecond=0)
+        end += dt.timedelta(days=1)
+    df = store.read_ticker(
+        ticker,
+        start,
+        end,
+        columns=["open_time", "open", "high", "low", "close", "volume", "close_time"],
+    )
+    return _finish_coin(df, coin, sdate, interval)
+
+
+def _finish_coin(df, coin: str, sdate: dt.datetime, interval: str):
     if df is None or df.empty:
         return None
     df["symbol"] = coin
@@ -121,16 +157,26 @@ def build_dfs(
     type_="perps",
     interval="1m",
     concat=False,
+    store: OHLCVStore = None,
 ):
+    """store: read from an OHLCVStore instead of the CSV tree (no backfill)."""
     dfs = {}
 
     with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = {
-            executor.submit(
-                process_coin, coin, sdate, edate, root_dir, type_, interval
-            ): coin
-            for coin in coins
-        }
+        if store is None:
+            futures = {
+                executor.submit(
+                    process_coin, coin, sdate, edate, root_dir, type_, interval
+                ): coin
+                for coin in coins
+            }
+        else:
+            futures = {
+                executor.submit(
+                    process_coin_store, coin, sdate, edate, store, type_, interval
+                ): coin
+                for coin in coins
+            }
 
         for future in concurrent.futures.as_completed(futures):
             coin = futures[future]
@@ -0,0 +1,227 @@
+"""
+Manifest of the backfilled kline files under one output dir.
+
+Per file: rows, first/last open_time, size, mtime and a blake2b checksum,
+kept in {outdir}/_manifest.jsonl. Writers append one line per file they
+write (a single O_APPEND write, so concurrent writers don't interleave and a
+crash leaves at most a torn last line, which is skipped); the last line for a
+path wins and the log is compacted atomically when loaded.
+
+Planning a backfill then only looks at the manifest instead of opening and
+counting the lines of every day file. Files that exist but aren't in the
+manifest yet (data from before it existed) are indexed the first time they
+are asked about.
+
+    python -m botfed.backfill.manifest ../data/binance_ohlcv/perps/1m
+"""
+
+import argparse
+import datetime as dt
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+MANIFEST_NAME = "_manifest.jsonl"
+
+
+def file_checksum(fpath: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(fpath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def scan_csv(fpath: str) -> Dict:
+    """rows / first / last open_time of a kline CSV, read once."""
+    rows = 0
+    first = last = None
+    with open(fpath, "rb") as f:
+        f.readline()  # header
+        for line in f:
+            if not line.strip():
+                continue
+            ts = int(float(line.split(b",", 1)[0]))
+            if first is None:
+                first = ts
+            last = ts
+            rows += 1
+    return {"rows": rows, "first_ts": first, "last_ts": last}
+
+
+class Manifest:
+
+    def __init__(self, root: str):
+        self.root = root
+        self.path = os.path.join(root, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict] = {}
+        self._load()
+
+    def _key(self, fpath: str) -> str:
+        return os.path.relpath(fpath, self.root)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        n_lines = 0
+        torn = False
+        with open(self.path) as f:
+            for line in f:
+                n_lines += 1
+                torn = not line.endswith("\n")
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self.entries[entry["path"]] = entry
+        # rewrite a torn tail too, or the next append would be glued to it
+        if torn or n_lines > 2 * len(self.entries) + 100:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the log with one line per path."""
+        with self.lock:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp, self.path)
+
+    def _append(self, entry: Dict):
+        line = (json.dumps(entry) + "\n").encode()
+        os.makedirs(self.root, exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def record(
+        self,
+        fpath: str,
+        rows: int = None,
+        first_ts: int = None,
+        last_ts: int = None,
+    ) -> Dict:
+        """Call right after writing fpath; rows / timestamps are read from the
+        file when not given."""
+        st = os.stat(fpath)
+        if rows is None:
+            entry = scan_csv(fpath)
+        else:
+            entry = {"rows": rows, "first_ts": first_ts, "last_ts": last_ts}
+        entry.update(
+            path=self._key(fpath),
+            size=st.st_size,
+            mtime=st.st_mtime,
+            checksum=file_checksum(fpath),
+        )
+        with self.lock:
+            self.entries[entry["path"]] = entry
+            self._append(entry)
+        return entry
+
+    def get(self, fpath: str) -> Optional[Dict]:
+        return self.entries.get(self._key(fpath))
+
+    def is_complete(self, fpath: str, min_rows: int = 1, verify: bool = False) -> bool:
+        """Whether fpath holds at least min_rows rows. Only the manifest is
+        consulted, unless the file is not in it yet; verify also compares
+        size and mtime against the file."""
+        entry = self.entries.get(self._key(fpath))
+        if entry is None:
+            if not os.path.exists(fpath):
+                return False
+            entry = self.record(fpath)
+        elif verify:
+            try:
+                st = os.stat(fpath)
+            except FileNotFoundError:
+                return False
+            if st.st_size != entry["size"] or st.st_mtime != entry["mtime"]:
+                entry = self.record(fpath)
+        return entry["rows"] >= min_rows
+
+    def missing(
+        self, partitions: Iterable[Tuple[str, dt.datetime, str]], min_rows: int = 1
+    ) -> List[Tuple[str, dt.datetime, str]]:
+        """(ticker, date, path) partitions that are absent or short."""
+        return [p for p in partitions if not self.is_complete(p[2], min_rows)]
+
+    def verify_checksums(self) -> List[str]:
+        """Paths whose file is gone or no longer matches its checksum."""
+        bad = []
+        for key, entry in list(self.entries.items()):
+            fpath = os.path.join(self.root, key)
+            if not os.path.exists(fpath) or file_checksum(fpath) != entry["checksum"]:
+                bad.append(key)
+        return bad
+
+
+def missing_ranges(
+    missing: Iterable[Tuple[str, dt.datetime, str]], step
+) -> Dict[str, List[Tuple[dt.datetime, dt.datetime]]]:
+    """Group missing partitions into contiguous [start, end) ranges per
+    ticker, in one pass over partitions sorted by ticker and date."""
+    ranges: Dict[str, List[Tuple[dt.datetime, dt.datetime]]] = {}
+    for ticker, date, _ in sorted(missing, key=lambda p: (p[0], p[1])):
+        spans = ranges.setdefault(ticker, [])
+        if spans and spans[-1][1] == date:
+            spans[-1] = (spans[-1][0], date + step)
+        else:
+            spans.append((date, date + step))
+    return ranges
+
+
+_manifests: Dict[str, Manifest] = {}
+_lock = threading.Lock()
+
+
+def get_manifest(root: str) -> Manifest:
+    """Process-wide Manifest for an output dir."""
+    root = os.path.abspath(root)
+    with _lock:
+        manifest = _manifests.get(root)
+        if manifest is None:
+            manifest = _manifests[root] = Manifest(root)
+        return manifest
+
+
+def manifest_for(outfile: str) -> Manifest:
+    """Manifest of a {outdir}/{TICKER}/{date}.csv file."""
+    return get_manifest(os.path.dirname(os.path.dirname(os.path.abspath(outfile))))
+
+
+def build(root: str) -> Manifest:
+    """Index every CSV under root (one read per file not yet indexed)."""
+    manifest = get_manifest(root)
+    for ticker in sorted(os.listdir(root)):
+        tdir = os.path.join(root, ticker)
+        if not os.path.isdir(tdir):
+            continue
+        for fname in sorted(os.listdir(tdir)):
+            if fname.endswith(".csv"):
+                manifest.is_complete(os.path.join(tdir, fname), verify=True)
+    manifest.compact()
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "root", help="backfill output dir, e.g. ../data/binance_ohlcv/perps/1m"
+    )
+    parser.add_argument("--verify", action="store_true", help="check checksums")
+    args = parser.parse_args()
+    manifest = build(args.root)
+    logger.info(f"{len(manifest.entries)} files in {manifest.path}")
+    if args.verify:
+        bad = manifest.verify_checksums()
+        logger.info(f"{len(bad)} files changed or missing: {bad[:20]}")
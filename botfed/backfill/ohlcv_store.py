@@ -0,0 +1,275 @@
+"""
+Partitioned Parquet store for kline data.
+
+Layout: {root}/{exchange}/{interval}/{TICKER}/{YYYY-MM}.parquet, e.g.
+../data/ohlcv_store/binance_perps/1m/BTCUSDT/2024-03.parquet. Columns are
+typed (int64 ms timestamps, float64 prices/volumes, int64 trade counts)
+and each file is split in one-day row groups with min/max statistics, so a
+query only opens the months it needs and only decodes the row groups whose
+open_time range overlaps [start, end).
+
+convert_csv_tree() imports the per-day / per-month CSV tree written by the
+backfill scripts (../data/binance_ohlcv/{perps,spot}/{interval}/...).
+
+    python -m botfed.backfill.ohlcv_store --type perps --interval 1m
+"""
+
+import argparse
+import concurrent.futures
+import datetime as dt
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+import fastparquet
+import numpy as np
+import pandas as pd
+
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+ROOT_DIR = "../data/ohlcv_store"
+CSV_ROOT_DIR = "../data/binance_ohlcv"
+
+# kline columns as written by the backfill scripts, "ignore" is dropped
+DTYPES = {
+    "open_time": np.int64,
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.float64,
+    "close_time": np.int64,
+    "quote_asset_volume": np.float64,
+    "num_trades": np.int64,
+    "taker_buy_base_asset_volume": np.float64,
+    "taker_buy_quote_asset_volume": np.float64,
+}
+COLUMNS = list(DTYPES)
+TS_COLUMN = "open_time"
+MS_PER_DAY = 24 * 3600 * 1000
+
+
+def to_ms(ts) -> int:
+    """datetime / Timestamp / str / ms int -> epoch ms, naive taken as UTC."""
+    if isinstance(ts, (int, np.integer)):
+        return int(ts)
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("UTC")
+    return int(ts.timestamp() * 1000)
+
+
+def month_key(ms: int) -> str:
+    return dt.datetime.fromtimestamp(ms / 1000, dt.timezone.utc).strftime("%Y-%m")
+
+
+def interval_ms(interval: str) -> int:
+    units = {"m": 60_000, "h": 3_600_000, "d": MS_PER_DAY, "w": 7 * MS_PER_DAY}
+    return int(interval[:-1]) * units[interval[-1]]
+
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Kline frame -> store schema: typed columns, sorted, unique open_time."""
+    df = df[COLUMNS].astype(DTYPES)
+    df = df.drop_duplicates(TS_COLUMN, keep="last").sort_values(TS_COLUMN)
+    return df.reset_index(drop=True)
+
+
+class OHLCVStore:
+
+    def __init__(
+        self, root: str = ROOT_DIR, exchange: str = "binance_perps", interval="1m"
+    ):
+        self.root = root
+        self.exchange = exchange
+        self.interval = interval
+        # one row group per day; files hold a month, so for intervals of a
+        # day and up one row group per file
+        step = interval_ms(interval)
+        if step < MS_PER_DAY:
+            self.row_group_rows = MS_PER_DAY // step
+        else:
+            self.row_group_rows = max(1, 31 * MS_PER_DAY // step)
+
+    def ticker_dir(self, ticker: str) -> str:
+        return os.path.join(
+            self.root, self.exchange, self.interval, ticker.replace("/", "")
+        )
+
+    def path(self, ticker: str, month: str) -> str:
+        return os.path.join(self.ticker_dir(ticker), f"{month}.parquet")
+
+    def tickers(self) -> List[str]:
+        base = os.path.join(self.root, self.exchange, self.interval)
+        if not os.path.isdir(base):
+            return []
+        return sorted(os.listdir(base))
+
+    def months(self, ticker: str) -> List[str]:
+        tdir = self.ticker_dir(ticker)
+        if not os.path.isdir(tdir):
+            return []
+        return sorted(f[:-8] for f in os.listdir(tdir) if f.endswith(".parquet"))
+
+    # writing
+
+    def write(self, ticker: str, df: pd.DataFrame, merge: bool = True):
+        """Write klines, one file per month. With merge, rows already stored
+        for those months are kept unless df has the same open_time."""
+        df = normalize(df)
+        if df.empty:
+            return
+        months = df[TS_COLUMN].map(month_key)
+        for month, part in df.groupby(months, sort=False):
+            fpath = self.path(ticker, month)
+            if merge and os.path.exists(fpath):
+                old = fastparquet.ParquetFile(fpath).to_pandas()
+                part = normalize(pd.concat([old, part], ignore_index=True))
+            self._write_file(fpath, part)
+
+    def _write_file(self, fpath: str, df: pd.DataFrame):
+        os.makedirs(os.path.dirname(fpath), exist_ok=True)
+        tmp = fpath + ".tmp"
+        fastparquet.write(
+            tmp,
+            df,
+            row_group_offsets=self.row_group_rows,
+            compression="SNAPPY",
+            write_index=False,
+            stats=[TS_COLUMN, "close_time"],
+        )
+        os.replace(tmp, fpath)
+
+    # reading
+
+    def read_ticker(
+        self,
+        ticker: str,
+        start=None,
+        end=None,
+        columns: Optional[List[str]] = None,
+    ) -> Optional[pd.DataFrame]:
+        """Rows with start <= open_time < end, None if there are none."""
+        start_ms = to_ms(start) if start is not None else None
+        end_ms = to_ms(end) if end is not None else None
+        start_month = month_key(start_ms) if start_ms is not None else ""
+        end_month = month_key(end_ms - 1) if end_ms is not None else "9999"
+        cols = list(columns) if columns else COLUMNS
+        read_cols = cols if TS_COLUMN in cols else cols + [TS_COLUMN]
+        filters = []
+        if start_ms is not None:
+            filters.append((TS_COLUMN, ">=", start_ms))
+        if end_ms is not None:
+            filters.append((TS_COLUMN, "<", end_ms))
+        frames = []
+        for month in self.months(ticker):
+            if not start_month <= month <= end_month:
+                continue
+            pf = fastparquet.ParquetFile(self.path(ticker, month))
+            # filters prune row groups on their statistics only
+            df = pf.to_pandas(columns=read_cols, filters=filters or None)
+            if not df.empty:
+                frames.append(df)
+        if not frames:
+            return None
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        ts = df[TS_COLUMN].to_numpy()
+        mask = np.ones(len(df), dtype=bool)
+        if start_ms is not None:
+            mask &= ts >= start_ms
+        if end_ms is not None:
+            mask &= ts < end_ms
+        df = df[mask] if not mask.all() else df
+        return df[cols].reset_index(drop=True)
+
+    def query(
+        self,
+        tickers: Iterable[str],
+        start=None,
+        end=None,
+        columns: Optional[List[str]] = None,
+        max_workers: int = 8,
+    ) -> Dict[str, pd.DataFrame]:
+        """read_ticker for many tickers in parallel; tickers without data in
+        the range are left out."""
+        tickers = list(tickers)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            frames = pool.map(
+                lambda t: self.read_ticker(t, start, end, columns), tickers
+            )
+            return {t: df for t, df in zip(tickers, frames) if df is not None}
+
+
+def _csv_month(fname: str) -> str:
+    # 2024-03-05.csv (daily) or 2024-03-01.csv (monthly)
+    return fname[:7]
+
+
+def convert_ticker(store: OHLCVStore, ticker_dir: str, ticker: str) -> int:
+    """All CSVs of one ticker -> monthly partitions. Returns rows written."""
+    by_month = defaultdict(list)
+    for fname in sorted(os.listdir(ticker_dir)):
+        if fname.endswith(".csv"):
+            by_month[_csv_month(fname)].append(os.path.join(ticker_dir, fname))
+    n = 0
+    for month, fpaths in sorted(by_month.items()):
+        frames = []
+        for fpath in fpaths:
+            try:
+                frames.append(pd.read_csv(fpath, usecols=COLUMNS))
+            except Exception as e:
+                logger.warning(f"Skipping {fpath}: {e}")
+        frames = [df for df in frames if not df.empty]
+        if not frames:
+            continue
+        df = normalize(pd.concat(frames, ignore_index=True))
+        store._write_file(store.path(ticker, month), df)
+        n += len(df)
+    return n
+
+
+def convert_csv_tree(
+    csv_root: str = CSV_ROOT_DIR,
+    store_root: str = ROOT_DIR,
+    type_: str = "perps",
+    interval: str = "1m",
+    tickers: Optional[List[str]] = None,
+    max_workers: int = 8,
+) -> OHLCVStore:
+    """One-time import of {csv_root}/{type_}/{interval}/{TICKER}/*.csv.
+    Existing partitions for a converted month are replaced."""
+    store = OHLCVStore(store_root, exchange=f"binance_{type_}", interval=interval)
+    src = os.path.join(csv_root, type_, interval.lower())
+    if tickers is None:
+        tickers = sorted(
+            d for d in os.listdir(src) if os.path.isdir(os.path.join(src, d))
+        )
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(
+                convert_ticker, store, os.path.join(src, t.replace("/", "")), t
+            ): t
+            for t in tickers
+        }
+        for future in concurrent.futures.as_completed(futures):
+            ticker = futures[future]
+            try:
+                logger.info(f"Converted {ticker}: {future.result()} rows")
+            except Exception as e:
+                logger.error(f"Error converting {ticker}: {e}")
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv-root", default=CSV_ROOT_DIR)
+    parser.add_argument("--store-root", default=ROOT_DIR)
+    parser.add_argument("--type", default="perps", choices=["perps", "spot"])
+    parser.add_argument("--interval", default="1m")
+    parser.add_argument("--tickers", nargs="*", default=None)
+    args = parser.parse_args()
+    convert_csv_tree(
+        args.csv_root, args.store_root, args.type, args.interval, args.tickers
+    )
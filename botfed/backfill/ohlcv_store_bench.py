@@ -0,0 +1,104 @@
+"""
+Compares build_dfs on the CSV tree with build_dfs on an OHLCVStore, on a
+synthetic 1m universe written to a temp dir.
+
+    python -m botfed.backfill.ohlcv_store_bench --coins 20 --days 90
+"""
+
+import argparse
+import datetime as dt
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from .binance_common import ticker_outpath
+from .local_data import build_dfs, coin_to_binance_contract
+from .ohlcv_store import convert_csv_tree
+
+COINS = ["BTC", "ETH", "SOL", "DOGE", "BNB", "ADA", "AVAX", "LINK", "DOT", "LTC"]
+
+
+def write_csv_tree(root, coins, sdate, days, seed=0):
+    rng = np.random.default_rng(seed)
+    outdir = os.path.join(root, "binance_ohlcv/perps/1m")
+    for coin in coins:
+        px = 100.0
+        for d in range(days):
+            date = sdate + dt.timedelta(days=d)
+            open_time = int(date.timestamp() * 1000) + 60_000 * np.arange(1440)
+            close = px * np.exp(np.cumsum(rng.normal(0, 1e-3, 1440)))
+            px = close[-1]
+            opn = np.r_[close[0], close[:-1]]
+            df = pd.DataFrame(
+                {
+                    "open_time": open_time,
+                    "open": opn,
+                    "high": np.maximum(opn, close) * 1.0005,
+                    "low": np.minimum(opn, close) * 0.9995,
+                    "close": close,
+                    "volume": rng.uniform(1, 100, 1440),
+                    "close_time": open_time + 59_999,
+                    "quote_asset_volume": rng.uniform(100, 1e4, 1440),
+                    "num_trades": rng.integers(1, 500, 1440),
+                    "taker_buy_base_asset_volume": rng.uniform(0, 50, 1440),
+                    "taker_buy_quote_asset_volume": rng.uniform(0, 5e3, 1440),
+                    "ignore": 0,
+                }
+            )
+            fpath = ticker_outpath(coin_to_binance_contract(coin), date, outdir)
+            os.makedirs(os.path.dirname(fpath), exist_ok=True)
+            df.to_csv(fpath, index=False)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--coins", type=int, default=10)
+    parser.add_argument("--days", type=int, default=60)
+    args = parser.parse_args()
+
+    coins = [
+        COINS[i % len(COINS)] + ("" if i < len(COINS) else str(i))
+        for i in range(args.coins)
+    ]
+    sdate = dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc)
+    edate = sdate + dt.timedelta(days=args.days - 1)
+    with tempfile.TemporaryDirectory() as root:
+        write_csv_tree(root, coins, sdate, args.days)
+        store_root = os.path.join(root, "ohlcv_store")
+        store, t_convert = timed(
+            lambda: convert_csv_tree(os.path.join(root, "binance_ohlcv"), store_root)
+        )
+        csv_dfs, t_csv = timed(lambda: build_dfs(coins, sdate, edate, root_dir=root))
+        pq_dfs, t_pq = timed(lambda: build_dfs(coins, sdate, edate, store=store))
+        for coin in coins:
+            pd.testing.assert_frame_equal(
+                csv_dfs[coin], pq_dfs[coin], check_freq=False, check_dtype=False
+            )
+        # one week slice, two columns: only those row groups are decoded
+        wstart = sdate + dt.timedelta(days=args.days // 2)
+        _, t_slice = timed(
+            lambda: store.query(
+                [coin_to_binance_contract(c) for c in coins],
+                wstart,
+                wstart + dt.timedelta(days=7),
+                columns=["open_time", "close"],
+            )
+        )
+        print(f"{args.coins} coins x {args.days} days of 1m klines")
+        print(f"convert csv -> parquet  {t_convert:8.2f}s (one time)")
+        print(f"build_dfs csv           {t_csv:8.2f}s")
+        print(f"build_dfs parquet       {t_pq:8.2f}s ({t_csv / t_pq:.1f}x)")
+        print(f"query 1 week, 2 columns {t_slice:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
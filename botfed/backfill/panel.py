@@ -0,0 +1,177 @@
+"""
+Aligned (time x coin) matrices of close, volume and log returns.
+
+build_dfs makes one resampled DataFrame per coin with a dozen derived
+columns, on threads that mostly wait for the GIL. When a strategy only needs
+a few fields for many coins, load_panel:
+
+- allocates one (T, N) array per field up front, T = number of bars in
+  [sdate, edate], in shared memory, so memory is bounded by the window and
+  nothing is concatenated or realigned afterwards;
+- decodes the day files (or OHLCVStore partitions) of each coin in a
+  process pool, each worker writing its coin's column straight into the
+  shared arrays by bar index (open_time - start) / interval;
+- computes returns on the whole close matrix at once.
+
+Bars without data stay NaN. Unlike build_dfs nothing is backfilled, files
+missing from the manifest are left out.
+
+    panel = load_panel(coins, sdate, edate)
+    panel.frame("close")  # DataFrame, index open time, one column per coin
+"""
+
+import concurrent.futures
+import datetime as dt
+import os
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from ..binance.universe import coin_to_binance_contract
+from ..logger import get_logger
+from .binance_common import ticker_outpath
+from .manifest import manifest_for
+from .ohlcv_store import OHLCVStore, interval_ms, to_ms
+
+logger = get_logger(__name__)
+
+ROOT_DIR = "../data"
+FIELDS = ("close", "volume")
+
+
+@dataclass
+class Panel:
+    index: pd.DatetimeIndex
+    coins: List[str]
+    close: np.ndarray
+    volume: np.ndarray
+    r: np.ndarray
+    # keeps the shared memory behind close / volume mapped
+    _shms: list = None
+
+    def frame(self, field: str) -> pd.DataFrame:
+        return pd.DataFrame(getattr(self, field), index=self.index, columns=self.coins)
+
+
+def _partitions(coin, sdate, edate, root_dir, type_, interval) -> Tuple[str, List[str]]:
+    """Ticker and the day (1m) / month files covering [sdate, edate]."""
+    ticker = coin_to_binance_contract(coin)
+    if type_ == "spot":
+        ticker = ticker.replace("USDT", "_USDT")
+    outdir = os.path.join(root_dir, f"binance_ohlcv/{type_}/{interval.lower()}")
+    date = sdate.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "1m":
+        delta = dt.timedelta(days=1)
+    else:
+        date = date.replace(day=1)
+        delta = relativedelta(months=1)
+    fpaths = []
+    while date.date() <= edate.date():
+        fpaths.append(ticker_outpath(ticker, date, outdir))
+        date += delta
+    return ticker, fpaths
+
+
+def _load_coin(job: Dict) -> int:
+    """Worker: decode one coin and write it into column j of the shared
+    arrays. Returns the number of bars written."""
+    shms = {f: shared_memory.SharedMemory(name=n) for f, n in job["shm"].items()}
+    try:
+        shape, dtype = job["shape"], job["dtype"]
+        arrays = {
+            f: np.ndarray(shape, dtype=dtype, buffer=shm.buf) for f, shm in shms.items()
+        }
+        cols = ["open_time", *arrays]
+        if job["store"] is not None:
+            df = job["store"].read_ticker(
+                job["ticker"], job["start_ms"], job["end_ms"], columns=cols
+            )
+            frames = [] if df is None else [df]
+        else:
+            frames = [
+                pd.read_csv(fpath, usecols=cols, engine="c") for fpath in job["fpaths"]
+            ]
+        n = 0
+        for df in frames:
+            idx = (df["open_time"].to_numpy() - job["start_ms"]) // job["step_ms"]
+            ok = (idx >= 0) & (idx < shape[0])
+            idx = idx[ok]
+            for field, arr in arrays.items():
+                arr[idx, job["j"]] = df[field].to_numpy()[ok]
+            n += len(idx)
+        return n
+    finally:
+        for shm in shms.values():
+            shm.close()
+
+
+def load_panel(
+    coins: List[str],
+    sdate: dt.datetime,
+    edate: dt.datetime,
+    root_dir: str = ROOT_DIR,
+    type_: str = "perps",
+    interval: str = "1m",
+    store: OHLCVStore = None,
+    dtype=np.float64,
+    max_workers: int = None,
+) -> Panel:
+    """Bars with sdate <= open_time < edate (UTC) for coins, in the order
+    given. store: read from an OHLCVStore instead of the CSV tree."""
+    step_ms = interval_ms(interval)
+    start_ms = to_ms(sdate) // step_ms * step_ms
+    end_ms = to_ms(edate)
+    n_bars = max(0, -(-(end_ms - start_ms) // step_ms))
+    shape = (n_bars, len(coins))
+    nbytes = max(1, n_bars * len(coins) * np.dtype(dtype).itemsize)
+    shms = {f: shared_memory.SharedMemory(create=True, size=nbytes) for f in FIELDS}
+    try:
+        arrays = {
+            f: np.ndarray(shape, dtype=dtype, buffer=shm.buf) for f, shm in shms.items()
+        }
+        for arr in arrays.values():
+            arr.fill(np.nan)
+        jobs = []
+        for j, coin in enumerate(coins):
+            ticker, fpaths = _partitions(coin, sdate, edate, root_dir, type_, interval)
+            if store is None:
+                fpaths = [
+                    f for f in fpaths if manifest_for(f).is_complete(f, verify=True)
+                ]
+            jobs.append(
+                {
+                    "j": j,
+                    "ticker": ticker,
+                    "fpaths": fpaths,
+                    "store": store,
+                    "start_ms": start_ms,
+                    "end_ms": end_ms,
+                    "step_ms": step_ms,
+                    "shape": shape,
+                    "dtype": dtype,
+                    "shm": {f: shm.name for f, shm in shms.items()},
+                }
+            )
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as pool:
+            for coin, n in zip(coins, pool.map(_load_coin, jobs, chunksize=4)):
+                if n == 0:
+                    logger.warning(f"load_panel: no data for {coin}")
+    finally:
+        # the mappings stay valid in this process after unlink, so the arrays
+        # are used in place and the segments go away with them
+        for shm in shms.values():
+            shm.unlink()
+    close, volume = arrays["close"], arrays["volume"]
+    r = np.full_like(close, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.log(close[1:] / close[:-1], out=r[1:])
+    index = pd.date_range(
+        pd.Timestamp(start_ms, unit="ms", tz="UTC"),
+        periods=n_bars,
+        freq=pd.Timedelta(milliseconds=step_ms),
+    )
+    return Panel(index, list(coins), close, volume, r, list(shms.values()))
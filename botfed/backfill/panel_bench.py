@@ -0,0 +1,86 @@
+"""
+load_panel vs build_dfs + aligning the per-coin frames, on a synthetic 1m
+universe written to a temp dir (CSV tree, and the same data in an
+OHLCVStore with --store).
+
+    python -m botfed.backfill.panel_bench --coins 300 --days 365 --store
+"""
+
+import argparse
+import datetime as dt
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from .local_data import build_dfs
+from .ohlcv_store import convert_csv_tree
+from .ohlcv_store_bench import write_csv_tree
+from .panel import load_panel
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def build_dfs_matrix(coins, sdate, edate, **kwargs) -> pd.DataFrame:
+    """What callers do today: per-coin frames, then align the close column."""
+    dfs = build_dfs(coins, sdate, edate, **kwargs)
+    return pd.concat({coin: dfs[coin]["close"] for coin in coins}, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--coins", type=int, default=300)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--store", action="store_true", help="also from Parquet")
+    args = parser.parse_args()
+
+    coins = [f"C{i}" for i in range(args.coins)]
+    sdate = dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc)
+    edate = sdate + dt.timedelta(days=args.days - 1)
+    end = sdate + dt.timedelta(days=args.days)
+    with tempfile.TemporaryDirectory() as root:
+        write_csv_tree(root, coins, sdate, args.days)
+        ref, t_ref = timed(lambda: build_dfs_matrix(coins, sdate, edate, root_dir=root))
+        panel, t_panel = timed(
+            lambda: load_panel(
+                coins, sdate, end, root_dir=root, max_workers=args.workers
+            )
+        )
+        close = panel.frame("close")
+        common = ref.index.intersection(close.index)
+        np.testing.assert_allclose(
+            ref.loc[common, coins].to_numpy(), close.loc[common].to_numpy()
+        )
+        print(f"{args.coins} coins x {args.days} days of 1m klines")
+        print(f"build_dfs + align close (csv) {t_ref:8.2f}s")
+        print(f"load_panel (csv)              {t_panel:8.2f}s ({t_ref / t_panel:.1f}x)")
+        if args.store:
+            store = convert_csv_tree(
+                os.path.join(root, "binance_ohlcv"), os.path.join(root, "store")
+            )
+            ref, t_ref = timed(
+                lambda: build_dfs_matrix(coins, sdate, edate, store=store)
+            )
+            panel, t_panel = timed(
+                lambda: load_panel(
+                    coins, sdate, end, store=store, max_workers=args.workers
+                )
+            )
+            print(f"build_dfs + align close (pq)  {t_ref:8.2f}s")
+            print(
+                f"load_panel (pq)               {t_panel:8.2f}s "
+                f"({t_ref / t_panel:.1f}x)"
+            )
+        mb = 3 * panel.close.nbytes / 1e6
+        print(f"panel arrays {panel.close.shape}, {mb:.0f} MB for 3 fields")
+
+
+if __name__ == "__main__":
+    main()
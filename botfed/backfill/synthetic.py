@@ -0,0 +1,55 @@
+"""
+Generated klines and aggTrades with the archive / store column layout, for
+fixtures, benches and tests.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .ohlcv_store import MS_PER_DAY, interval_ms
+
+
+def synthetic_klines(rng, start_ms, end_ms, interval="1m", ts_mult=1) -> pd.DataFrame:
+    """Random-walk klines in the archive column layout, timestamps in ms
+    times ts_mult (1000 for the us of spot archives)."""
+    step = interval_ms(interval)
+    t = np.arange(start_ms, end_ms, step, dtype=np.int64)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 1e-3, len(t))))
+    df = pd.DataFrame(
+        {
+            "open_time": t * ts_mult,
+            "open": close,
+            "high": close * 1.001,
+            "low": close * 0.999,
+            "close": close,
+            "volume": rng.uniform(1, 100, len(t)),
+            "close_time": (t + step - 1) * ts_mult,
+            "quote_volume": rng.uniform(100, 1e4, len(t)),
+            "count": rng.integers(1, 500, len(t)),
+            "taker_buy_volume": rng.uniform(0, 50, len(t)),
+            "taker_buy_quote_volume": rng.uniform(0, 5e3, len(t)),
+            "ignore": 0,
+        }
+    )
+    return df
+
+
+def synthetic_agg_trades(
+    rng, start_ms, end_ms, per_day, ts_mult=1, first_id=1
+) -> pd.DataFrame:
+    """aggTrades in TradeStore / archive columns, uniformly spread over
+    [start_ms, end_ms), each one standing for three raw trades."""
+    n = int(per_day * (end_ms - start_ms) / MS_PER_DAY)
+    ts = np.sort(rng.integers(start_ms, end_ms, n))
+    ids = first_id + np.arange(n)
+    return pd.DataFrame(
+        {
+            "agg_trade_id": ids,
+            "price": 100 + rng.normal(0, 1, n).cumsum() / 100,
+            "quantity": rng.uniform(0.001, 2, n),
+            "first_trade_id": ids * 3,
+            "last_trade_id": ids * 3 + 2,
+            "transact_time": ts * ts_mult,
+            "is_buyer_maker": rng.random(n) < 0.5,
+        }
+    )
@@ -0,0 +1,99 @@
+"""
+Partitioned Parquet store for aggregated trades.
+
+Layout: {root}/{exchange}/aggTrades/{TICKER}/{YYYY-MM-DD}.parquet, one file
+per day (a liquid perp does millions of aggTrades a day), typed columns and
+row groups with transact_time statistics, like OHLCVStore for klines.
+"""
+
+import datetime as dt
+import os
+from typing import List, Optional
+
+import fastparquet
+import numpy as np
+import pandas as pd
+
+from .ohlcv_store import MS_PER_DAY, to_ms
+
+ROOT_DIR = "../data/trade_store"
+
+DTYPES = {
+    "agg_trade_id": np.int64,
+    "price": np.float64,
+    "quantity": np.float64,
+    "first_trade_id": np.int64,
+    "last_trade_id": np.int64,
+    "transact_time": np.int64,
+    "is_buyer_maker": bool,
+}
+COLUMNS = list(DTYPES)
+TS_COLUMN = "transact_time"
+ROW_GROUP_ROWS = 1_000_000
+
+
+def day_key(ms: int) -> str:
+    return dt.datetime.fromtimestamp(ms / 1000, dt.timezone.utc).strftime("%Y-%m-%d")
+
+
+class TradeStore:
+
+    def __init__(self, root: str = ROOT_DIR, exchange: str = "binance_perps"):
+        self.root = root
+        self.exchange = exchange
+
+    def ticker_dir(self, ticker: str) -> str:
+        return os.path.join(self.root, self.exchange, "aggTrades", ticker)
+
+    def path(self, ticker: str, day: str) -> str:
+        return os.path.join(self.ticker_dir(ticker), f"{day}.parquet")
+
+    def days(self, ticker: str) -> List[str]:
+        tdir = self.ticker_dir(ticker)
+        if not os.path.isdir(tdir):
+            return []
+        return sorted(f[:-8] for f in os.listdir(tdir) if f.endswith(".parquet"))
+
+    def has_day(self, ticker: str, day: str) -> bool:
+        return os.path.exists(self.path(ticker, day))
+
+    def write_day(self, ticker: str, day: str, df: pd.DataFrame):
+        """Replace one day, written to a temp file and renamed into place."""
+        df = df[COLUMNS].astype(DTYPES).sort_values(TS_COLUMN, kind="stable")
+        fpath = self.path(ticker, day)
+        os.makedirs(os.path.dirname(fpath), exist_ok=True)
+        tmp = fpath + ".tmp"
+        fastparquet.write(
+            tmp,
+            df.reset_index(drop=True),
+            row_group_offsets=ROW_GROUP_ROWS,
+            compression="SNAPPY",
+            write_index=False,
+            stats=[TS_COLUMN, "agg_trade_id"],
+        )
+        os.replace(tmp, fpath)
+
+    def read(
+        self, ticker: str, start, end, columns: Optional[List[str]] = None
+    ) -> Optional[pd.DataFrame]:
+        """Trades with start <= transact_time < end, None if there are none."""
+        start_ms, end_ms = to_ms(start), to_ms(end)
+        cols = list(columns) if columns else COLUMNS
+        read_cols = cols if TS_COLUMN in cols else cols + [TS_COLUMN]
+        frames = []
+        for day in self.days(ticker):
+            day_ms = to_ms(day)
+            if day_ms + MS_PER_DAY <= start_ms or day_ms >= end_ms:
+                continue
+            pf = fastparquet.ParquetFile(self.path(ticker, day))
+            df = pf.to_pandas(
+                columns=read_cols,
+                filters=[(TS_COLUMN, ">=", start_ms), (TS_COLUMN, "<", end_ms)],
+            )
+            frames.append(df)
+        if not frames:
+            return None
+        df = pd.concat(frames, ignore_index=True)
+        ts = df[TS_COLUMN].to_numpy()
+        df = df[(ts >= start_ms) & (ts < end_ms)]
+        return df[cols].reset_index(drop=True)
@@ -0,0 +1,271 @@
+"""
+OHLCV bars built locally from aggTrades and BBO updates.
+
+The exchange kline stream only publishes closed bars of 1m and up, with
+added delay. BarAggregator builds bars of any interval (1s, 5s, 15s, ...)
+from TradeFeed aggTrades and the shm BBO stream (FastBBO):
+
+- trades: open / high / low / close, volume, quote volume, VWAP, taker buy
+  volume and the number of trades (raw trades, as counted in klines);
+- quotes: mid open / high / low / close and the closing microprice.
+
+Events are bucketed by exchange time (stamp="exch", bars line up with the
+exchange klines) or by core.time at arrival (stamp="local", bars on our own
+clock). A coin's bar is closed once core.time passes its end + grace_ms,
+checked in run_ticks(), or as soon as a later trade for the coin arrives,
+so live runs and sim replays close bars the same way (quotes come on their
+own stream and never close a bar early). A bar without trades repeats the
+last close with zero volume, like exchange klines; until a coin's first
+trade its bars carry the quote fields only, with NaN trade prices.
+KLineStore skips those. Events for a bar that was already closed are
+dropped and counted in `late`.
+
+Closed bars go to listeners' on_event() in the KLineStore event format,
+with the extra fields in data:
+
+    {"e": "kline", "timestamp": open_time,
+     "data": {"exch", "coin", "open", "high", "low", "close", "volume", ...}}
+
+    agg = BarAggregator(interval_ms=5000)
+    trade_feed.add_listener(agg)
+    agg.attach_bbo(fast_bbo)
+    agg.add_listener(kline_store)
+    event_loop.add_feed(agg)
+
+tests/test_bar_aggregator.py checks the bars against pandas on generated
+trades and, given BARS_TICKER / BARS_DAY / BARS_TRADE_ROOT /
+BARS_OHLCV_ROOT, the 1m bars against exchange klines on recorded aggTrades.
+"""
+
+import collections
+from typing import Callable, Dict
+
+from ..core import time
+from ..core.feed import Feed
+from .universe import binance_contract_to_coin
+
+GRACE_MS = 200
+NAN = float("nan")
+
+
+class _Bar:
+    """One coin's bar in progress."""
+
+    __slots__ = (
+        "start",
+        "o",
+        "h",
+        "l",
+        "c",
+        "v",
+        "qv",
+        "buy_v",
+        "n",
+        "mo",
+        "mh",
+        "ml",
+        "mc",
+        "micro",
+        "nq",
+    )
+
+    def __init__(self, start: int, prev: "_Bar" = None):
+        self.start = start
+        # until the first trade / quote the bar is flat at the previous close
+        c = prev.c if prev is not None else None
+        mc = prev.mc if prev is not None else None
+        self.o = self.h = self.l = self.c = c
+        self.mo = self.mh = self.ml = self.mc = mc
+        self.micro = prev.micro if prev is not None else None
+        self.v = self.qv = self.buy_v = 0.0
+        self.n = self.nq = 0
+
+    def trade(self, price: float, qty: float, is_buy: bool, n: int):
+        if self.n == 0:
+            self.o = self.h = self.l = price
+        elif price > self.h:
+            self.h = price
+        elif price < self.l:
+            self.l = price
+        self.c = price
+        self.v += qty
+        self.qv += price * qty
+        if is_buy:
+            self.buy_v += qty
+        self.n += n
+
+    def quote(self, mid: float, micro: float):
+        if self.nq == 0:
+            self.mo = self.mh = self.ml = mid
+        elif mid > self.mh:
+            self.mh = mid
+        elif mid < self.ml:
+            self.ml = mid
+        self.mc = mid
+        self.micro = micro
+        self.nq += 1
+
+
+class BarAggregator(Feed):
+
+    def __init__(
+        self,
+        interval_ms: int = 1000,
+        exch: str = "bin",
+        stamp: str = "exch",
+        grace_ms: int = GRACE_MS,
+    ):
+        assert stamp in ("exch", "local")
+        Feed.__init__(self)
+        self.interval_ms = interval_ms
+        self.exch = exch
+        self.stamp = stamp
+        self.grace_ms = grace_ms
+        self.bars: Dict[str, _Bar] = {}
+        # quotes of bars after the one in progress, (start, mid, micro)
+        self.pending: Dict[str, collections.deque] = {}
+        # earliest time a bar in progress can be closed by the clock
+        self.next_close_ms = None
+        self.late = 0
+
+    # inputs
+
+    def _start(self, ts: int) -> int:
+        if self.stamp == "local":
+            ts = time.time_ms()
+        return ts - ts % self.interval_ms
+
+    def on_agg_trade(self, event_data):
+        """aggTrade as sent by TradeFeed."""
+        coin = binance_contract_to_coin(event_data["s"])
+        start = self._start(event_data["T"])
+        bar = self.bars.get(coin)
+        if bar is None:
+            bar = self._open(coin, start)
+        elif start < bar.start:
+            self.late += 1
+            return
+        elif start > bar.start:
+            # a coin's trades come in order, its bar is complete
+            bar = self._close_until(coin, start)
+        n = event_data["l"] - event_data["f"] + 1 if "f" in event_data else 1
+        bar.trade(
+            float(event_data["p"]),
+            float(event_data["q"]),
+            not event_data["m"],
+            n,
+        )
+
+    def on_quote(self, coin: str, ts: int, b: float, a: float, bq: float, aq: float):
+        start = self._start(ts)
+        depth = bq + aq
+        micro = (b * aq + a * bq) / depth if depth > 0 else (b + a) / 2
+        mid = (b + a) / 2
+        bar = self.bars.get(coin)
+        if bar is None:
+            bar = self._open(coin, start)
+        elif start < bar.start:
+            self.late += 1
+            return
+        elif start > bar.start:
+            # quotes are a separate stream and can run ahead of the trades,
+            # they wait for the bar to be closed by a trade or the clock
+            self.pending[coin].append((start, mid, micro))
+            return
+        bar.quote(mid, micro)
+
+    def on_book_update(self, data):
+        """Raw bookTicker message, as FastBBOFeed queues them."""
+        self.on_quote(
+            binance_contract_to_coin(data["s"]),
+            int(data["T"]),
+            float(data["b"]),
+            float(data["a"]),
+            float(data["B"]),
+            float(data["A"]),
+        )
+
+    def attach_bbo(
+        self, fast_bbo, to_coin: Callable[[str], str] = binance_contract_to_coin
+    ):
+        """Follow a FastBBO's updates. to_coin maps its symbols (after its
+        ticker_converter) to coins; pass lambda s: s if they already are."""
+
+        def on_update(symbol):
+            bbo = fast_bbo.get_bbo(symbol)
+            self.on_quote(
+                to_coin(symbol),
+                int(bbo["exch_ts"]),
+                bbo["b"],
+                bbo["a"],
+                bbo["bq"],
+                bbo["aq"],
+            )
+
+        fast_bbo.add_listener_any(on_update)
+
+    # closing
+
+    def _open(self, coin: str, start: int) -> _Bar:
+        bar = self.bars[coin] = _Bar(start)
+        self.pending[coin] = collections.deque()
+        close_ms = start + self.interval_ms + self.grace_ms
+        if self.next_close_ms is None or close_ms < self.next_close_ms:
+            self.next_close_ms = close_ms
+        return bar
+
+    def _close_until(self, coin: str, start: int) -> _Bar:
+        """Emit the coin's bars that start before `start`, empty ones
+        included, and return the bar in progress."""
+        bar = self.bars[coin]
+        pending = self.pending[coin]
+        while bar.start < start:
+            if bar.c is not None or bar.mc is not None:
+                self._emit(coin, bar)
+            bar = _Bar(bar.start + self.interval_ms, bar)
+            while pending and pending[0][0] == bar.start:
+                _, mid, micro = pending.popleft()
+                bar.quote(mid, micro)
+        self.bars[coin] = bar
+        return bar
+
+    def run_ticks(self):
+        now = time.time_ms()
+        if self.next_close_ms is None or now < self.next_close_ms:
+            return
+        # bars that ended at least grace_ms ago
+        cutoff = now - self.grace_ms
+        cutoff -= cutoff % self.interval_ms
+        for coin, bar in self.bars.items():
+            if bar.start < cutoff:
+                self._close_until(coin, cutoff)
+        self.next_close_ms = cutoff + self.interval_ms + self.grace_ms
+
+    def _emit(self, coin: str, bar: _Bar):
+        def num(x):
+            return NAN if x is None else x
+
+        data = {
+            "exch": self.exch,
+            "coin": coin,
+            "open_time": bar.start,
+            "close_time": bar.start + self.interval_ms - 1,
+            "interval_ms": self.interval_ms,
+            "open": num(bar.o),
+            "high": num(bar.h),
+            "low": num(bar.l),
+            "close": num(bar.c),
+            "volume": bar.v,
+            "quote_volume": bar.qv,
+            "vwap": bar.qv / bar.v if bar.v else num(bar.c),
+            "buy_volume": bar.buy_v,
+            "trades": bar.n,
+            "mid_open": num(bar.mo),
+            "mid_high": num(bar.mh),
+            "mid_low": num(bar.ml),
+            "mid_close": num(bar.mc),
+            "micro": num(bar.micro),
+        }
+        event = {"e": "kline", "timestamp": bar.start, "data": data}
+        for listener in self.listeners:
+            listener.on_event(event)
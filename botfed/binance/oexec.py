@@ -1,4 +1,5 @@
 from typing import List
+import json
 import os
 import dotenv
 
@@ -18,6 +19,8 @@ dotenv.load_dotenv()
 BIN_API_KEY = os.getenv("BIN_API_KEY")
 BIN_API_SECRET = os.getenv("BIN_API_SECRET")
 
+MAX_BATCH_CANCEL = 10
+
 
 class BinExec:
 
@@ -46,48 +49,37 @@ class BinExec:
         result = []
         for symbol in symbols:
             cancels = [el for el in orders if el["coin"] == symbol and el.get("cloid")]
-            for el in cancels:
+            # DELETE /fapi/v1/batchOrders takes up to 10 ids of one symbol
+            for i in range(0, len(cancels), MAX_BATCH_CANCEL):
+                chunk = cancels[i : i + MAX_BATCH_CANCEL]
                 try:
-                    resp = self.client.futures_cancel_order(
-                        symbol=symbol, origClientOrderId=el["cloid"]
+                    resps = self.client.futures_cancel_orders(
+                        symbol=symbol,
+                        origClientOrderIdList=json.dumps([el["cloid"] for el in chunk]),
                     )
-                    if "clientOrderId" not in resp:
-                        resp = {
-                            "status": "UNKOWN",
-                            "cloid": el["cloid"],
-                            "oid": el.get("oid"),
-                            "updateTime": el.get("exch_update_time"),
-                            "error_msg": resp,
-                        }
+                except Exception as e:
+                    logger.error(f"Error cancelling orders: {e}")
+                    resps = [{"code": None, "msg": str(e)}] * len(chunk)
+                for el, resp in zip(chunk, resps):
+                    if "clientOrderId" in resp:
                         result.append(
                             OrderResp(
                                 cloid=resp["clientOrderId"],
                                 status=resp["status"],
                                 oid=resp["orderId"],
                                 update_time=resp["updateTime"],
-                                error_msg=resp.get("error_msg"),
                             )
                         )
                     else:
                         result.append(
                             OrderResp(
-                                cloid=resp["clientOrderId"],
-                                status=resp["status"],
-                                oid=resp["orderId"],
-                                update_time=resp["updateTime"],
+                                cloid=el["cloid"],
+                                oid=el.get("oid"),
+                                status="ERROR",
+                                update_time=el.get("exch_update_time"),
+                                error_msg=resp.get("msg", str(resp)),
                             )
                         )
-
-                except Exception as e:
-                    logger.error(f"Error cancelling order: {e}")
-                    result.append(
-                        OrderResp(
-                            cloid=el["cloid"],
-                            oid=el.get("oid"),
-                            status="ERROR",
-                            error_msg=str(e),
-                        )
-                    )
         return result
 
     def submit_market_order(self, orders) -> List[OrderResp]:
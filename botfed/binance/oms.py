@@ -1,15 +1,13 @@
-import os
-import requests
-import math
-import json
 import time
 import uuid
-import threading
-import queue
-from typing import Mapping, List
+from typing import List
 from ..core.timer_feed import TimerListener
 from ..core.oms import OMS, LocalOrder, OrderStatus
-from ..core.fast_bbo import FastBBO
+from ..core.order_store import OrderStore
+from ..core.oms_journal import OMSJournal
+from ..core.event_loop import EventLoop
+from ..core.order_batcher import OrderBatcher
+from ..core.instruments import get_instruments
 from ..tradeserver.client import TradeClient
 from ..logger import get_logger
 from .universe import coin_to_binance_contract
@@ -17,27 +15,6 @@ from .universe import coin_to_binance_contract
 logger = get_logger(__name__)
 
 
-def get_exchange_info():
-    url = "https://fapi.binance.com/fapi/v1/exchangeInfo"
-    resp = requests.get(url)
-    resp.raise_for_status()
-    data = resp.json()
-    return data
-
-
-def get_precision(symbol, data):
-
-    for s in data["symbols"]:
-        if s["symbol"] == symbol:
-            for f in s["filters"]:
-                if f["filterType"] == "LOT_SIZE":
-                    step_size = float(f["stepSize"])
-                    precision = abs(int(round(math.log10(step_size))))
-                    return precision
-
-    raise ValueError(f"Symbol {symbol} not found.")
-
-
 def bin_status_to_local(status):
     if status == "NEW":
         return OrderStatus.ACTIVE
@@ -98,22 +75,62 @@ class BinOMS(OMS, TimerListener):
         self,
         tc: TradeClient,
         stop_event,
-        state_file="../data/prod/bin_account.json",
+        journal_dir="../data/prod/bin_journal",
+        batch_window_ms=0,
+        event_loop: EventLoop = None,
     ):
         self.tc = tc
+        self.batcher = OrderBatcher(
+            self.tc.submit, window_ms=batch_window_ms, on_annulled=self.on_annulled
+        )
+        if batch_window_ms > 0:
+            # held intents are only flushed from the batcher's run_ticks
+            if event_loop is None:
+                raise ValueError("batch_window_ms > 0 needs an event_loop")
+            event_loop.add_feed(self.batcher)
         self.tc.add_listener(self.from_trade_server)
         self.positions = {}
-        self.symbol_info = self.get_exchange_info()
+        self.instruments = get_instruments("bin")
         OMS.__init__(self)
         self.listeners = []
-        self.orders_cloid: Mapping[str, LocalOrder] = {}
+        self.orders_cloid: OrderStore = OrderStore()
         self.removed_orders = []
-        self.state_file = state_file
-        self.queue = queue.Queue()
         self.stop_event = stop_event
-        self.thread = threading.Thread(target=self.record_state)
-        self.thread.start()
-        self.exchange_info = get_exchange_info()
+        self.journal = OMSJournal(journal_dir, stop_event) if journal_dir else None
+        if self.journal:
+            self.restore(self.journal.recovered)
+            self.orders_cloid.journal = self.journal
+        self.thread = self.journal.thread if self.journal else None
+
+    def restore(self, state):
+        """Restore orders and positions from a recovered journal. The account
+        stays not ready until the first live account update."""
+        for cloid, order in state["orders"].items():
+            self.orders_cloid[cloid] = order
+        self.account["positions"] = state["positions"]
+        self.account["assets"] = state["account"].get("assets", {})
+        logger.info(
+            f"BinOMS: restored {len(state['orders'])} orders, "
+            f"{len(state['positions'])} positions from journal"
+        )
+
+    def journal_state(self):
+        return {
+            "orders": {
+                cloid: dict(order) for cloid, order in self.orders_cloid.items()
+            },
+            "positions": dict(self.account.get("positions", {})),
+            "account": {"assets": dict(self.account.get("assets", {}))},
+        }
+
+    def on_timer(self):
+        if self.journal and self.journal.needs_snapshot:
+            self.journal.snapshot(self.journal_state())
+
+    def on_annulled(self, orders):
+        """New orders cancelled before the batcher ever sent them."""
+        for order in orders:
+            self.orders_cloid.pop(order["cloid"], None)
 
     def next_cloid(self):
         return str(uuid.uuid4()).replace("-", "")[:22]
@@ -159,66 +176,77 @@ class BinOMS(OMS, TimerListener):
                 for el in data["data"]["assets"]
             }
             self.account['ready'] = True
+            if self.journal:
+                self.journal.positions(self.account["positions"])
+                self.journal.account({"assets": self.account["assets"]})
         elif data["type"] == "bin_user_event":
             if data["data"]["e"] == "ORDER_TRADE_UPDATE":
                 self.on_bin_order_update(data["data"])
+            elif data["data"]["e"] == "ACCOUNT_UPDATE":
+                self.on_bin_account_update(data["data"])
         elif data["type"] == "bin_open_orders":
-            created_at = {
-                cloid: order.get("created_at")
-                for cloid, order in self.orders_cloid.items()
+            self.orders_cloid.reconcile(
+                {el["clientOrderId"]: bin_to_local_order(el) for el in data["data"]}
+            )
+
+    def on_bin_account_update(self, data):
+        """Apply the changed balances and positions of an ACCOUNT_UPDATE.
+        The event is not sent on mark price moves: notional and
+        unrealized_profit are as of the last event or UserFeed snapshot."""
+        update = data["a"]
+        positions = self.account.get("positions", {})
+        for pos in update.get("P", []):
+            qty = float(pos["pa"])
+            if qty == 0:
+                positions.pop(pos["s"], None)
+                continue
+            entry_price = float(pos["ep"])
+            unrealized = float(pos["up"])
+            positions[pos["s"]] = {
+                "symbol": pos["s"],
+                "qty": qty,
+                "entry_price": entry_price,
+                # mark value: entry notional plus unrealized pnl
+                "notional": qty * entry_price + unrealized,
+                "unrealized_profit": unrealized,
+            }
+        self.account["positions"] = positions
+        assets = self.account.get("assets", {})
+        for bal in update.get("B", []):
+            prev = assets.get(bal["a"], {})
+            assets[bal["a"]] = {
+                "wallet_balance": float(bal["wb"]),
+                # not part of the event, refreshed by the next snapshot
+                "available_balance": prev.get("available_balance", float(bal["cw"])),
             }
-            self.orders_cloid = {}
-            for el in data["data"]:
-                cloid = el["clientOrderId"]
-                self.orders_cloid[cloid] = bin_to_local_order(el)
-                if cloid in created_at:
-                    self.orders_cloid[cloid]["created_at"] = created_at[cloid]
+        self.account["assets"] = assets
+        if self.journal:
+            self.journal.positions(positions)
+            self.journal.account({"assets": assets})
 
     def on_bin_order_update(self, data):
         cloid = data["o"]["c"]
-        created_at = self.orders_cloid.get(cloid, {}).get("created_at", 0)
-        self.orders_cloid[cloid] = bin_to_local_order(data["o"])
-        self.orders_cloid[cloid]["created_at"] = created_at
         if data["o"]["X"] in ["FILLED", "CANCELED"]:
-            del self.orders_cloid[cloid]
+            self.orders_cloid.pop(cloid, None)
+            return
+        created_at = self.orders_cloid.get(cloid, {}).get("created_at", 0)
+        self.orders_cloid[cloid] = {
+            **bin_to_local_order(data["o"]),
+            "created_at": created_at,
+        }
 
     @property
     def ready(self):
         return self.account.equity() != 0
 
-    def get_exchange_info(self):
-        """Fetch exchange info and extract precision rules for all symbols."""
-        url = f"{self.BASE_URL}/fapi/v1/exchangeInfo"
-        response = requests.get(url)
-        response.raise_for_status()  # Ensure request succeeded
-        exchange_info = response.json()
-        symbol_info = {}
-        for symbol in exchange_info["symbols"]:
-            symbol_info[symbol["symbol"]] = {
-                "pricePrecision": symbol["pricePrecision"],
-                "quantityPrecision": symbol["quantityPrecision"],
-                "minPrice": float(symbol["filters"][0]["minPrice"]),
-                "tickSize": float(symbol["filters"][0]["tickSize"]),
-                "minQty": float(symbol["filters"][2]["minQty"]),
-                "stepSize": float(symbol["filters"][2]["stepSize"]),
-            }
-        return symbol_info
-
     def valid_price(self, symbol: str, price: float):
         """Ensure the price conforms to the tick size of the symbol."""
-        tick_size = self.symbol_info[symbol]["tickSize"]
-        valid_price = math.floor(price / tick_size) * tick_size
-        return float(f"{valid_price:.8f}")  # Ensure precision for API
+        return self.instruments.valid_price(symbol, price)
 
-    def valid_qty(self, symbol: int, qty: float):
-        """Ensure the quantity conforms to the step size of the symbol."""
-        step_size = self.symbol_info[symbol]["stepSize"]
-        min_qty = self.symbol_info[symbol]["minQty"]
-        # Ensure the quantity is above the minimum quantity
-        if qty < min_qty:
-            return 0
-        valid_qty = math.floor(qty / step_size) * step_size
-        return float(f"{valid_qty:.8f}")  # Ensure precision for API
+    def valid_qty(self, symbol: str, qty: float):
+        """Ensure the quantity conforms to the step size of the symbol;
+        0 below the minimum quantity."""
+        return self.instruments.valid_qty(symbol, qty)
 
     def get_open_orders(
         self,
@@ -229,34 +257,21 @@ class BinOMS(OMS, TimerListener):
             OrderStatus.PARTIALLY_FILLED,
         ],
     ) -> List[LocalOrder]:
-        return [
-            el
-            for el in self.orders_cloid.values()
-            if el["coin"] == coin and el.get("status") in statuses
-        ]
+        return self.orders_cloid.get_orders(coin, statuses)
 
     def submit_orders(self, orders: List[LocalOrder], extra={}):
         for order in orders:
             order["cloid"] = self.next_cloid()
-            self.orders_cloid[order["cloid"]] = {**order}
-            self.orders_cloid[order["cloid"]]["status"] = OrderStatus.PENDING_NEW
-        i = 0
-        while i < len(orders):
-            self.tc.submit(
-                {
-                    "type": "bulk",
-                    "exchange": "bin",
-                    "ts_oms_send": time.time() * 1000,
-                    "orders": orders[i : i + 5],
-                    **extra,
-                }
-            )
-            i += 5
+            self.orders_cloid[order["cloid"]] = {
+                **order,
+                "status": OrderStatus.PENDING_NEW,
+            }
+        self.batcher.add("bulk", "bin", orders, extra)
 
     def _submit_market_order(
         self, symbol, qty, side, price=None, slippage_bps=1, extra={}
     ):
-        precision = get_precision(symbol, self.exchange_info)
+        precision = self.instruments.sz_decimals(symbol)
         self.tc.submit(
             {
                 "type": "market",
@@ -275,42 +290,15 @@ class BinOMS(OMS, TimerListener):
     def cancel_orders(self, orders: List[LocalOrder], extra={}):
         if len(orders) == 0:
             return
-        for order in orders:
-            self.tc.submit(
-                {
-                    "type": "cancel",
-                    "exchange": "bin",
-                    "orders": [order],
-                    "ts_oms_send": time.time() * 1000,
-                    **extra,
-                },
-            )
+        self.batcher.add("cancel", "bin", orders, extra)
         for order in orders:
             if order["cloid"] in self.orders_cloid:
-                self.orders_cloid[order["cloid"]]["status"] = OrderStatus.PENDING_CANCEL
-
-    def record_state(self, sleep_ms=1000):
-        if not self.state_file:
-            return
-        # get state file base dir if not none and create if not exists
-        if not os.path.exists(os.path.dirname(self.state_file)):
-            os.makedirs(os.path.dirname(self.state_file))
-        while not self.stop_event.is_set():
-            time.sleep(sleep_ms / 1000)
-            with open(self.state_file, "w") as f:
-                f.write(
-                    json.dumps(
-                        {
-                            "account": self.account,
-                            "positions": self.account.get("positions", {}),
-                            "open_orders": self.orders_cloid or {},
-                        },
-                        indent=2,
-                    )
+                self.orders_cloid.set_fields(
+                    order["cloid"], status=OrderStatus.PENDING_CANCEL
                 )
-        logger.info("OMS: record state stopped.")
 
     def __del__(self):
-        if self.thread:
+        # also runs when __init__ raised before the journal was set up
+        if getattr(self, "thread", None):
             self.thread.join()
         logger.info("BinOMS deleted.")
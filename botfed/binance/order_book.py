@@ -1,9 +1,9 @@
 import logging
 from typing import Dict
 from threading import Thread
-import requests
 
 from ..core.order_book import OrderBookBase
+from ..core.http_client import get_client
 from .feed import BinanceListener
 from .universe import binance_contract_to_coin, coin_to_binance_contract
 
@@ -44,7 +44,7 @@ class OrderBook(OrderBookBase, BinanceListener):
     def fetch_snapshot(self):
         def func():
             url = f"https://fapi.binance.com/fapi/v1/depth?symbol={self.ticker}&limit=1000"
-            res = requests.get(url)
+            res = get_client().get(url, weight=20)
             snap = res.json()
             try:
                 snap["lastUpdateId"]
@@ -6,12 +6,19 @@ but keeps them for a minimum time, thus hoping to capture a mean reversion effec
 Research shows the replacement strat should get more hits and should have positive markouts.
 """
 
-import requests
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
 from ..core.oms import OMS
+from ..core.fast_bbo import FastBBO
+from ..core.http_client import get_client
 from ..logger import get_logger
 from .universe import coin_to_binance_contract
 
-
 logger = get_logger(__name__)
 
 
@@ -26,6 +33,19 @@ def normalize_symbol(coin):
         return coin
 
 
+class SubmissionQueue:
+    """Hands submissions to one worker thread, in order. The OMS and its
+    trade client are not thread-safe, so every call into them goes through
+    this single thread; exchange rate limits are the trade server's job,
+    the trade client just sends."""
+
+    def __init__(self):
+        self.pool = ThreadPoolExecutor(max_workers=1)
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        return self.pool.submit(fn, *args, **kwargs)
+
+
 class PortfolioExecutor:
     BASE_URL = "https://fapi.binance.com"
 
@@ -34,10 +54,55 @@ class PortfolioExecutor:
         oms: OMS,
         min_order_usd: float = 25,
         max_order_pct: float = 0.05,
+        bbo: FastBBO = None,
+        bbo_key=coin_to_binance_contract,
+        bbo_max_age_ms: float = 2000,
     ):
         self.oms = oms
         self.min_order_usd = min_order_usd
         self.max_order_pct = max_order_pct
+        # live BBO cache (e.g. fed from shm by FastBBOFeed); bbo_key maps a
+        # coin to its key there
+        self.bbo = bbo
+        self.bbo_key = bbo_key
+        self.bbo_max_age_ms = bbo_max_age_ms
+        self.queue = SubmissionQueue()
+        self.lock = threading.Lock()
+        self.plan = None
+        tc = getattr(oms, "tc", None)
+        if tc is not None:
+            tc.add_listener(self.on_trade_server)
+
+    def plan_orders(self, target_portfolio, min_pct=None) -> List:
+        """[(coin, qty_delta)] to move towards target_portfolio, with every
+        order between min_order_usd and max_order_pct of equity."""
+        coins, targets, qtys = [], [], []
+        for coin, target_qty in target_portfolio.items():
+            try:
+                qty = self.oms.get_position(coin).get("qty", 0)
+                logger.debug(f"Current {coin} qty={qty}")
+            except Exception as e:
+                logger.debug(f"Could not get position for {coin}, {e}")
+                continue
+            coins.append(coin)
+            targets.append(target_qty)
+            qtys.append(qty)
+        if not coins:
+            return []
+        prices = self.get_prices(coins)
+        price = np.array([prices.get(coin) or np.nan for coin in coins])
+        target = np.array(targets, dtype=float)
+        delta = target - np.array(qtys, dtype=float)
+        ntl = np.abs(delta * price)
+        keep = ntl > self.min_order_usd
+        if min_pct:
+            keep &= np.abs(delta) >= np.abs(min_pct * target)
+        for coin in np.array(coins)[np.isnan(price)]:
+            logger.debug(f"{coin} price is None, skipping")
+        max_ntl = np.minimum(self.max_order_pct * self.oms.equity(), ntl)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            delta = delta * max_ntl / ntl
+        return [(coins[i], float(delta[i])) for i in np.nonzero(keep)[0]]
 
     def execute(self, target_portfolio, min_pct=None):
         """
@@ -49,33 +114,66 @@ class PortfolioExecutor:
         if not self.oms.ready:
             logger.info("Skipping execution, oms not ready.")
             return
-        orders = []
-        for coin, target_qty in target_portfolio.items():
-            try:
-                qty = self.oms.get_position(coin).get("qty", 0)
-                logger.debug(f"Current {coin} qty={qty}")
-            except Exception as e:
-                logger.debug(f"Could not get position for {coin}, {e}")
-                continue
-            qty_delta = target_qty - qty
-            price = self.get_price(coin)
-            if not price:
-                logger.debug(f"{coin} price is None, skipping")
-                continue
-            elif min_pct and abs(qty_delta) < abs(min_pct * target_qty):
-                logger.debug(f"Skipping {coin}: delta {qty_delta:.4f} below threshold {min_pct * target_qty:.4f}")
-                continue
-            if abs(qty_delta * price) > self.min_order_usd:
-                equity = self.oms.equity()
-                target_ntl = abs(qty_delta * price)
-                max_ntl = min(self.max_order_pct * equity, target_ntl)
-                qty_delta = qty_delta * max_ntl / target_ntl
-                orders.append((coin, qty_delta))
+        t_plan = time.time() * 1000
+        orders = self.plan_orders(target_portfolio, min_pct)
         logger.info(f"Submitting orders: {orders}")
+        if not orders:
+            return
+        with self.lock:
+            self.plan = {
+                "t_plan": t_plan,
+                "t_planned": time.time() * 1000,
+                "pending_submit": len(orders),
+                "unacked": {coin_to_binance_contract(coin) for coin, _ in orders},
+                "n_orders": len(orders),
+            }
         for coin, qty in orders:
-            self.oms.submit_market_order(
-                coin, abs(qty), "sell" if qty < 0 else "buy", None
-            )
+            self.queue.submit(
+                self.oms.submit_market_order,
+                coin,
+                abs(qty),
+                "sell" if qty < 0 else "buy",
+                None,
+            ).add_done_callback(self._on_submitted)
+
+    def _on_submitted(self, fut):
+        if fut.exception() is not None:
+            logger.error(f"PortfolioExecutor: submit failed {fut.exception()}")
+        with self.lock:
+            plan = self.plan
+            if plan is None:
+                return
+            plan["pending_submit"] -= 1
+            if plan["pending_submit"] == 0:
+                plan["t_last_submit"] = time.time() * 1000
+                logger.info(
+                    f"PortfolioExecutor: {plan['n_orders']} orders, "
+                    f"plan {plan['t_planned'] - plan['t_plan']:.1f}ms, "
+                    f"plan to last submit {plan['t_last_submit'] - plan['t_plan']:.1f}ms"
+                )
+
+    def on_trade_server(self, data):
+        if data.get("type") != "market":
+            return
+        with self.lock:
+            plan = self.plan
+            if plan is None or not plan["unacked"]:
+                return
+            if data.get("ts_oms_send", 0) < plan["t_plan"]:
+                return
+            for order in data.get("orders", []):
+                plan["unacked"].discard(order.get("coin"))
+            if not plan["unacked"]:
+                plan["t_last_ack"] = time.time() * 1000
+                logger.info(
+                    f"PortfolioExecutor: plan to last ack "
+                    f"{plan['t_last_ack'] - plan['t_plan']:.1f}ms "
+                    f"for {plan['n_orders']} orders"
+                )
+
+    def last_plan(self) -> Dict:
+        with self.lock:
+            return dict(self.plan) if self.plan else None
 
     def normalize_symbol(self, coin):
         return normalize_symbol(coin)
@@ -83,24 +181,43 @@ class PortfolioExecutor:
     def is_tradeable(self, coin):
         return self.oms.is_tradeable(coin)
 
-    def get_price(self, coin: str):
+    def _bbo_mid(self, coin):
+        if self.bbo is None:
+            return None
+        bbo = self.bbo.get_bbo(self.bbo_key(coin))
+        if not bbo or time.time() * 1000 - bbo["ts_recv"] > self.bbo_max_age_ms:
+            return None
+        return (bbo["b"] + bbo["a"]) / 2
+
+    def get_prices(self, coins: List[str]) -> Dict[str, float]:
         """
-        Fetches the mid price from the order book (best bid + best ask) / 2
-        symbol: e.g., 'BTCUSDT'
+        Mid prices, from the live BBO cache where it is fresh and otherwise
+        from one bulk bookTicker request for all remaining coins.
         """
+        prices = {coin: self._bbo_mid(coin) for coin in coins}
+        missing = [coin for coin, price in prices.items() if not price]
+        if missing:
+            tickers = self.fetch_book_tickers()
+            for coin in missing:
+                prices[coin] = tickers.get(coin_to_binance_contract(coin))
+        return prices
+
+    def fetch_book_tickers(self) -> Dict[str, float]:
+        """symbol -> mid price for every contract, in one request."""
         try:
-            symbol = coin_to_binance_contract(coin)
-
-            url = f"{self.BASE_URL}/fapi/v1/depth"
-            params = {"symbol": symbol, "limit": 5}
-
-            resp = requests.get(url, params=params)
-            data = resp.json()
-
-            best_bid = float(data["bids"][0][0])
-            best_ask = float(data["asks"][0][0])
-            mid_price = (best_bid + best_ask) / 2
-
-            return mid_price
+            url = f"{self.BASE_URL}/fapi/v1/ticker/bookTicker"
+            data = get_client().get(url, weight=5).json()
+            return {
+                el["symbol"]: (float(el["bidPrice"]) + float(el["askPrice"])) / 2
+                for el in data
+                if float(el["bidPrice"]) > 0 and float(el["askPrice"]) > 0
+            }
         except Exception as e:
-            return None
+            logger.error(f"PortfolioExecutor: bookTicker failed {e}")
+            return {}
+
+    def get_price(self, coin: str):
+        """
+        Mid price (best bid + best ask) / 2, None if unavailable.
+        """
+        return self.get_prices([coin])[coin]
@@ -1,14 +1,31 @@
+"""
+Binance futures user data.
+
+The listenKey stream (ACCOUNT_UPDATE, ORDER_TRADE_UPDATE, ...) is the source
+of truth. A full REST reconciliation (account + open orders) runs when the
+stream may have missed something: at startup, after every (re)connect, when
+an event arrives out of order or too late, or when the bounded queue
+overflowed. ACCOUNT_UPDATE is not sent on mark price moves, so one also runs
+every snapshot_every_s to refresh position notional and unrealized pnl. At
+most one is pending at a time and they are spaced at least min_reconcile_s
+apart. Lateness is measured on the server clock: the offset to
+/fapi/v1/time is taken on every connect. The listenKey is kept alive on a
+schedule and replaced when it expires. Messages reach listeners
+(BinOMS.on_user_event) via run_ticks.
+"""
+
 import json
+import queue
 import threading
 import time
 import dotenv
 import os
 import websocket
 
-from queue import Queue
 from binance.client import Client
 
 from ..core.feed import Feed
+from ..core.http_client import get_client
 from ..logger import get_logger
 
 
@@ -21,21 +38,50 @@ api_key = os.getenv("BIN_API_KEY")
 api_secret = os.getenv("BIN_API_SECRET")
 
 
-import requests
-
 BINANCE_FAPI_URL = "https://fapi.binance.com"
+BINANCE_FSTREAM_URL = "wss://fstream.binance.com/ws"
+
+# a listenKey lives 60 minutes past its last keepalive
+KEEPALIVE_S = 30 * 60
 
 
 def get_listen_key(api_key):
     headers = {"X-MBX-APIKEY": api_key}
-    resp = requests.post(f"{BINANCE_FAPI_URL}/fapi/v1/listenKey", headers=headers)
+    resp = get_client().post(
+        f"{BINANCE_FAPI_URL}/fapi/v1/listenKey", headers=headers, weight=1
+    )
     resp.raise_for_status()
     return resp.json()["listenKey"]
 
 
+def server_time_offset_ms() -> float:
+    """Binance server time minus local time, in ms."""
+    t0 = time.time() * 1000
+    resp = get_client().get(f"{BINANCE_FAPI_URL}/fapi/v1/time", weight=1)
+    t1 = time.time() * 1000
+    resp.raise_for_status()
+    return resp.json()["serverTime"] - (t0 + t1) / 2
+
+
+def keepalive_listen_key(api_key):
+    headers = {"X-MBX-APIKEY": api_key}
+    resp = get_client().request(
+        "PUT", f"{BINANCE_FAPI_URL}/fapi/v1/listenKey", headers=headers, weight=1
+    )
+    resp.raise_for_status()
+
+
 class UserFeed(Feed):
 
-    def __init__(self, stop_event):
+    def __init__(
+        self,
+        stop_event,
+        max_queue: int = 10_000,
+        max_lag_ms: float = 5000,
+        keepalive_s: float = KEEPALIVE_S,
+        min_reconcile_s: float = 5,
+        snapshot_every_s: float = 60,
+    ):
         self.stop_event = stop_event
         self.api_key = api_key
         self.api_secret = api_secret
@@ -43,30 +89,64 @@ class UserFeed(Feed):
         self.client = Client(
             self.api_key, self.api_secret, testnet=False
         )  # Set testnet=True for testnet trading
-        self.queue = Queue()
-        self.thread = None
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.max_lag_ms = max_lag_ms
+        self.keepalive_s = keepalive_s
+        self.min_reconcile_s = min_reconcile_s
+        self.snapshot_every_s = snapshot_every_s
+        self.last_reconcile = 0
+        # server clock - local clock
+        self.clock_offset_ms = 0.0
+        self.listen_key = None
+        self.last_keepalive = 0
+        self.last_event_ms = 0
+        self.ws = None
+        self.t = None
+        self.t_maintain = None
+        self.reconcile_needed = threading.Event()
+        self.renew_key = False
+        self.n_events = 0
+        self.n_dropped = 0
+        self.n_reconciles = 0
         Feed.__init__(self)
 
-    def poll(self):
-        while not self.stop_event.is_set():
-            self.fetch_initial_data()
-            time.sleep(3)
-        logger.info("UserFeed Poller stopped")
+    def request_reconcile(self, reason):
+        if self.reconcile_needed.is_set():
+            # one pending reconcile covers everything up to when it runs
+            return
+        logger.info(f"UserFeed: reconcile requested, {reason}")
+        self.reconcile_needed.set()
 
-    def start(self):
-        listen_key = get_listen_key(self.api_key)
-        ws_url = f"wss://fstream.binance.com/ws/{listen_key}"
+    def _sync_clock(self):
+        try:
+            self.clock_offset_ms = server_time_offset_ms()
+        except Exception as e:
+            logger.warning(f"UserFeed: server time failed {e}, keeping offset")
+
+    def _put(self, msg) -> bool:
+        try:
+            self.queue.put_nowait(msg)
+            return True
+        except queue.Full:
+            # listeners fell behind, their state is incomplete until the
+            # next snapshot
+            self.n_dropped += 1
+            self.request_reconcile("queue full")
+            return False
 
-        self.ws = websocket.WebSocketApp(
-            ws_url,
-            on_message=self.handle_user_data,
-            on_close=self.on_close,
-            on_error=self.on_error,
-        )
+    # websocket
 
-        self.t = threading.Thread(target=self._run)
+    def start(self):
+        self.listen_key = get_listen_key(self.api_key)
+        self.last_keepalive = time.time()
+        self.t = threading.Thread(target=self._run, daemon=True)
         self.t.start()
 
+    def on_open(self, ws):
+        # anything may have happened while disconnected
+        self.last_event_ms = 0
+        self.request_reconcile("connected")
+
     def on_close(self, ws, close_status_code, close_msg):
         logger.info("WebSocket closed.")
 
@@ -76,14 +156,84 @@ class UserFeed(Feed):
     def _run(self):
         while not self.stop_event.is_set():
             try:
+                if self.renew_key:
+                    self.listen_key = get_listen_key(self.api_key)
+                    self.last_keepalive = time.time()
+                    self.renew_key = False
+                self._sync_clock()
+                self.ws = websocket.WebSocketApp(
+                    f"{BINANCE_FSTREAM_URL}/{self.listen_key}",
+                    on_open=self.on_open,
+                    on_message=self.handle_user_data,
+                    on_close=self.on_close,
+                    on_error=self.on_error,
+                )
                 self.ws.run_forever(ping_interval=60)
             except Exception as e:
                 logger.error(f"WebSocket error: {e}")
-            time.sleep(5)  # Retry delay
+            if not self.stop_event.is_set():
+                time.sleep(5)  # Retry delay
+
+    # Function to handle incoming user events via WebSocket
+    def handle_user_data(self, ws, msg):
+        ts = time.time()
+        data = json.loads(msg)
+        self.n_events += 1
+        if data.get("e") == "listenKeyExpired":
+            logger.warning("UserFeed: listenKey expired, reconnecting")
+            self.renew_key = True
+            ws.close()
+            return
+        event_ms = data.get("E")
+        if event_ms:
+            if event_ms < self.last_event_ms:
+                self.request_reconcile(
+                    f"event time went back {self.last_event_ms - event_ms}ms"
+                )
+            else:
+                lag_ms = ts * 1000 + self.clock_offset_ms - event_ms
+                if lag_ms > self.max_lag_ms:
+                    self.request_reconcile(f"event {lag_ms:.0f}ms late")
+            self.last_event_ms = max(self.last_event_ms, event_ms)
+        self._put({"type": "bin_user_event", "data": data, "ts": ts})
 
-    # Function to fetch initial account balances, open orders, and positions
+    # keepalive and reconciliation
+
+    def _maintain(self):
+        while not self.stop_event.is_set():
+            if (
+                self.snapshot_every_s
+                and self.last_reconcile
+                and time.time() - self.last_reconcile >= self.snapshot_every_s
+            ):
+                self.request_reconcile("periodic snapshot")
+            if self.reconcile_needed.wait(timeout=1):
+                wait_s = self.last_reconcile + self.min_reconcile_s - time.time()
+                if wait_s > 0:
+                    self.stop_event.wait(min(wait_s, 1))
+                else:
+                    self.reconcile_needed.clear()
+                    self.last_reconcile = time.time()
+                    self.fetch_initial_data()
+            if (
+                self.listen_key
+                and not self.renew_key
+                and time.time() - self.last_keepalive >= self.keepalive_s
+            ):
+                try:
+                    keepalive_listen_key(self.api_key)
+                    self.last_keepalive = time.time()
+                except Exception as e:
+                    logger.error(f"UserFeed: keepalive failed {e}, renewing key")
+                    self.renew_key = True
+                    if self.ws:
+                        self.ws.close()
+        logger.info("UserFeed maintenance stopped")
+
+    # Function to fetch account balances, positions and open orders
     def fetch_initial_data(self):
         try:
+            self.n_reconciles += 1
 
             # Fetch futures account balances
             account_info = self.client.futures_account()
@@ -92,30 +242,30 @@ class UserFeed(Feed):
                 for pos in account_info["positions"]
                 if float(pos.get("positionAmt", 0)) != 0
             ]
+            # snapshots must get through, wait for room
             self.queue.put(
-                {"type": "bin_account_info", "data": account_info, "ts": time.time()}
+                {"type": "bin_account_info", "data": account_info, "ts": time.time()},
+                timeout=5,
             )
 
             # Fetch open orders
             open_orders = self.client.futures_get_open_orders()
             self.queue.put(
-                {"type": "bin_open_orders", "data": open_orders, "ts": time.time()}
+                {"type": "bin_open_orders", "data": open_orders, "ts": time.time()},
+                timeout=5,
             )
 
         except Exception as e:
             logger.error(f"An error occurred while fetching initial data: {e}")
-
-    # Function to handle incoming user events via WebSocket
-    def handle_user_data(self, _, msg):
-        self.queue.put({"type": "bin_user_event", "data": json.loads(msg), "ts": time.time()})
+            time.sleep(1)
+            self.reconcile_needed.set()
 
     # Main function to start the thread
     def run(self):
-        # Fetch the initial account balance before starting the WebSocket listener
-        self.fetch_initial_data()
-        # Start WebSocket in a separate thread
-        self.t_poller = threading.Thread(target=self.poll)
-        self.t_poller.start()
+        self.t_maintain = threading.Thread(target=self._maintain, daemon=True)
+        self.t_maintain.start()
+        # the snapshot is taken once the socket is open, so no event falls
+        # between the two
         self.start()
 
     def run_ticks(self):
@@ -124,15 +274,27 @@ class UserFeed(Feed):
             for listener in self.listeners:
                 listener(tick)
 
+    def stats(self):
+        return {
+            "events": self.n_events,
+            "dropped": self.n_dropped,
+            "reconciles": self.n_reconciles,
+            "queued": self.queue.qsize(),
+        }
+
     def close(self):
-        self.ws.close()
-        self.t.join()
-        self.t_poller.join()
-        logger.info("UserFeed: Closed UserFeed.")
+        self.stop_event.set()
+        if self.ws:
+            self.ws.close()
+        if self.t:
+            self.t.join()
+        if self.t_maintain:
+            self.t_maintain.join()
+        logger.info(f"UserFeed: Closed UserFeed. {self.stats()}")
 
 
 # Run the main function
 if __name__ == "__main__":
-    user_feed = UserFeed()
+    user_feed = UserFeed(threading.Event())
     user_feed.run()
-    user_feed.thread.join()
+    user_feed.t.join()
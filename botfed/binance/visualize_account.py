@@ -1,4 +1,3 @@
-import json
 import pandas as pd
 import time
 import os
@@ -11,6 +10,7 @@ from rich.panel import Panel
 from rich.live import Live
 from rich.layout import Layout
 import requests
+from ..core.oms_journal import recover
 
 # Load environment variables from .env file
 load_dotenv()
@@ -91,13 +91,24 @@ def fetch_recent_trades():
     return trades_df, realized_pnl_24h
 
 
-def update_display(json_file):
-    """Updates the display by reading the JSON file and refreshing account data."""
+def load_state(journal_dir):
+    """Latest OMS state from the BinOMS journal."""
+    state = recover(journal_dir)
+    return {
+        "account": {
+            "positions": state["positions"],
+            "assets": state["account"].get("assets", {}),
+        },
+        "open_orders": state["orders"],
+    }
+
+
+def update_display(journal_dir):
+    """Updates the display by replaying the OMS journal and refreshing account data."""
     try:
-        with open(json_file, "r") as f:
-            data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        console.print(f"[red]Error reading JSON file:[/red] {e}")
+        data = load_state(journal_dir)
+    except (FileNotFoundError, ValueError) as e:
+        console.print(f"[red]Error reading OMS journal:[/red] {e}")
         return None
 
     try:
@@ -227,11 +238,11 @@ def calculate_bips_from_midquote(order_row, midquotes):
 
 
 # Main script: Refresh every 30 seconds without using a loop directly
-json_file = "../data/prod/bin_account.json"
+journal_dir = "../data/prod/bin_journal"
 
 with Live(console=console, refresh_per_second=2, screen=True) as live:
     while True:
-        layout = update_display(json_file)
+        layout = update_display(journal_dir)
         if layout is not None:
             live.update(layout)
         time.sleep(10)
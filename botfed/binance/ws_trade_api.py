@@ -0,0 +1,354 @@
+"""
+Order entry over the Binance USDⓈ-M futures WebSocket API.
+
+One persistent connection carries every request; responses are matched back
+to the request id, so many requests can be in flight at once. Requests are
+HMAC-signed individually, or, with an Ed25519 key, the connection is
+authenticated once with session.logon and logged on again after every
+reconnect.
+
+BinWsTradeClient wraps the connection in the TradeClient submit/add_listener
+interface, so BinOMS can use it in place of the trade server.
+"""
+
+import base64
+import hashlib
+import hmac
+import itertools
+import os
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+from urllib.parse import urlencode
+
+import dotenv
+import numpy as np
+import orjson as json
+import websocket
+
+from ..core.oexec import OrderResp
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+dotenv.load_dotenv()
+
+WS_FAPI_URL = "wss://ws-fapi.binance.com/ws-fapi/v1"
+
+
+class BinWsError(Exception):
+    def __init__(self, code, msg):
+        super().__init__(f"{code}: {msg}")
+        self.code = code
+        self.msg = msg
+
+
+def _payload(params: Dict) -> str:
+    return urlencode(sorted(params.items()))
+
+
+def sign_hmac(params: Dict, api_secret: str) -> str:
+    return hmac.new(
+        api_secret.encode(), _payload(params).encode(), hashlib.sha256
+    ).hexdigest()
+
+
+class BinWsOrderClient:
+
+    def __init__(
+        self,
+        api_key: str = None,
+        api_secret: str = None,
+        ed25519_key_file: str = None,
+        url: str = WS_FAPI_URL,
+        recv_window: int = 5000,
+        stop_event: threading.Event = None,
+        reconnect_wait_s: float = 1,
+    ):
+        self.api_key = api_key or os.getenv("BIN_API_KEY")
+        self.api_secret = api_secret or os.getenv("BIN_API_SECRET")
+        self.ed25519_key = (
+            self._load_ed25519(ed25519_key_file) if ed25519_key_file else None
+        )
+        self.url = url
+        self.recv_window = recv_window
+        self.stop_event = stop_event or threading.Event()
+        self.reconnect_wait_s = reconnect_wait_s
+        self.ws = None
+        self.ids = itertools.count(1)
+        self.pending: Dict[str, Future] = {}
+        self.send_lock = threading.Lock()
+        self.connected = threading.Event()
+        self.logged_on = False
+        self.n_requests = 0
+        self.n_reconnects = 0
+        self.rtt_ms = deque(maxlen=10_000)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def _load_ed25519(fpath):
+        from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
+        with open(fpath, "rb") as f:
+            return load_pem_private_key(f.read(), password=None)
+
+    def _sign(self, params: Dict) -> Dict:
+        params = {
+            **params,
+            "apiKey": self.api_key,
+            "timestamp": int(time.time() * 1000),
+        }
+        if self.recv_window:
+            params["recvWindow"] = self.recv_window
+        if self.ed25519_key is not None:
+            sig = self.ed25519_key.sign(_payload(params).encode())
+            params["signature"] = base64.b64encode(sig).decode()
+        else:
+            params["signature"] = sign_hmac(params, self.api_secret)
+        return params
+
+    def _connect(self):
+        self.ws = websocket.create_connection(
+            self.url,
+            sockopt=[(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)],
+            enable_multithread=True,
+        )
+        self.logged_on = False
+        if self.ed25519_key is not None:
+            # logon is answered before anything else is sent on this socket
+            request_id = str(next(self.ids))
+            self.ws.send(
+                json.dumps(
+                    {
+                        "id": request_id,
+                        "method": "session.logon",
+                        "params": self._sign({}),
+                    }
+                )
+            )
+            resp = json.loads(self.ws.recv())
+            if resp.get("status") != 200:
+                raise BinWsError(*self._error(resp))
+            self.logged_on = True
+            logger.info("BinWsOrderClient: session logged on")
+        self.connected.set()
+
+    @staticmethod
+    def _error(resp):
+        error = resp.get("error", {})
+        return error.get("code"), error.get("msg", str(resp))
+
+    def _fail_pending(self, exc):
+        pending, self.pending = self.pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(exc)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self._connect()
+                self._read_loop()
+            except Exception as e:
+                if not self.stop_event.is_set():
+                    logger.error(f"BinWsOrderClient: connection error {e}")
+            self.connected.clear()
+            self._fail_pending(ConnectionError("ws order connection lost"))
+            try:
+                if self.ws:
+                    self.ws.close()
+            except Exception:
+                pass
+            if not self.stop_event.is_set():
+                self.n_reconnects += 1
+                time.sleep(self.reconnect_wait_s)
+        logger.info("BinWsOrderClient: stopped")
+
+    def _read_loop(self):
+        while not self.stop_event.is_set():
+            msg = self.ws.recv()
+            if not msg:
+                continue
+            tnow = time.time() * 1000
+            resp = json.loads(msg)
+            fut = self.pending.pop(resp.get("id"), None)
+            if fut is None:
+                continue
+            self.rtt_ms.append(tnow - fut.ts_send)
+            if resp.get("status") == 200:
+                fut.set_result(resp["result"])
+            else:
+                fut.set_exception(BinWsError(*self._error(resp)))
+
+    def request(self, method: str, params: Dict, signed: bool = True) -> Future:
+        """Send without waiting; the future resolves with the result or a
+        BinWsError."""
+        if not self.connected.wait(timeout=5):
+            raise ConnectionError("ws order connection not up")
+        if signed and not self.logged_on:
+            params = self._sign(params)
+        request_id = str(next(self.ids))
+        fut = Future()
+        fut.ts_send = time.time() * 1000
+        self.pending[request_id] = fut
+        self.n_requests += 1
+        msg = json.dumps({"id": request_id, "method": method, "params": params})
+        with self.send_lock:
+            self.ws.send(msg)
+        return fut
+
+    def batch(self, requests: List[Tuple[str, Dict]]) -> List[Future]:
+        """Pipeline several requests back to back on the one connection."""
+        return [self.request(method, params) for method, params in requests]
+
+    def place_order(self, **params) -> Future:
+        return self.request("order.place", params)
+
+    def cancel_order(self, symbol, origClientOrderId=None, orderId=None) -> Future:
+        params = {"symbol": symbol}
+        if origClientOrderId:
+            params["origClientOrderId"] = origClientOrderId
+        if orderId:
+            params["orderId"] = orderId
+        return self.request("order.cancel", params)
+
+    def modify_order(self, **params) -> Future:
+        return self.request("order.modify", params)
+
+    def close(self):
+        self.stop_event.set()
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+        self.thread.join(timeout=5)
+
+
+# more decimals than any futures tick / step size, fewer than float noise
+NUM_DECIMALS = 10
+
+
+def _num(x) -> str:
+    """Decimal string, never scientific notation (str(1e-05) is '1e-05',
+    which the API rejects) and without float noise from rounding to the
+    tick (0.1 + 0.2)."""
+    if isinstance(x, str):
+        return x
+    return np.format_float_positional(float(x), precision=NUM_DECIMALS, trim="-")
+
+
+def local_order_to_ws_request(type: str, order: Dict) -> Tuple[str, Dict]:
+    """Trade-server message type + LocalOrder -> (method, params)."""
+    side = order["side"].upper()
+    if type == "bulk":
+        params = {
+            "symbol": order["coin"],
+            "side": side,
+            "type": "LIMIT",
+            "timeInForce": "GTX",
+            "quantity": _num(order["qty"]),
+            "price": _num(order["price"]),
+        }
+        if order.get("cloid"):
+            params["newClientOrderId"] = order["cloid"]
+        return "order.place", params
+    elif type == "market":
+        return "order.place", {
+            "symbol": order["coin"],
+            "side": side,
+            "type": "MARKET",
+            "quantity": _num(order["qty"]),
+        }
+    elif type == "cancel":
+        return "order.cancel", {
+            "symbol": order["coin"],
+            "origClientOrderId": order["cloid"],
+        }
+    elif type == "modify":
+        return "order.modify", {
+            "symbol": order["coin"],
+            "side": side,
+            "quantity": _num(order["qty"]),
+            "price": _num(order["price"]),
+            "origClientOrderId": order["cloid"],
+        }
+    raise ValueError(f"Unknown order type: {type}")
+
+
+class BinWsTradeClient:
+    """
+    TradeClient stand-in for BinOMS. Every order of a submitted message is
+    sent as its own pipelined WS request; listeners get the message back with
+    "resp" holding one OrderResp per order once all have been answered. If a
+    send fails partway, only the new orders not sent are reported "dropped".
+    """
+
+    def __init__(self, client: BinWsOrderClient):
+        self.client = client
+        self.listeners = []
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def submit(self, data):
+        assert data["exchange"] == "bin", "BinWsTradeClient only trades binance"
+        orders = data["orders"]
+        futs = []
+        for order in orders:
+            try:
+                futs.append(
+                    self.client.request(*local_order_to_ws_request(data["type"], order))
+                )
+            except Exception as e:
+                logger.error(f"BinWsTradeClient: submit failed {e}")
+                break
+        unsent = orders[len(futs) :]
+        if unsent and data["type"] == "bulk":
+            dropped = {**data, "orders": unsent}
+            self._dispatch({**dropped, "resp": "dropped", "order": dropped})
+        if not futs:
+            return
+        orders = orders[: len(futs)]
+        data = {**data, "orders": orders}
+        remaining = [len(futs)]
+        lock = threading.Lock()
+
+        def on_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            resps = [self._to_resp(order, fut) for order, fut in zip(orders, futs)]
+            self._dispatch({**data, "resp": resps, "ts_resp": time.time() * 1000})
+
+        for fut in futs:
+            fut.add_done_callback(on_done)
+
+    @staticmethod
+    def _to_resp(order, fut) -> OrderResp:
+        exc = fut.exception()
+        if exc is not None:
+            return OrderResp(
+                cloid=order.get("cloid"),
+                oid=order.get("oid"),
+                status="ERROR",
+                error_msg=str(exc),
+            )
+        result = fut.result()
+        return OrderResp(
+            cloid=result.get("clientOrderId"),
+            oid=result.get("orderId"),
+            status=result.get("status"),
+            update_time=result.get("updateTime"),
+        )
+
+    def _dispatch(self, data):
+        for listener in self.listeners:
+            try:
+                listener(data)
+            except Exception as e:
+                logger.error(f"BinWsTradeClient: listener error {e}")
@@ -0,0 +1,181 @@
+"""
+Offline stand-ins for the Binance futures order endpoints, for benchmarking
+WS API order entry (BinWsOrderClient) against the REST path.
+
+Both servers answer every order request after delay_ms, the WS one
+concurrently per request, as the exchange does.
+
+    python -m botfed.binance.ws_trade_mock --n 200 --delay-ms 5
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+import websockets
+
+from .ws_trade_api import BinWsOrderClient, sign_hmac
+
+_oids = itertools.count(1)
+
+
+def fake_result(method: str, params: dict) -> dict:
+    cloid = params.get("newClientOrderId") or params.get("origClientOrderId") or ""
+    status = "CANCELED" if method in ["order.cancel", "DELETE"] else "NEW"
+    return {
+        "orderId": next(_oids),
+        "symbol": params.get("symbol"),
+        "clientOrderId": cloid,
+        "status": status,
+        "price": params.get("price", "0"),
+        "origQty": params.get("quantity", "0"),
+        "updateTime": int(time.time() * 1000),
+    }
+
+
+class MockWsServer:
+
+    def __init__(self, host="127.0.0.1", port=8765, delay_ms=5):
+        self.host = host
+        self.port = port
+        self.delay_ms = delay_ms
+        self.url = f"ws://{host}:{port}"
+        self.n_requests = 0
+        self.loop = asyncio.new_event_loop()
+        self.started = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    async def _answer(self, ws, req):
+        await asyncio.sleep(self.delay_ms / 1000)
+        if req["method"] == "session.logon":
+            resp = {"id": req["id"], "status": 200, "result": {"apiKey": "mock"}}
+        else:
+            result = fake_result(req["method"], req["params"])
+            resp = {"id": req["id"], "status": 200, "result": result}
+        await ws.send(json.dumps(resp))
+
+    async def _handler(self, ws, path=None):
+        async for msg in ws:
+            self.n_requests += 1
+            asyncio.ensure_future(self._answer(ws, json.loads(msg)))
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+
+        async def main():
+            async with websockets.serve(self._handler, self.host, self.port):
+                self.started.set()
+                await asyncio.Future()
+
+        self.loop.run_until_complete(main())
+
+    def start(self):
+        self.thread.start()
+        self.started.wait(timeout=5)
+        return self
+
+
+class MockRestServer:
+
+    def __init__(self, host="127.0.0.1", port=8766, delay_ms=5):
+        self.url = f"http://{host}:{port}"
+        delay_s = delay_ms / 1000
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _reply(self):
+                time.sleep(delay_s)
+                query = urlparse(self.path).query
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode() if length else ""
+                params = dict(parse_qsl(query or body))
+                out = json.dumps(fake_result(self.command, params)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            do_POST = _reply
+            do_DELETE = _reply
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def _order_params(i):
+    return {
+        "symbol": "BTCUSDT",
+        "side": "BUY",
+        "type": "LIMIT",
+        "timeInForce": "GTX",
+        "quantity": "0.001",
+        "price": "10000",
+        "newClientOrderId": f"bench{i}",
+    }
+
+
+def bench_rest(url, n, api_secret="secret"):
+    """Serial REST orders on one keep-alive session, like python-binance."""
+    session = requests.Session()
+    lat = []
+    t0 = time.perf_counter()
+    for i in range(n):
+        params = {**_order_params(i), "timestamp": int(time.time() * 1000)}
+        params["signature"] = sign_hmac(params, api_secret)
+        ts = time.perf_counter()
+        session.post(f"{url}/fapi/v1/order", data=params).json()
+        lat.append((time.perf_counter() - ts) * 1000)
+    return (time.perf_counter() - t0) * 1000, lat
+
+
+def bench_ws(url, n):
+    """All orders pipelined on one WS connection."""
+    client = BinWsOrderClient(api_key="key", api_secret="secret", url=url)
+    client.connected.wait(timeout=5)
+    t0 = time.perf_counter()
+    futs = client.batch([("order.place", _order_params(i)) for i in range(n)])
+    for fut in futs:
+        fut.result(timeout=30)
+    total = (time.perf_counter() - t0) * 1000
+    lat = list(client.rtt_ms)
+    client.close()
+    return total, lat
+
+
+def _report(name, total, lat):
+    print(
+        f"{name:>5}: total {total:8.1f} ms, per order p50 "
+        f"{statistics.median(lat):6.2f} ms max {max(lat):6.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WS vs REST order entry benchmark")
+    parser.add_argument("--n", type=int, default=200)
+    parser.add_argument("--delay-ms", type=float, default=5)
+    args = parser.parse_args()
+    ws_server = MockWsServer(delay_ms=args.delay_ms).start()
+    rest_server = MockRestServer(delay_ms=args.delay_ms).start()
+    _report("REST", *bench_rest(rest_server.url, args.n))
+    _report("WS", *bench_ws(ws_server.url, args.n))
+    rest_server.stop()
@@ -1,8 +1,8 @@
 # botfed/core/explorer_client.py
 import time
-import requests
 from typing import Any, Dict, Optional
 from .eth_config import ETHERSCAN_V2_BASE, BASE_CHAIN_ID, BASESCAN_API_KEY
+from .http_client import NO_RETRY, get_client
 
 
 class ExplorerClient:
@@ -31,7 +31,9 @@ class ExplorerClient:
         last_exc: Optional[Exception] = None
         for attempt in range(retries):
             try:
-                r = requests.get(self.base_url, params=q, timeout=timeout)
+                r = get_client().get(
+                    self.base_url, params=q, timeout=timeout, retry=NO_RETRY
+                )
                 r.raise_for_status()
                 data = r.json()
                 # Retry on NOTOK rate-limit-ish responses
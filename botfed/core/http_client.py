@@ -0,0 +1,256 @@
+"""
+Shared HTTP client for REST callers.
+
+One requests.Session with keep-alive connection pools per host, so repeated
+calls skip the TCP/TLS handshake. Requests get a default (connect, read)
+timeout and a retry policy: connection errors, 5xx and 429/418 are retried
+with exponential backoff, honouring Retry-After.
+
+Binance reports the request weight used in the current minute in
+X-MBX-USED-WEIGHT-1M. Each host with a known limit gets a RateBudget that
+tracks this; requests wait for the next minute rather than run the shared
+IP weight into a ban. Per-endpoint latency and error counts are kept for
+metrics() / log_metrics().
+
+get_client() returns the process-wide instance.
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# request weight per minute, per IP
+WEIGHT_LIMITS = {
+    "fapi.binance.com": 2400,
+    "api.binance.com": 6000,
+}
+WEIGHT_HEADER = "x-mbx-used-weight-1m"
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    total: int = 3
+    backoff_s: float = 0.5
+    backoff_max_s: float = 10
+    statuses: Tuple[int, ...] = (418, 429, 500, 502, 503, 504)
+
+    def delay(self, attempt: int) -> float:
+        return min(self.backoff_max_s, self.backoff_s * 2**attempt)
+
+
+NO_RETRY = RetryPolicy(total=0)
+
+
+class RateBudget:
+    """Weight used in the current minute window of one host."""
+
+    def __init__(self, limit: int, headroom: float = 0.9, window_s: float = 60):
+        self.limit = limit
+        self.headroom = headroom
+        self.window_s = window_s
+        self.lock = threading.Lock()
+        self.window = 0
+        self.used = 0
+        self.blocked_until = 0.0
+
+    def _roll(self, tnow):
+        window = int(tnow // self.window_s)
+        if window != self.window:
+            self.window = window
+            self.used = 0
+
+    def remaining(self) -> int:
+        with self.lock:
+            self._roll(time.time())
+            return max(0, int(self.limit * self.headroom) - self.used)
+
+    def acquire(self, weight: int = 1):
+        """Block until `weight` fits in the window (or a ban expires)."""
+        while True:
+            with self.lock:
+                tnow = time.time()
+                self._roll(tnow)
+                if tnow < self.blocked_until:
+                    wait = self.blocked_until - tnow
+                elif self.used + weight <= self.limit * self.headroom:
+                    self.used += weight
+                    return
+                else:
+                    wait = (self.window + 1) * self.window_s - tnow
+            logger.warning(f"RateBudget: weight {self.used}/{self.limit}, {wait:.1f}s")
+            time.sleep(wait)
+
+    def update(self, used: int):
+        with self.lock:
+            self._roll(time.time())
+            self.used = max(self.used, used)
+
+    def block(self, seconds: float):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.time() + seconds)
+
+
+class EndpointStats:
+    def __init__(self, n_samples=1000):
+        self.n = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples = deque(maxlen=n_samples)
+
+    def add(self, ms):
+        self.n += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.samples.append(ms)
+
+    def summary(self) -> Dict:
+        samples = sorted(self.samples)
+
+        def pct(q):
+            return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+        return {
+            "n": self.n,
+            "errors": self.errors,
+            "retries": self.retries,
+            "mean_ms": self.total_ms / self.n if self.n else None,
+            "p50_ms": pct(0.5) if samples else None,
+            "p99_ms": pct(0.99) if samples else None,
+            "max_ms": self.max_ms,
+        }
+
+
+class HttpClient:
+
+    def __init__(
+        self,
+        timeout=DEFAULT_TIMEOUT,
+        retry: RetryPolicy = RetryPolicy(),
+        pool_connections: int = 32,
+        pool_maxsize: int = 32,
+        weight_limits: Dict[str, int] = WEIGHT_LIMITS,
+    ):
+        self.timeout = timeout
+        self.retry = retry
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.budgets: Dict[str, RateBudget] = {
+            host: RateBudget(limit) for host, limit in weight_limits.items()
+        }
+        self.lock = threading.Lock()
+        self.stats: Dict[str, EndpointStats] = {}
+
+    def budget(self, host: str) -> RateBudget:
+        return self.budgets.get(host)
+
+    def _stats(self, key) -> EndpointStats:
+        stats = self.stats.get(key)
+        if stats is None:
+            with self.lock:
+                stats = self.stats.setdefault(key, EndpointStats())
+        return stats
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        timeout=None,
+        retry: RetryPolicy = None,
+        weight: int = 1,
+        **kwargs,
+    ) -> requests.Response:
+        """requests.request on the pooled session. The last response is
+        returned even if its status was retried; exceptions are raised once
+        retries run out."""
+        retry = retry or self.retry
+        parts = urlsplit(url)
+        stats = self._stats(f"{method.upper()} {parts.netloc}{parts.path}")
+        budget = self.budgets.get(parts.netloc)
+        attempt = 0
+        while True:
+            if budget is not None:
+                budget.acquire(weight)
+            t0 = time.perf_counter()
+            try:
+                resp = self.session.request(
+                    method, url, timeout=timeout or self.timeout, **kwargs
+                )
+            except requests.RequestException as e:
+                stats.errors += 1
+                if attempt >= retry.total:
+                    raise
+                logger.warning(f"HttpClient: {method} {url} failed: {e}, retrying")
+                time.sleep(retry.delay(attempt))
+                attempt += 1
+                stats.retries += 1
+                continue
+            stats.add((time.perf_counter() - t0) * 1000)
+            if budget is not None and WEIGHT_HEADER in resp.headers:
+                budget.update(int(resp.headers[WEIGHT_HEADER]))
+            if resp.status_code < 400:
+                return resp
+            stats.errors += 1
+            retry_after = resp.headers.get("Retry-After")
+            if resp.status_code in (418, 429) and budget is not None:
+                budget.block(float(retry_after or 60))
+            if resp.status_code not in retry.statuses or attempt >= retry.total:
+                return resp
+            delay = retry.delay(attempt)
+            if retry_after and budget is None:
+                delay = max(delay, float(retry_after))
+            logger.warning(
+                f"HttpClient: {method} {parts.netloc}{parts.path} "
+                f"status {resp.status_code}, retrying in {delay:.1f}s"
+            )
+            time.sleep(delay)
+            attempt += 1
+            stats.retries += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def metrics(self) -> Dict[str, Dict]:
+        with self.lock:
+            items = list(self.stats.items())
+        out = {key: stats.summary() for key, stats in items}
+        for host, budget in self.budgets.items():
+            out[f"weight {host}"] = {"used": budget.used, "limit": budget.limit}
+        return out
+
+    def log_metrics(self):
+        for key, summary in self.metrics().items():
+            logger.info(f"HttpClient {key}: {summary}")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient()
+    return _client
@@ -0,0 +1,247 @@
+"""
+Instrument metadata (tick / lot sizes) for Binance futures and Hyperliquid.
+
+Raw exchangeInfo / meta responses are cached on disk under a versioned file
+name and re-downloaded once older than ttl_s; if the download fails a stale
+cache is used, and for Hyperliquid the static hyperliquid.meta table after
+that. get_instruments() loads each exchange once per process, so every OMS
+shares one InstrumentTable.
+
+The table keeps per-instrument rules in numpy arrays next to a name -> index
+dict: valid_qty / valid_price round one order by name, valid_qtys /
+valid_prices round a whole target portfolio in one call.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, Iterable, Union
+
+import numpy as np
+
+from ..logger import get_logger
+from .http_client import get_client
+
+logger = get_logger(__name__)
+
+CACHE_DIR = "../data/instruments"
+# bump when the cached payload layout changes
+CACHE_VERSION = 1
+DEFAULT_TTL_S = 6 * 3600
+
+BIN_EXCHANGE_INFO_URL = "https://fapi.binance.com/fapi/v1/exchangeInfo"
+HL_INFO_URL = "https://api.hyperliquid.xyz/info"
+
+# Hyperliquid prices: 5 significant figures, at most 6 decimals
+HL_PX_SIG_FIGS = 5
+HL_PX_MAX_DECIMALS = 6
+
+
+def _filter(symbol, filter_type):
+    for f in symbol["filters"]:
+        if f["filterType"] == filter_type:
+            return f
+    return {}
+
+
+def _round_decimals(x: np.ndarray, decimals: np.ndarray):
+    """Round x to per-element decimals (may be negative); also flags values
+    within float noise of a half, where np.round and round() may disagree."""
+    neg = decimals < 0
+    scale = np.where(neg, 1.0, 10.0 ** np.where(neg, 0, decimals))
+    div = np.where(neg, 10.0 ** np.where(neg, -decimals, 0), 1.0)
+    y = x * scale / div
+    r = np.round(y)
+    near_tie = np.abs(np.abs(y - np.trunc(y)) - 0.5) < 1e-6
+    return r / scale * div, near_tie
+
+
+class InstrumentTable:
+
+    def __init__(self, exchange: str, raw: Dict, fetched_at: float = 0):
+        self.exchange = exchange
+        self.raw = raw
+        # fetched_at: when the exchange served raw (0 for static data)
+        self.fetched_at = fetched_at
+        self.loaded_at = time.time()
+        if exchange == "bin":
+            symbols = raw["symbols"]
+            self.names = [s["symbol"] for s in symbols]
+            # step / min qty from LOT_SIZE, looked up by type. The old
+            # BinOMS.valid_qty read filters[2], which on fapi is
+            # MARKET_LOT_SIZE: its minQty (and for some symbols stepSize)
+            # differs, so valid_qty can round differently than before.
+            lot = [_filter(s, "LOT_SIZE") for s in symbols]
+            price = [_filter(s, "PRICE_FILTER") for s in symbols]
+            self.step = np.array([float(f.get("stepSize", 0)) for f in lot])
+            self.min_qty = np.array([float(f.get("minQty", 0)) for f in lot])
+            self.tick = np.array([float(f.get("tickSize", 0)) for f in price])
+            self.min_price = np.array([float(f.get("minPrice", 0)) for f in price])
+            self.qty_decimals = np.array(
+                [abs(int(round(math.log10(s)))) if s else 0 for s in self.step]
+            )
+        elif exchange == "hl":
+            universe = raw["universe"]
+            self.names = [el["name"] for el in universe]
+            self.qty_decimals = np.array([el["szDecimals"] for el in universe])
+            self.step = 10.0**-self.qty_decimals
+            self.min_qty = np.zeros(len(universe))
+            # price granularity follows significant figures, not a fixed tick
+            self.tick = np.full(len(universe), 10.0**-HL_PX_MAX_DECIMALS)
+            self.min_price = np.zeros(len(universe))
+        else:
+            raise ValueError(f"Unknown exchange: {exchange}")
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        # plain lists for the scalar paths, indexing numpy costs more
+        self._step = self.step.tolist()
+        self._min_qty = self.min_qty.tolist()
+        self._tick = self.tick.tolist()
+        self._qty_decimals = self.qty_decimals.tolist()
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.names)
+
+    def sz_decimals(self, name) -> int:
+        return self._qty_decimals[self.index[name]]
+
+    def tick_size(self, name) -> float:
+        return self._tick[self.index[name]]
+
+    def step_size(self, name) -> float:
+        return self._step[self.index[name]]
+
+    def valid_qty(self, name, qty: float) -> float:
+        i = self.index[name]
+        if self.exchange == "hl":
+            return round(qty, self._qty_decimals[i])
+        if qty < self._min_qty[i]:
+            return 0
+        step = self._step[i]
+        return float(f"{math.floor(qty / step) * step:.8f}")
+
+    def valid_price(self, name, price: float) -> float:
+        if self.exchange == "hl":
+            return round(float(f"{price:.{HL_PX_SIG_FIGS}g}"), HL_PX_MAX_DECIMALS)
+        tick = self._tick[self.index[name]]
+        return float(f"{math.floor(price / tick) * tick:.8f}")
+
+    def indices(self, names: Iterable) -> np.ndarray:
+        index = self.index
+        return np.fromiter((index[n] for n in names), dtype=np.int64)
+
+    def _idx(self, names_or_idx) -> np.ndarray:
+        arr = np.asarray(names_or_idx)
+        if arr.dtype.kind in "iu":
+            return arr
+        return self.indices(arr.tolist())
+
+    def valid_qtys(self, names_or_idx: Union[Iterable, np.ndarray], qtys) -> np.ndarray:
+        """Vectorized valid_qty over names (or indices from indices())."""
+        idx = self._idx(names_or_idx)
+        qtys = np.asarray(qtys, dtype=np.float64)
+        if self.exchange == "hl":
+            scale = 10.0 ** self.qty_decimals[idx]
+            return np.round(qtys * scale) / scale
+        step = self.step[idx]
+        out = np.round(np.floor(qtys / step) * step, 8)
+        out[qtys < self.min_qty[idx]] = 0
+        return out
+
+    def valid_prices(
+        self, names_or_idx: Union[Iterable, np.ndarray], prices
+    ) -> np.ndarray:
+        """Vectorized valid_price over names (or indices from indices())."""
+        idx = self._idx(names_or_idx)
+        prices = np.asarray(prices, dtype=np.float64)
+        if self.exchange == "hl":
+            with np.errstate(divide="ignore"):
+                mag = np.floor(np.log10(np.abs(prices)))
+            mag[~np.isfinite(mag)] = 0
+            out, near_tie = _round_decimals(prices, HL_PX_SIG_FIGS - 1 - mag)
+            out, near_tie2 = _round_decimals(out, np.full(len(out), HL_PX_MAX_DECIMALS))
+            # binary vs decimal halves: let the scalar path decide those few
+            for i in np.nonzero(near_tie | near_tie2)[0]:
+                out[i] = self.valid_price(None, float(prices[i]))
+            return out
+        tick = self.tick[idx]
+        return np.round(np.floor(prices / tick) * tick, 8)
+
+
+def _fetch(exchange: str) -> Dict:
+    if exchange == "bin":
+        resp = get_client().get(BIN_EXCHANGE_INFO_URL, weight=1)
+    else:
+        resp = get_client().post(HL_INFO_URL, json={"type": "meta"})
+    resp.raise_for_status()
+    return resp.json()
+
+
+def cache_path(exchange: str, cache_dir: str = CACHE_DIR) -> str:
+    return os.path.join(cache_dir, f"{exchange}.v{CACHE_VERSION}.json")
+
+
+def _read_cache(fpath):
+    try:
+        with open(fpath) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(fpath, cached):
+    try:
+        os.makedirs(os.path.dirname(fpath), exist_ok=True)
+        tmp = fpath + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(cached, f)
+        os.replace(tmp, fpath)
+    except OSError as e:
+        logger.warning(f"Instruments: could not write cache {fpath}: {e}")
+
+
+def load_instruments(
+    exchange: str,
+    cache_dir: str = CACHE_DIR,
+    ttl_s: float = DEFAULT_TTL_S,
+    refresh: bool = False,
+) -> InstrumentTable:
+    fpath = cache_path(exchange, cache_dir)
+    cached = _read_cache(fpath)
+    if cached and not refresh and time.time() - cached["ts"] < ttl_s:
+        return InstrumentTable(exchange, cached["data"], cached["ts"])
+    try:
+        cached = {"ts": time.time(), "data": _fetch(exchange)}
+        _write_cache(fpath, cached)
+    except Exception as e:
+        if cached:
+            logger.warning(f"Instruments: {exchange} refresh failed ({e}), stale cache")
+        elif exchange == "hl":
+            from ..hyperliquid.meta import meta
+
+            logger.warning(f"Instruments: hl download failed ({e}), static meta")
+            cached = {"ts": 0, "data": meta}
+        else:
+            raise
+    return InstrumentTable(exchange, cached["data"], cached["ts"])
+
+
+_tables: Dict[str, InstrumentTable] = {}
+_lock = threading.Lock()
+
+
+def get_instruments(
+    exchange: str, ttl_s: float = DEFAULT_TTL_S, refresh: bool = False
+) -> InstrumentTable:
+    """Process-wide table for "bin" or "hl", reloaded once older than ttl_s."""
+    with _lock:
+        table = _tables.get(exchange)
+        if refresh or table is None or time.time() - table.loaded_at >= ttl_s:
+            table = _tables[exchange] = load_instruments(
+                exchange, ttl_s=ttl_s, refresh=refresh
+            )
+        return table
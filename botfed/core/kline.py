@@ -1,18 +1,151 @@
+"""
+Latest klines per coin with rolling stats kept up to date per bar.
+
+Bars live in fixed-size numpy rings (O(1) append, no list.pop(0)). Each
+append also pushes the bar's log return into rolling windows that keep
+running sums, so:
+
+- sigma: std of the last `sig_window` returns, as
+  r.rolling(sig_window).std() on the full series;
+- beta vs hedge_coin: cov / var of the last `beta_window` pairs of returns
+  that fall in the same freq_ms slot for the coin and the hedge coin
+
+cost O(1) per bar for a coin and O(coins) per bar of the hedge coin,
+instead of rebuilding DataFrames over the whole window on every
+compute_stats(). Running sums are re-summed from the window once per
+window length, so float drift stays bounded.
+
+tests/test_kline.py checks the stats against pandas;
+
+    python -m botfed.core.kline_bench  # timings
+"""
+
 from typing import Dict, List
-import pandas as pd
-import numpy as np
+
 import datetime as dt
+
+import numpy as np
+import pandas as pd
+
 from ..core import time
 from ..backfill import local_data as ld
-from ..statarb import mr
 from ..binance.universe import coin_to_binance_contract, binance_contract_to_coin
 
+BAR_FIELDS = ("T", "o", "h", "l", "c", "v", "r_oc")
+SIG_WINDOW = 24 * 60
+
+
+class BarRing:
+    """Last N bars of one coin, one array per field."""
+
+    def __init__(self, N: int):
+        self.N = N
+        self.arrays = {f: np.full(N, np.nan) for f in BAR_FIELDS}
+        self.n = 0
+        self.head = 0  # next write position
+
+    def __len__(self):
+        return min(self.n, self.N)
+
+    def append(self, bar: Dict):
+        i = self.head
+        for f, arr in self.arrays.items():
+            arr[i] = bar[f]
+        self.head = (i + 1) % self.N
+        self.n += 1
+
+    def extend(self, bars: Dict[str, np.ndarray]):
+        """Bulk append, only the last N rows are kept."""
+        k = len(bars["T"])
+        if k >= self.N:
+            for f, arr in self.arrays.items():
+                arr[:] = bars[f][-self.N :]
+            self.head = 0
+        else:
+            idx = (self.head + np.arange(k)) % self.N
+            for f, arr in self.arrays.items():
+                arr[idx] = bars[f]
+            self.head = (self.head + k) % self.N
+        self.n += k
+
+    def last(self, field: str) -> float:
+        return self.arrays[field][self.head - 1]
+
+    def get(self, field: str) -> np.ndarray:
+        """Oldest to newest (a copy once the ring has wrapped)."""
+        arr = self.arrays[field]
+        if self.n < self.N:
+            return arr[: self.n]
+        return np.concatenate([arr[self.head :], arr[: self.head]])
+
+
+class RollingSums:
+    """Running sums of k columns over the last `window` rows."""
+
+    def __init__(self, window: int, k: int):
+        self.window = window
+        self.rows = np.zeros((window, k))
+        self.sums = np.zeros(k)
+        self.n = 0
+        self.head = 0
+
+    def push(self, row: np.ndarray):
+        i = self.head
+        if self.n >= self.window:
+            self.sums -= self.rows[i]
+        self.rows[i] = row
+        self.sums += row
+        self.head = (i + 1) % self.window
+        self.n += 1
+        if self.head == 0:
+            # resum once per window, bounds the drift of add / subtract
+            self.sums = self.rows.sum(axis=0)
+
+    def extend(self, rows: np.ndarray):
+        n = len(rows)
+        rows = rows[-self.window :]
+        idx = (self.head + np.arange(len(rows))) % self.window
+        self.rows[idx] = rows
+        self.head = (self.head + len(rows)) % self.window
+        self.n += n
+        # rows not written yet are zeros
+        self.sums = self.rows.sum(axis=0)
+
+    def count(self) -> int:
+        return min(self.n, self.window)
+
+    def std(self) -> float:
+        """Sample std of column 0, given columns [x, x^2]; NaN until full."""
+        n = self.window
+        if self.n < n:
+            return np.nan
+        s, s2 = self.sums
+        return float(np.sqrt(max(0.0, (s2 - s * s / n) / (n - 1))))
+
+    def beta(self) -> float:
+        """cov(y, x) / var(x), given columns [x, y, x^2, xy]."""
+        n = self.count()
+        if n < 2:
+            return np.nan
+        sx, sy, sxx, sxy = self.sums
+        var = sxx - sx * sx / n
+        if var <= 0:
+            return np.nan
+        return float((sxy - sx * sy / n) / var)
+
 
 class KLineStore:
 
-    def __init__(self, N=10000, freq_ms=10 * 1000, exch="bin", hedge_coin="ETH"):
+    def __init__(
+        self,
+        N=10000,
+        freq_ms=10 * 1000,
+        exch="bin",
+        hedge_coin="ETH",
+        sig_window=SIG_WINDOW,
+        beta_window=SIG_WINDOW,
+    ):
         self.exch = exch
-        self.data = {}
         self.freq_ms = freq_ms
         self.last_fire = {}
         self.listeners = []
@@ -20,77 +153,165 @@ class KLineStore:
         self.sigmas = {}
         self.hedge_coin = hedge_coin
         self.N = N
+        self.sig_window = sig_window
+        self.beta_window = beta_window
+        self.rings: Dict[str, BarRing] = {}
+        self.sig: Dict[str, RollingSums] = {}
+        self.cov: Dict[str, RollingSums] = {}
+        # (slot, return) of the last bar per coin, for pairing with the hedge
+        self.last_ret: Dict[str, tuple] = {}
 
     def add_listener(self, listener):
         self.listeners.append(listener)
 
-    def get_dfs(self):
-        return {coin: pd.DataFrame.from_records(self.data[coin]) for coin in self.data}
-
-    def load_historical(self, coins, lookback_days=1):
-        edate = dt.datetime.fromtimestamp(time.time(), dt.timezone.utc) - dt.timedelta(
-            days=1
-        )
-        sdate = edate - dt.timedelta(days=lookback_days)
-        dfs = ld.build_dfs([coin_to_binance_contract(c) for c in coins], sdate, edate)
-        dfs = {binance_contract_to_coin(t): df for t, df in dfs.items()}
-        for coin in dfs:
-            df = dfs[coin]
-            records = df.to_dict(orient="records")
-            self.data[coin] = [
-                {
-                    "T": rec["open_time"],
-                    "o": rec["open"],
-                    "h": rec["high"],
-                    "l": rec["low"],
-                    "c": rec["close"],
-                    "v": rec["volume"],
-                }
-                for rec in records
-            ]
-
     def add_coin(self, coin):
-        self.data[coin] = []
+        self.rings[coin] = BarRing(self.N)
+        self.sig[coin] = RollingSums(self.sig_window, 2)
+        self.cov[coin] = RollingSums(self.beta_window, 4)
+        self.last_ret.pop(coin, None)
 
     def remove_coin(self, coin):
-        self.data.pop(coin, None)
+        for d in (self.rings, self.sig, self.cov, self.last_ret):
+            d.pop(coin, None)
+
+    def get_dfs(self):
+        return {
+            coin: pd.DataFrame({f: ring.get(f) for f in BAR_FIELDS})
+            for coin, ring in self.rings.items()
+        }
+
+    # updates
+
+    def _on_return(self, coin: str, slot: int, r: float):
+        self.sig[coin].push(np.array([r, r * r]))
+        self.last_ret[coin] = (slot, r)
+        if coin == self.hedge_coin:
+            # pair the hedge return with every coin already in this slot
+            for other, (other_slot, y) in self.last_ret.items():
+                if other_slot == slot and other != coin:
+                    self.cov[other].push(np.array([r, y, r * r, r * y]))
+        else:
+            hedge = self.last_ret.get(self.hedge_coin)
+            if hedge is not None and hedge[0] == slot:
+                x = hedge[1]
+                self.cov[coin].push(np.array([x, r, x * x, x * r]))
 
     def on_event(self, event):
         if event["e"] == "kline" and event["data"]["exch"] == self.exch:
             symbol = event["data"]["coin"]
-            if self.last_fire.get(symbol, 0) + self.freq_ms >= event["timestamp"]:
+            if self.last_fire.get(symbol, 0) + self.freq_ms > event["timestamp"]:
+                return
+            if event["data"]["close"] != event["data"]["close"]:
+                # NaN: a quote-only bar from BarAggregator, no trade price yet
                 return
-            if symbol not in self.data:
-                self.data[symbol] = []
+            if symbol not in self.rings:
+                self.add_coin(symbol)
             data = event["data"]
-            data['T'] = event["timestamp"]
+            data["T"] = event["timestamp"]
             data["o"] = float(data["open"])
             data["c"] = float(data["close"])
             data["h"] = float(data["high"])
             data["l"] = float(data["low"])
             data["v"] = float(data["volume"])
             data["r_oc"] = np.log(1 + (data["c"] - data["o"]) / data["o"])
-            self.data[symbol].append(data)
-            if len(self.data[symbol]) > self.N:
-                self.data[symbol].pop(0)
+            ring = self.rings[symbol]
+            prev_c = ring.last("c") if ring.n else None
+            ring.append(data)
+            if prev_c is not None:
+                self._on_return(
+                    symbol, data["T"] // self.freq_ms, np.log(data["c"] / prev_c)
+                )
             self.last_fire[symbol] = data["T"]
             for listener in self.listeners:
                 listener.on_kline(symbol, data)
 
-    def compute_stats(self):
-        dfs = self.get_dfs()
-        dfs_new = {}
-        for coin in dfs:
+    # history
+
+    def load_arrays(self, coin: str, T, o, h, l, c, v):
+        """Bulk load bars from arrays (oldest first), replacing the coin.
+        Betas are seeded from the return pairs already in the rings, so
+        loading the hedge coin first saves reseeding every coin."""
+        self.add_coin(coin)
+        c = np.asarray(c, dtype=float)
+        o = np.asarray(o, dtype=float)
+        T = np.asarray(T)
+        bars = {
+            "T": T,
+            "o": o,
+            "h": np.asarray(h, dtype=float),
+            "l": np.asarray(l, dtype=float),
+            "c": c,
+            "v": np.asarray(v, dtype=float),
+            "r_oc": np.log(c / o),
+        }
+        self.rings[coin].extend(bars)
+        if len(c) < 2:
+            return
+        r = np.log(c[1:] / c[:-1])
+        slots = (T[1:] // self.freq_ms).astype(np.int64)
+        self.sig[coin].extend(np.column_stack([r, r * r]))
+        self.last_ret[coin] = (int(slots[-1]), float(r[-1]))
+        self.last_fire[coin] = int(T[-1])
+        if coin != self.hedge_coin:
+            self._seed_cov(coin)
+        else:
+            for other in self.rings:
+                if other != coin:
+                    self._seed_cov(other)
+
+    def _seed_cov(self, coin: str):
+        """Refill the coin's beta window from the return pairs in the rings."""
+        self.cov[coin] = RollingSums(self.beta_window, 4)
+        hedge, ring = self.rings.get(self.hedge_coin), self.rings[coin]
+        if hedge is None or len(hedge) < 2 or len(ring) < 2:
+            return
+        rets = []
+        for r in (hedge, ring):
+            c = r.get("c")
+            slots = (r.get("T")[1:] // self.freq_ms).astype(np.int64)
+            rets.append((slots, np.log(c[1:] / c[:-1])))
+        (h_slots, h_r), (slots, r) = rets
+        _, i, j = np.intersect1d(slots, h_slots, return_indices=True)
+        x, y = h_r[j], r[i]
+        self.cov[coin].extend(np.column_stack([x, y, x * x, x * y]))
+
+    def load_historical(self, coins, lookback_days=1):
+        edate = dt.datetime.fromtimestamp(time.time(), dt.timezone.utc) - dt.timedelta(
+            days=1
+        )
+        sdate = edate - dt.timedelta(days=lookback_days)
+        dfs = ld.build_dfs([coin_to_binance_contract(c) for c in coins], sdate, edate)
+        dfs = {binance_contract_to_coin(t): df for t, df in dfs.items()}
+        order = sorted(dfs, key=lambda coin: coin != self.hedge_coin)
+        for coin in order:
             df = dfs[coin]
-            if df.empty or len(df) < 10:
+            self.load_arrays(
+                coin,
+                df["open_time"].to_numpy(np.int64),
+                df["open"].to_numpy(),
+                df["high"].to_numpy(),
+                df["low"].to_numpy(),
+                df["close"].to_numpy(),
+                df["volume"].to_numpy(),
+            )
+
+    # stats
+
+    def compute_stats(self):
+        """Snapshot of the rolling sigma and beta per coin, O(coins)."""
+        betas = {}
+        for coin, ring in self.rings.items():
+            if len(ring) < 10:
                 print(f"Skipping stats for {coin}")
                 continue
-            df["r"] = np.log(1 + df["c"].pct_change())
-            df["sig"] = df["r"].rolling(24 * 60).std()
-            self.sigmas[coin] = df["sig"].iloc[-1]
-            df = df.dropna()
-            dfs_new[coin] = df
-        self.betas = mr.compute_betas(dfs_new, sources=[self.hedge_coin])
-        for coin in dfs:
+            self.sigmas[coin] = self.sig[coin].std()
+            if coin == self.hedge_coin:
+                betas[coin] = {self.hedge_coin: 1.0}
+                continue
+            beta = self.cov[coin].beta()
+            if not np.isnan(beta):
+                betas[coin] = {self.hedge_coin: beta}
+        self.betas = betas
+        for coin in self.rings:
             if coin not in self.betas:
                 self.betas[coin] = {self.hedge_coin: 1}
@@ -0,0 +1,108 @@
+"""
+KLineStore per-bar cost against recomputing everything with pandas on each
+compute_stats(); tests/test_kline.py checks that both give the same stats.
+
+The pandas side is the previous compute_stats: per coin DataFrame, log
+returns from pct_change, rolling(sig_window).std() for sigma; beta as
+cov / var of the coin's returns against the hedge coin's, inner-joined on
+the freq_ms slot, over the last beta_window pairs.
+
+    python -m botfed.core.kline_bench --coins 50 --bars 5000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from .kline import KLineStore
+
+
+def reference_stats(store: KLineStore):
+    dfs = store.get_dfs()
+    sigmas, betas = {}, {}
+    rets = {}
+    for coin, df in dfs.items():
+        df["r"] = np.log(1 + df["c"].pct_change())
+        sigmas[coin] = df["r"].rolling(store.sig_window).std().iloc[-1]
+        rets[coin] = df.set_index(df["T"] // store.freq_ms)["r"].dropna()
+    hedge = rets[store.hedge_coin]
+    for coin, r in rets.items():
+        if coin == store.hedge_coin:
+            continue
+        pairs = pd.concat([hedge, r], axis=1, join="inner").tail(store.beta_window)
+        x, y = pairs.iloc[:, 0], pairs.iloc[:, 1]
+        betas[coin] = x.cov(y) / x.var()
+    return sigmas, betas
+
+
+def make_events(coins, n_bars, freq_ms, seed=0, skip=0.05):
+    """Interleaved kline events; each coin misses ~skip of the slots and
+    arrives at a random offset within the slot."""
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 1e-3, n_bars)
+    events = []
+    for k, coin in enumerate(coins):
+        beta = 0.5 + k / len(coins)
+        r = beta * market + rng.normal(0, 1e-3, n_bars)
+        close = 100 * np.exp(np.cumsum(r))
+        keep = rng.random(n_bars) >= skip
+        offset = rng.integers(1, freq_ms // 2, n_bars)
+        for i in np.nonzero(keep)[0]:
+            events.append(
+                {
+                    "e": "kline",
+                    "timestamp": int((i + 1) * freq_ms + offset[i]),
+                    "data": {
+                        "exch": "bin",
+                        "coin": coin,
+                        "open": close[i - 1] if i else close[i],
+                        "close": close[i],
+                        "high": close[i] * 1.001,
+                        "low": close[i] * 0.999,
+                        "volume": 1.0,
+                    },
+                }
+            )
+    events.sort(key=lambda e: e["timestamp"])
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--coins", type=int, default=50)
+    parser.add_argument("--bars", type=int, default=5000)
+    parser.add_argument("--window", type=int, default=1440)
+    args = parser.parse_args()
+    freq_ms = 10_000
+    coins = ["ETH"] + [f"C{i}" for i in range(args.coins - 1)]
+    events = make_events(coins, args.bars, freq_ms)
+    kwargs = dict(
+        N=args.bars,
+        freq_ms=freq_ms,
+        sig_window=args.window,
+        beta_window=args.window,
+    )
+
+    # streaming
+    store = KLineStore(**kwargs)
+    t0 = time.perf_counter()
+    for event in events:
+        store.on_event(event)
+    t_stream = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    store.compute_stats()
+    t_stats = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    reference_stats(store)
+    t_ref = time.perf_counter() - t0
+    print(f"{args.coins} coins, {len(events)} bars, window {args.window}")
+    print(f"streaming update      {t_stream / len(events) * 1e6:8.1f} us / bar")
+    print(f"compute_stats         {t_stats * 1e3:8.3f} ms")
+    print(f"pandas recompute      {t_ref * 1e3:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Append-only binary journal of OMS order/position events.
+
+Each record is a fixed header (payload length, crc32, kind, ts) followed by a
+msgpack payload. The trading thread only enqueues; a background writer owns
+the files, applies every event to its own copy of the state and periodically
+writes a compacted snapshot, then starts a new segment and drops older
+snapshots (and older segments, unless they are retained for post-trade
+replay). Recovery loads the latest snapshot and replays the segments after it,
+stopping at the first torn or corrupt record.
+"""
+
+import argparse
+import copy
+import glob
+import os
+import queue
+import struct
+import threading
+import zlib
+from typing import Dict, Iterator, Tuple
+
+import msgpack
+
+from . import time
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+HEADER = struct.Struct(">IIBd")
+
+ORDER_UPSERT = 1
+ORDER_REMOVE = 2
+POSITIONS = 3
+ACCOUNT = 4
+SNAPSHOT = 5
+
+KIND_NAMES = {
+    ORDER_UPSERT: "order_upsert",
+    ORDER_REMOVE: "order_remove",
+    POSITIONS: "positions",
+    ACCOUNT: "account",
+    SNAPSHOT: "snapshot",
+}
+
+
+def _empty_state() -> Dict:
+    return {"orders": {}, "positions": {}, "account": {}}
+
+
+def apply_record(state: Dict, kind: int, payload) -> None:
+    if kind == ORDER_UPSERT:
+        state["orders"][payload["cloid"]] = payload
+    elif kind == ORDER_REMOVE:
+        state["orders"].pop(payload, None)
+    elif kind == POSITIONS:
+        state["positions"] = payload
+    elif kind == ACCOUNT:
+        state["account"] = payload
+    elif kind == SNAPSHOT:
+        state.clear()
+        state.update(payload)
+
+
+def encode_record(kind: int, payload, ts: float = None) -> bytes:
+    body = msgpack.packb(payload, default=str)
+    ts = time.time() if ts is None else ts
+    return HEADER.pack(len(body), zlib.crc32(body), kind, ts) + body
+
+
+def read_records(fpath: str) -> Iterator[Tuple[float, int, object]]:
+    """Yield (ts, kind, payload) until EOF or the first torn/corrupt record."""
+    with open(fpath, "rb") as f:
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            size, crc, kind, ts = HEADER.unpack(header)
+            body = f.read(size)
+            if len(body) < size or zlib.crc32(body) != crc:
+                logger.warning(f"Journal {fpath}: torn record, stopping replay")
+                return
+            yield ts, kind, msgpack.unpackb(body, strict_map_key=False)
+
+
+def _seq(fpath: str) -> int:
+    return int(os.path.basename(fpath).split(".")[0].split("-")[1])
+
+
+def _files(journal_dir: str, prefix: str):
+    return sorted(glob.glob(os.path.join(journal_dir, f"{prefix}-*.bin")), key=_seq)
+
+
+def replay(
+    journal_dir: str, from_snapshot: bool = True
+) -> Iterator[Tuple[float, int, object]]:
+    """
+    Every record since the latest snapshot, snapshot first. With
+    from_snapshot=False, every retained segment from the beginning, for
+    post-trade analysis.
+    """
+    snapshots = _files(journal_dir, "snapshot")
+    start = 0
+    if snapshots and from_snapshot:
+        start = _seq(snapshots[-1])
+        yield from read_records(snapshots[-1])
+    for fpath in _files(journal_dir, "journal"):
+        if _seq(fpath) >= start:
+            yield from read_records(fpath)
+
+
+def recover(journal_dir: str) -> Dict:
+    """Rebuild {"orders", "positions", "account"} from disk."""
+    state = _empty_state()
+    for _, kind, payload in replay(journal_dir):
+        apply_record(state, kind, payload)
+    return state
+
+
+class OMSJournal:
+
+    def __init__(
+        self,
+        journal_dir: str,
+        stop_event: threading.Event = None,
+        max_queue: int = 100_000,
+        snapshot_every_s: float = 300,
+        flush_every_s: float = 0.1,
+        retain_segments: bool = True,
+    ):
+        self.journal_dir = journal_dir
+        self.stop_event = stop_event or threading.Event()
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.snapshot_every_s = snapshot_every_s
+        self.flush_every_s = flush_every_s
+        self.retain_segments = retain_segments
+        self.dropped = 0
+        self.written = 0
+        # set when an event could not be queued; the owner should then push
+        # a full snapshot so the on-disk state is whole again
+        self.needs_snapshot = False
+        os.makedirs(journal_dir, exist_ok=True)
+        self.recovered = recover(journal_dir)
+        # the writer thread's own copy, never touched by the trading thread
+        self.state = copy.deepcopy(self.recovered)
+        segments = _files(journal_dir, "journal") + _files(journal_dir, "snapshot")
+        self._seq = max([_seq(el) for el in segments] + [0])
+        self._fh = None
+        self._last_snapshot = time.time_rts()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def record(self, kind: int, payload) -> bool:
+        """Non-blocking; returns False if the event was dropped."""
+        try:
+            self.queue.put_nowait((time.time(), kind, payload))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            self.needs_snapshot = True
+            return False
+
+    def order_upsert(self, cloid, order: Dict) -> bool:
+        return self.record(ORDER_UPSERT, {**order, "cloid": cloid})
+
+    def order_remove(self, cloid) -> bool:
+        return self.record(ORDER_REMOVE, cloid)
+
+    def positions(self, positions: Dict) -> bool:
+        return self.record(POSITIONS, dict(positions))
+
+    def account(self, account: Dict) -> bool:
+        return self.record(ACCOUNT, dict(account))
+
+    def snapshot(self, state: Dict):
+        """Queue a full state from the owner, blocking if the queue is full."""
+        self.needs_snapshot = False
+        self.queue.put((time.time(), SNAPSHOT, state))
+
+    def _open_segment(self):
+        if self._fh:
+            self._fh.close()
+        self._seq += 1
+        fpath = os.path.join(self.journal_dir, f"journal-{self._seq:08d}.bin")
+        self._fh = open(fpath, "ab")
+
+    def _compact(self):
+        """Write the writer's state as a snapshot, then drop older files."""
+        seq = self._seq + 1
+        fpath = os.path.join(self.journal_dir, f"snapshot-{seq:08d}.bin")
+        tmp = fpath + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(encode_record(SNAPSHOT, self.state))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, fpath)
+        self._open_segment()
+        old_files = _files(self.journal_dir, "snapshot")
+        if not self.retain_segments:
+            old_files += _files(self.journal_dir, "journal")
+        for old in old_files:
+            if _seq(old) < seq:
+                os.remove(old)
+        self._last_snapshot = time.time_rts()
+
+    def _run(self):
+        self._open_segment()
+        last_flush = time.time_rts()
+        while not (self.stop_event.is_set() and self.queue.empty()):
+            try:
+                ts, kind, payload = self.queue.get(timeout=self.flush_every_s)
+                apply_record(self.state, kind, payload)
+                self._fh.write(encode_record(kind, payload, ts))
+                self.written += 1
+            except queue.Empty:
+                pass
+            tnow = time.time_rts()
+            if tnow - last_flush >= self.flush_every_s:
+                self._fh.flush()
+                last_flush = tnow
+            if tnow - self._last_snapshot >= self.snapshot_every_s:
+                self._compact()
+        self._compact()
+        self._fh.close()
+        logger.info(
+            f"OMSJournal: stopped, {self.written} written, {self.dropped} dropped"
+        )
+
+    def close(self):
+        self.stop_event.set()
+        self.thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dump an OMS journal")
+    parser.add_argument("journal_dir", type=str)
+    parser.add_argument("--full", action="store_true", help="replay all segments")
+    args = parser.parse_args()
+    for ts, kind, payload in replay(args.journal_dir, from_snapshot=not args.full):
+        print(ts, KIND_NAMES.get(kind, kind), payload)
@@ -0,0 +1,189 @@
+"""
+Coalesces OMS order intents into batch trade-server messages.
+
+Intents are held for up to window_ms (on the core.time clock) and then sent
+as one message per (exchange, type, extra), chunked to the exchange's batch
+limit, cancels first, then modifies, then new orders. Redundant intents on
+the same cloid are resolved before anything is sent:
+
+    new    + cancel -> both dropped (on_annulled is told)
+    new    + modify -> one new order at the modified price/qty
+    modify + modify -> last modify
+    modify + cancel -> cancel
+    cancel + modify -> cancel
+    new    + new    -> last new
+    modify / cancel + new -> the new is dropped, its cloid is still live
+
+With window_ms=0 every add is flushed straight away, so only chunking
+applies. Not thread safe: add and run_ticks belong on the trading thread.
+"""
+
+from typing import Callable, Dict, List, Tuple
+
+from . import time
+from .feed import Feed
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+FLUSH_ORDER = ["cancel", "modify", "bulk"]
+
+# Binance futures batchOrders takes at most 5 orders to place or modify; a
+# cancel message may span symbols, BinExec splits it per symbol.
+# Hyperliquid bulk actions are not capped.
+DEFAULT_MAX_BATCH = {
+    ("bin", "bulk"): 5,
+    ("bin", "modify"): 5,
+    ("bin", "cancel"): 10,
+}
+
+
+def _extra_key(extra: Dict):
+    return tuple(sorted((k, repr(v)) for k, v in extra.items()))
+
+
+class OrderBatcher(Feed):
+
+    def __init__(
+        self,
+        submit: Callable,
+        window_ms: float = 0,
+        max_batch: Dict[Tuple[str, str], int] = DEFAULT_MAX_BATCH,
+        on_annulled: Callable = None,
+    ):
+        self.submit = submit
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self.on_annulled = on_annulled
+        # group key -> cloid -> (order, ts_added)
+        self.pending: Dict[Tuple, Dict] = {}
+        self.extras: Dict[Tuple, Dict] = {}
+        self.cloid_group: Dict = {}
+        self.first_pending_ms = None
+        self.n_intents = 0
+        self.n_requests = 0
+        self.n_annulled = 0
+        self.wait_ms = 0.0
+        self.batch_sizes: Dict[int, int] = {}
+
+    def add(self, type: str, exchange: str, orders: List[Dict], extra: Dict = {}):
+        if not orders:
+            return
+        tnow = time.time_ms()
+        key = (exchange, type, _extra_key(extra))
+        self.extras[key] = extra
+        annulled = []
+        for order in orders:
+            self.n_intents += 1
+            self._add_one(key, order, tnow, annulled)
+        if annulled and self.on_annulled:
+            self.on_annulled(annulled)
+        if self.first_pending_ms is None and self.cloid_group:
+            self.first_pending_ms = tnow
+        if self.window_ms <= 0:
+            self.flush()
+
+    def _queue(self, key, cloid, order, ts):
+        self.pending.setdefault(key, {})[cloid] = (order, ts)
+        self.cloid_group[cloid] = key
+
+    def _drop(self, cloid):
+        key = self.cloid_group.pop(cloid)
+        order, ts = self.pending[key].pop(cloid)
+        if not self.pending[key]:
+            del self.pending[key]
+        return key, order, ts
+
+    def _add_one(self, key, order, tnow, annulled):
+        cloid = order.get("cloid")
+        if cloid is None:
+            # nothing to coalesce on, send as its own intent
+            self._queue(key, ("anon", self.n_intents), order, tnow)
+            return
+        prev_key = self.cloid_group.get(cloid)
+        if prev_key is None or prev_key[0] != key[0]:
+            self._queue(key, cloid, order, tnow)
+            return
+        prev_type, new_type = prev_key[1], key[1]
+        if new_type == "cancel":
+            _, prev, _ = self._drop(cloid)
+            if prev_type == "bulk":
+                self.n_annulled += 2
+                annulled.append(prev)
+                return
+            self.n_annulled += 1
+            self._queue(key, cloid, order, tnow)
+        elif new_type == "modify":
+            if prev_type == "cancel":
+                self.n_annulled += 1
+                return
+            _, prev, ts = self._drop(cloid)
+            self.n_annulled += 1
+            if prev_type == "bulk":
+                self._queue(prev_key, cloid, {**prev, **order}, ts)
+            else:
+                self._queue(key, cloid, order, tnow)
+        elif new_type == "bulk":
+            if prev_type != "bulk":
+                # the cloid is live on the exchange, a new order would reuse it
+                logger.warning(f"OrderBatcher: {cloid} has a {prev_type} queued")
+                self.n_annulled += 1
+                return
+            # a re-sent new order replaces the queued one, wherever it sits
+            _, _, ts = self._drop(cloid)
+            self.n_annulled += 1
+            self._queue(key, cloid, order, ts)
+        else:
+            self._queue(key, cloid, order, tnow)
+
+    def flush(self):
+        if not self.pending:
+            self.cloid_group = {}
+            self.first_pending_ms = None
+            return
+        tnow = time.time_ms()
+        for type in FLUSH_ORDER:
+            for key in [k for k in self.pending if k[1] == type]:
+                exchange = key[0]
+                items = list(self.pending.pop(key).values())
+                size = self.max_batch.get((exchange, type)) or len(items)
+                for i in range(0, len(items), size):
+                    chunk = items[i : i + size]
+                    self._send(exchange, type, chunk, self.extras[key], tnow)
+        self.cloid_group = {}
+        self.first_pending_ms = None
+
+    def _send(self, exchange, type, chunk, extra, tnow):
+        self.n_requests += 1
+        self.batch_sizes[len(chunk)] = self.batch_sizes.get(len(chunk), 0) + 1
+        self.wait_ms += sum(tnow - ts for _, ts in chunk)
+        self.submit(
+            {
+                "type": type,
+                "exchange": exchange,
+                "ts_oms_send": tnow,
+                "orders": [order for order, _ in chunk],
+                **extra,
+            }
+        )
+
+    def run_ticks(self):
+        if (
+            self.first_pending_ms is not None
+            and time.time_ms() - self.first_pending_ms >= self.window_ms
+        ):
+            self.flush()
+
+    def stats(self) -> Dict:
+        return {
+            "intents": self.n_intents,
+            "requests": self.n_requests,
+            "annulled": self.n_annulled,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "avg_batch": self.n_intents / max(1, self.n_requests),
+            # what holding intents for the window cost, summed over intents
+            "wait_ms": self.wait_ms,
+        }
+
+    def log_stats(self):
+        logger.info(f"OrderBatcher: {self.stats()}")
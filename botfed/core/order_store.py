@@ -0,0 +1,131 @@
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+from .oms import LocalOrder
+
+_INDEXED = ("coin", "status", "oid")
+# fields compared when reconciling against an exchange snapshot
+_COMPARED = ("coin", "status", "oid", "side", "qty", "price")
+
+
+class OrderStore(MutableMapping):
+    """
+    cloid -> LocalOrder map with secondary indexes on oid and (coin, status).
+
+    Reads behave like the plain dict the OMSs used before. Changes to coin,
+    status or oid must go through set_fields (or re-assignment) so the
+    indexes stay in sync; other fields can be mutated in place. If a
+    journal is attached, every insert, update and removal is recorded.
+    """
+
+    def __init__(self, journal=None):
+        self.journal = journal
+        self._orders: Dict = {}
+        self._by_oid: Dict = {}
+        self._by_coin_status: Dict[Tuple, Dict] = {}
+        self._status_counts: Dict = {}
+
+    def _index(self, cloid, order):
+        key = (order.get("coin"), order.get("status"))
+        self._by_coin_status.setdefault(key, {})[cloid] = order
+        status = order.get("status")
+        self._status_counts[status] = self._status_counts.get(status, 0) + 1
+        if order.get("oid") is not None:
+            self._by_oid[order["oid"]] = cloid
+
+    def _unindex(self, cloid, order):
+        key = (order.get("coin"), order.get("status"))
+        bucket = self._by_coin_status.get(key)
+        if bucket is not None:
+            bucket.pop(cloid, None)
+            if not bucket:
+                del self._by_coin_status[key]
+        status = order.get("status")
+        self._status_counts[status] -= 1
+        if not self._status_counts[status]:
+            del self._status_counts[status]
+        oid = order.get("oid")
+        if oid is not None and self._by_oid.get(oid) == cloid:
+            del self._by_oid[oid]
+
+    def __getitem__(self, cloid) -> LocalOrder:
+        return self._orders[cloid]
+
+    def __setitem__(self, cloid, order: LocalOrder):
+        old = self._orders.get(cloid)
+        if old is not None:
+            self._unindex(cloid, old)
+        self._orders[cloid] = order
+        self._index(cloid, order)
+        if self.journal is not None:
+            self.journal.order_upsert(cloid, order)
+
+    def __delitem__(self, cloid):
+        order = self._orders.pop(cloid)
+        self._unindex(cloid, order)
+        if self.journal is not None:
+            self.journal.order_remove(cloid)
+
+    def __iter__(self):
+        return iter(self._orders)
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __contains__(self, cloid):
+        return cloid in self._orders
+
+    def set_fields(self, cloid, **fields) -> LocalOrder:
+        """Update fields of a stored order in place, re-indexing if needed."""
+        order = self._orders[cloid]
+        if any(k in _INDEXED and order.get(k) != v for k, v in fields.items()):
+            self._unindex(cloid, order)
+            order.update(fields)
+            self._index(cloid, order)
+        else:
+            order.update(fields)
+        if self.journal is not None:
+            self.journal.order_upsert(cloid, order)
+        return order
+
+    def get_by_oid(self, oid) -> LocalOrder:
+        cloid = self._by_oid.get(oid)
+        return self._orders.get(cloid) if cloid is not None else None
+
+    def get_orders(self, coin, statuses: Iterable) -> List[LocalOrder]:
+        orders = []
+        for status in statuses:
+            bucket = self._by_coin_status.get((coin, status))
+            if bucket:
+                orders.extend(bucket.values())
+        return orders
+
+    def status_counts(self) -> Dict:
+        return dict(self._status_counts)
+
+    def reconcile(
+        self, snapshot: Mapping, keep: Iterable[str] = ("created_at",)
+    ) -> Tuple[int, int, int]:
+        """
+        Bring the store in line with an exchange snapshot (cloid -> order) by
+        diffing: drop orders absent from the snapshot, add new ones and
+        re-assign changed ones, carrying over locally-known `keep` fields.
+        Returns (added, removed, changed).
+        """
+        removed = [cloid for cloid in self._orders if cloid not in snapshot]
+        for cloid in removed:
+            del self[cloid]
+        added = changed = 0
+        for cloid, order in snapshot.items():
+            old = self._orders.get(cloid)
+            if old is None:
+                self[cloid] = order
+                added += 1
+                continue
+            for field in keep:
+                if field in old and field not in order:
+                    order[field] = old[field]
+            if any(old.get(k) != order.get(k) for k in _COMPARED):
+                self[cloid] = order
+                changed += 1
+        return added, len(removed), changed
@@ -0,0 +1,162 @@
+"""
+Latency model and time-ordered event queue for simulation.
+
+Delays are in milliseconds on the `core.time` sim clock. Events are kept in a
+binary heap keyed on (due_ms, seq), so scheduling and popping are O(log n) and
+events due at the same ms fire in submission order.
+"""
+
+import heapq
+import math
+import random
+import statistics
+from typing import Callable, List, Sequence
+
+from . import time
+from .feed import Feed
+
+
+class LatencyDist:
+    """Delay distribution in ms. Draws are clipped to [min_ms, max_ms]."""
+
+    def __init__(
+        self,
+        kind: str = "const",
+        value_ms: float = 0,
+        mu: float = 0,
+        sigma: float = 0,
+        samples: Sequence[float] = None,
+        min_ms: float = 0,
+        max_ms: float = math.inf,
+        seed: int = None,
+    ):
+        assert kind in ["const", "lognormal", "empirical"]
+        self.kind = kind
+        self.value_ms = value_ms
+        self.mu = mu
+        self.sigma = sigma
+        self.samples = sorted(samples) if samples is not None else []
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.rng = random.Random(seed)
+        if kind == "empirical" and not self.samples:
+            raise ValueError("Empirical latency requires samples")
+
+    @classmethod
+    def const(cls, value_ms: float):
+        return cls("const", value_ms=value_ms)
+
+    @classmethod
+    def from_samples(cls, samples_ms: Sequence[float], kind="lognormal", seed=None):
+        """Fit to measured latencies, e.g. from prod_metrics.bin_order_latency."""
+        samples = [float(el) for el in samples_ms if el is not None and el > 0]
+        if not samples:
+            raise ValueError("No positive latency samples to fit")
+        if kind == "empirical":
+            return cls("empirical", samples=samples, seed=seed)
+        logs = [math.log(el) for el in samples]
+        sigma = statistics.pstdev(logs) if len(logs) > 1 else 0
+        return cls(
+            "lognormal",
+            mu=statistics.fmean(logs),
+            sigma=sigma,
+            min_ms=min(samples),
+            max_ms=max(samples),
+            seed=seed,
+        )
+
+    def sample(self) -> float:
+        if self.kind == "const":
+            delay = self.value_ms
+        elif self.kind == "lognormal":
+            delay = self.rng.lognormvariate(self.mu, self.sigma)
+        else:
+            # inverse cdf with linear interpolation between order stats
+            u = self.rng.random() * (len(self.samples) - 1)
+            idx = int(u)
+            if idx + 1 < len(self.samples):
+                frac = u - idx
+                delay = self.samples[idx] * (1 - frac) + self.samples[idx + 1] * frac
+            else:
+                delay = self.samples[idx]
+        return min(max(delay, self.min_ms), self.max_ms)
+
+    def quantile(self, q: float) -> float:
+        if self.kind == "const":
+            return self.value_ms
+        if self.kind == "empirical":
+            return self.samples[int(q * (len(self.samples) - 1))]
+        z = statistics.NormalDist().inv_cdf(q)
+        return min(max(math.exp(self.mu + self.sigma * z), self.min_ms), self.max_ms)
+
+
+class LatencyModel:
+    """
+    entry: strategy send -> exchange applies the action
+    ack: exchange response / private fill -> strategy sees it
+    md: exchange market data -> strategy sees it
+    """
+
+    def __init__(
+        self,
+        entry: LatencyDist = None,
+        ack: LatencyDist = None,
+        md: LatencyDist = None,
+    ):
+        self.entry = entry or LatencyDist.const(0)
+        self.ack = ack or LatencyDist.const(0)
+        self.md = md or LatencyDist.const(0)
+
+    def reseed(self, seed: int):
+        """Restart every distribution's draws from seed (each its own
+        stream)."""
+        for i, dist in enumerate((self.entry, self.ack, self.md)):
+            dist.rng.seed(seed * 3 + i)
+
+    def entry_ms(self) -> float:
+        return self.entry.sample()
+
+    def ack_ms(self) -> float:
+        return self.ack.sample()
+
+    def md_ms(self) -> float:
+        return self.md.sample()
+
+
+class SimEventQueue(Feed):
+    """Time-ordered queue of callbacks on the sim clock."""
+
+    def __init__(self):
+        self._heap: List = []
+        self._seq = 0
+        self.n_scheduled = 0
+        self.n_fired = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule_at(self, due_ms: float, fn: Callable, *args):
+        self._seq += 1
+        self.n_scheduled += 1
+        heapq.heappush(self._heap, (due_ms, self._seq, fn, args))
+
+    def schedule(self, delay_ms: float, fn: Callable, *args):
+        self.schedule_at(time.time_ms() + delay_ms, fn, *args)
+
+    def next_due_ms(self):
+        return self._heap[0][0] if self._heap else None
+
+    def run_until(self, ts_ms: float) -> int:
+        """Fire every event due at or before ts_ms, including ones scheduled
+        by callbacks while draining. Returns the number fired."""
+        fired = 0
+        heap = self._heap
+        while heap and heap[0][0] <= ts_ms:
+            _, _, fn, args = heapq.heappop(heap)
+            fn(*args)
+            fired += 1
+        self.n_fired += fired
+        return fired
+
+    def run_ticks(self):
+        self.run_until(time.time_ms())
@@ -0,0 +1,341 @@
+"""
+Batch backtests over recorded data_collector output.
+
+Each (coin, day) shard is decoded once from the hourly jsonl.gz files into
+columnar numpy arrays and cached as .npy files. Runs open the cache with
+mmap_mode="r", so parameter sweeps across worker processes share one page
+cache instead of re-parsing JSON. Shards are replayed through SimExchange /
+HLInterfaceSim in separate processes and the per-shard results are merged
+into one DataFrame. Each shard re-seeds its copy of the latency model from
+(seed, coin, day), so shards draw different latencies, and a given seed
+reproduces a run; parameter sets of the same shard share the draws.
+"""
+
+import argparse
+import datetime as dt
+import glob
+import gzip
+import hashlib
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..core import time
+from ..core.order_book import OrderBookBase
+from ..core.sim_latency import LatencyModel
+from ..logger import get_logger
+from .hl_interface_sim import HLInterfaceSim
+from .sim_exchange import SimExchange
+
+logger = get_logger(__name__)
+
+DATA_DIR = "../data/hyperliquid_hft"
+CACHE_DIR = "../data/hyperliquid_hft_cache"
+
+TRADE_FIELDS = ["ts", "px", "sz", "side", "ts_recv"]
+BBO_FIELDS = ["ts", "bid", "bid_sz", "ask", "ask_sz", "ts_recv"]
+
+# side: 1 if the aggressor bought ("B"), -1 if it sold ("A")
+SIDE_BUY = 1
+SIDE_SELL = -1
+
+
+def day_dir(coin: str, day: dt.date, data_dir=DATA_DIR) -> str:
+    return os.path.join(
+        data_dir, coin, day.strftime("%Y"), day.strftime("%m"), day.strftime("%d")
+    )
+
+
+def shard_cache_dir(coin: str, day: dt.date, cache_dir=CACHE_DIR) -> str:
+    return os.path.join(cache_dir, coin, day.strftime("%Y%m%d"))
+
+
+def _iter_lines(coin, day, feed_name, data_dir):
+    fpaths = sorted(
+        glob.glob(os.path.join(day_dir(coin, day, data_dir), f"*_{feed_name}.jsonl.gz"))
+    )
+    for fpath in fpaths:
+        with gzip.open(fpath, "rt") as f:
+            for line in f:
+                yield json.loads(line)
+
+
+def decode_trades(coin, day, data_dir=DATA_DIR) -> Dict[str, np.ndarray]:
+    ts, px, sz, side, ts_recv = [], [], [], [], []
+    for msg in _iter_lines(coin, day, "trades", data_dir):
+        for trade in msg["data"]:
+            ts.append(trade["time"])
+            px.append(float(trade["px"]))
+            sz.append(float(trade["sz"]))
+            side.append(SIDE_BUY if trade["side"] == "B" else SIDE_SELL)
+            ts_recv.append(msg["ts_recv_host"])
+    cols = {
+        "ts": np.array(ts, dtype=np.int64),
+        "px": np.array(px, dtype=np.float64),
+        "sz": np.array(sz, dtype=np.float64),
+        "side": np.array(side, dtype=np.int8),
+        "ts_recv": np.array(ts_recv, dtype=np.float64),
+    }
+    order = np.argsort(cols["ts"], kind="stable")
+    return {k: v[order] for k, v in cols.items()}
+
+
+def decode_bbo(coin, day, data_dir=DATA_DIR) -> Dict[str, np.ndarray]:
+    rows = []
+    for msg in _iter_lines(coin, day, "bbo", data_dir):
+        data = msg["data"]
+        bid, ask = data["bbo"]
+        if bid is None or ask is None:
+            continue
+        rows.append(
+            (
+                data["time"],
+                float(bid["px"]),
+                float(bid["sz"]),
+                float(ask["px"]),
+                float(ask["sz"]),
+                msg["ts_recv_host"],
+            )
+        )
+    arr = np.array(rows, dtype=np.float64).reshape(-1, len(BBO_FIELDS))
+    cols = {field: arr[:, idx] for idx, field in enumerate(BBO_FIELDS)}
+    cols["ts"] = cols["ts"].astype(np.int64)
+    order = np.argsort(cols["ts"], kind="stable")
+    return {k: np.ascontiguousarray(v[order]) for k, v in cols.items()}
+
+
+def _save_cols(path, cols):
+    os.makedirs(path, exist_ok=True)
+    for field, arr in cols.items():
+        tmp = os.path.join(path, f"{field}.tmp.npy")
+        np.save(tmp, arr)
+        os.replace(tmp, os.path.join(path, f"{field}.npy"))
+
+
+def _load_cols(path, fields):
+    return {
+        field: np.load(os.path.join(path, f"{field}.npy"), mmap_mode="r")
+        for field in fields
+    }
+
+
+def load_shard(
+    coin: str, day: dt.date, data_dir=DATA_DIR, cache_dir=CACHE_DIR, rebuild=False
+) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """Columnar trades and bbo for one (coin, day), memory-mapped from cache."""
+    path = shard_cache_dir(coin, day, cache_dir)
+    trades_path = os.path.join(path, "trades")
+    bbo_path = os.path.join(path, "bbo")
+    done = os.path.join(path, "_SUCCESS")
+    if rebuild or not os.path.exists(done):
+        _save_cols(trades_path, decode_trades(coin, day, data_dir))
+        _save_cols(bbo_path, decode_bbo(coin, day, data_dir))
+        with open(done, "w") as f:
+            f.write(dt.datetime.now(dt.timezone.utc).isoformat())
+    return _load_cols(trades_path, TRADE_FIELDS), _load_cols(bbo_path, BBO_FIELDS)
+
+
+class ShardBook(OrderBookBase):
+    """Top-of-book only book driven straight from bbo arrays."""
+
+    def __init__(self, coin):
+        super().__init__(coin)
+
+    def set_bbo(self, ts, bid, bid_sz, ask, ask_sz):
+        self.book_data = {
+            "bids": [{"px": bid, "sz": bid_sz}],
+            "asks": [{"px": ask, "sz": ask_sz}],
+            "time": ts,
+        }
+
+    def _on_book_update(self, book_msg):
+        pass
+
+    @property
+    def exchange(self):
+        return "hyperliquid"
+
+
+def run_shard(
+    coin: str,
+    day: dt.date,
+    strategy_factory: Callable,
+    params: Dict = {},
+    cfg: Dict = {},
+    latency: LatencyModel = None,
+    timer_ms: int = 1000,
+    data_dir=DATA_DIR,
+    cache_dir=CACHE_DIR,
+    seed: int = None,
+) -> Dict:
+    """
+    Replay one shard. strategy_factory(iface, coin, params) returns an object
+    whose on_timer() is called every timer_ms of sim time; it reaches the
+    market through iface (subscribe / submit_orders / cancel_orders ...).
+    seed: re-seed latency with shard_seed(seed, coin, day).
+    """
+    time.sim = True
+    if latency is not None and seed is not None:
+        latency.reseed(shard_seed(seed, coin, day))
+    trades, bbo = load_shard(coin, day, data_dir, cache_dir)
+    book = ShardBook(coin)
+    exch = SimExchange({coin: book}, cfg)
+    iface = HLInterfaceSim(exch, latency=latency)
+    strategy = strategy_factory(iface, coin, params)
+
+    # merge both streams into one time-ordered event index
+    n_bbo = len(bbo["ts"])
+    ts_all = np.concatenate([bbo["ts"], trades["ts"]])
+    order = np.argsort(ts_all, kind="stable")
+    bbo_key = ("bbo", coin)
+    trades_key = ("trades", coin)
+    next_timer = int(ts_all[order[0]]) if len(order) else 0
+    n_fills = 0
+
+    def count_fills(msg):
+        nonlocal n_fills
+        n_fills += len(msg["data"]["fills"])
+
+    exch.add_listener_user_events(count_fills)
+
+    for idx in order:
+        ts = int(ts_all[idx])
+        while next_timer <= ts:
+            time.set_time_ms(next_timer)
+            iface.events.run_until(next_timer)
+            strategy.on_timer()
+            next_timer += timer_ms
+        time.set_time_ms(ts)
+        iface.events.run_until(ts)
+        if idx < n_bbo:
+            b, bq, a, aq = (
+                bbo["bid"][idx],
+                bbo["bid_sz"][idx],
+                bbo["ask"][idx],
+                bbo["ask_sz"][idx],
+            )
+            book.set_bbo(ts, b, bq, a, aq)
+            if bbo_key in iface.subscriptions:
+                iface.on_market_data(
+                    {
+                        "channel": "bbo",
+                        "data": {
+                            "coin": coin,
+                            "time": ts,
+                            "bbo": [{"px": b, "sz": bq}, {"px": a, "sz": aq}],
+                        },
+                    }
+                )
+        else:
+            tidx = idx - n_bbo
+            trade = {
+                "coin": coin,
+                "px": trades["px"][tidx],
+                "sz": trades["sz"][tidx],
+                "side": "B" if trades["side"][tidx] == SIDE_BUY else "A",
+                "time": ts,
+            }
+            if trades_key in iface.subscriptions:
+                iface.on_market_data({"channel": "trades", "data": [trade]})
+            else:
+                exch.on_trade(trade)
+
+    pos = exch.positions.get(coin, {"sz": 0})
+    return {
+        "coin": coin,
+        "day": day,
+        **params,
+        "pnl": exch.pnl() if book.mid_price() else exch.acct_bal - exch.init_bal,
+        "vlm_traded": exch.vlm_traded,
+        "fees": exch.total_fees,
+        "n_fills": n_fills,
+        "end_pos": pos["sz"],
+        "n_trades": len(trades["ts"]),
+        "n_bbo": n_bbo,
+    }
+
+
+def shard_seed(seed: int, coin: str, day: dt.date) -> int:
+    """Stable across processes, unlike hash() of a str."""
+    digest = hashlib.sha256(f"{seed}|{coin}|{day}".encode()).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+def _run_task(kwargs):
+    return run_shard(**kwargs)
+
+
+def run_backtest(
+    coins: List[str],
+    days: List[dt.date],
+    strategy_factory: Callable,
+    param_grid: List[Dict] = [{}],
+    processes: int = None,
+    seed: int = None,
+    **kwargs,
+) -> pd.DataFrame:
+    """One process task per (coin, day, params). strategy_factory must be a
+    module-level callable so it pickles. seed: latency draws, a random one
+    if None."""
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**32)
+        logger.info(f"run_backtest: latency seed {seed}")
+    # decode up front so sweep workers only ever mmap the cache
+    for coin in coins:
+        for day in days:
+            load_shard(
+                coin,
+                day,
+                kwargs.get("data_dir", DATA_DIR),
+                kwargs.get("cache_dir", CACHE_DIR),
+            )
+    tasks = [
+        dict(
+            coin=coin,
+            day=day,
+            strategy_factory=strategy_factory,
+            params=params,
+            seed=seed,
+            **kwargs,
+        )
+        for params in param_grid
+        for coin in coins
+        for day in days
+    ]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        results = list(pool.map(_run_task, tasks))
+    return pd.DataFrame(results)
+
+
+def summarize(results: pd.DataFrame, by=("coin",)) -> pd.DataFrame:
+    agg = results.groupby(list(by))[["pnl", "vlm_traded", "fees", "n_fills"]].sum()
+    agg["bips"] = agg["pnl"] / (1 + agg["vlm_traded"]) * 1e4
+    return agg
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Decode recorded shards into the backtest cache"
+    )
+    parser.add_argument("--coins", nargs="+", required=True)
+    parser.add_argument("--start", type=dt.date.fromisoformat, required=True)
+    parser.add_argument("--end", type=dt.date.fromisoformat, required=True)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+    day = args.start
+    while day <= args.end:
+        for coin in args.coins:
+            trades, bbo = load_shard(
+                coin, day, args.data_dir, args.cache_dir, args.rebuild
+            )
+            logger.info(
+                f"{coin} {day}: {len(trades['ts'])} trades, {len(bbo['ts'])} bbo"
+            )
+        day += dt.timedelta(days=1)
@@ -0,0 +1,387 @@
+"""
+Pre-signed "cancel everything resting on coin X" actions for Hyperliquid.
+
+Pulling quotes on a fast move should cost one post, not a sign plus a post
+per coin. CancelPipeline keeps, per coin, a cancelByCloid action for the
+current resting set, signed in a background thread whenever that set changes.
+pull() then only has to post, with up to max_in_flight actions going out
+concurrently over pooled keep-alive connections. Orders leave the resting
+set when cancelled through the pipeline, when a bulk response or an
+orderUpdates message reports them filled / cancelled / rejected, and on a
+periodic resync against the account's open orders.
+
+Every action of the signer has to draw its nonce from one NonceAllocator, so
+nonces stay unique and increasing across threads: install_nonces() points
+the signer's Exchange instance at it. Hyperliquid only accepts a nonce
+larger than the smallest of the signer's 100 highest used nonces, so a
+pre-signed action is re-signed once refresh_after actions were posted since
+it was signed (or it is older than max_age_s); each one is posted at most
+once.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List
+
+import orjson as json
+from hyperliquid.utils.constants import MAINNET_API_URL
+
+from ..logger import get_logger
+from .sdk_api import create_session
+from .utils.signing import get_timestamp_ms, sign_l1_action
+
+logger = get_logger(__name__)
+
+# Hyperliquid keeps the 100 highest nonces per signer
+NONCE_SET_SIZE = 100
+# orderUpdates statuses of an order that can still be cancelled
+LIVE_STATUSES = ("open", "triggered")
+
+
+class NonceAllocator:
+    """
+    Millisecond timestamps, bumped so no two callers get the same one.
+
+    `used` counts nonces that reached the exchange: next() assumes the
+    action is posted right away, reserve() leaves it to the caller to
+    mark_used() when (if ever) the action is posted.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last = 0
+        self.used = 0
+
+    def reserve(self) -> int:
+        with self.lock:
+            self.last = max(get_timestamp_ms(), self.last + 1)
+            return self.last
+
+    def mark_used(self):
+        with self.lock:
+            self.used += 1
+
+    def next(self) -> int:
+        with self.lock:
+            self.last = max(get_timestamp_ms(), self.last + 1)
+            self.used += 1
+            return self.last
+
+
+def raw_cloid(cloid) -> str:
+    """OMS int cloid, Cloid or hex string -> the hex string on the wire."""
+    if isinstance(cloid, int):
+        return f"{cloid:#034x}"
+    if isinstance(cloid, str):
+        return cloid
+    return cloid.to_raw()
+
+
+def install_nonces(exchange, nonces: NonceAllocator):
+    """Make one Exchange instance draw its nonces from `nonces`.
+
+    Only the local Exchange classes (exchange, exchange_async, exchange_ws)
+    take a per-instance nonce source; other instances keep theirs.
+    """
+    if not hasattr(exchange, "next_nonce"):
+        raise TypeError(
+            f"{type(exchange).__module__}.{type(exchange).__name__} has no "
+            "per-instance nonce source, use botfed.hyperliquid.exchange"
+        )
+    exchange.next_nonce = nonces.next
+
+
+def open_order_cancels(open_orders, coins=None) -> List[Dict]:
+    """bulk_cancel requests for the openOrders entries on coins (default:
+    all)."""
+    return [
+        {"coin": el["coin"], "oid": el["oid"]}
+        for el in open_orders
+        if coins is None or el["coin"] in coins
+    ]
+
+
+class CancelPipeline:
+
+    def __init__(
+        self,
+        wallet,
+        coin_to_asset: Dict[str, int],
+        base_url: str = MAINNET_API_URL,
+        vault_address: str = None,
+        nonces: NonceAllocator = None,
+        max_in_flight: int = 4,
+        refresh_after: int = NONCE_SET_SIZE // 2,
+        max_age_s: float = 3600,
+        stop_event: threading.Event = None,
+        open_orders: Callable[[], List[Dict]] = None,
+        resync_s: float = 10,
+    ):
+        """open_orders: returns the account's frontendOpenOrders; polled every
+        resync_s to drop resting cloids that filled or were cancelled
+        outside the pipeline."""
+        self.wallet = wallet
+        self.coin_to_asset = coin_to_asset
+        self.base_url = base_url
+        self.is_mainnet = base_url == MAINNET_API_URL
+        self.vault_address = vault_address
+        self.nonces = nonces or NonceAllocator()
+        self.refresh_after = refresh_after
+        self.max_age_s = max_age_s
+        self.stop_event = stop_event or threading.Event()
+        self.open_orders = open_orders
+        self.resync_s = resync_s
+        self.last_resync = time.time()
+        self.session = create_session(
+            pool_connections=1, pool_maxsize=max_in_flight, max_retries=0
+        )
+        self.session.headers.update({"Content-Type": "application/json"})
+        self.pool = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.cond = threading.Condition()
+        self.resting: Dict[str, set] = {}
+        # cloid -> when it was added, a resync only drops older ones
+        self.added_at: Dict[str, float] = {}
+        self.dirty: set = set()
+        # coin -> (frozenset of cloids, payload, nonce seq, ts signed)
+        self.presigned: Dict[str, tuple] = {}
+        self.n_presigned_hits = 0
+        self.n_signed_inline = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def from_exchange(cls, exchange, **kwargs):
+        coin_to_asset = getattr(exchange, "coin_to_asset", None)
+        if coin_to_asset is None:
+            coin_to_asset = exchange.info.name_to_asset
+        return cls(
+            exchange.wallet,
+            coin_to_asset,
+            base_url=exchange.base_url,
+            vault_address=exchange.vault_address,
+            **kwargs,
+        )
+
+    # resting set, cloids may be given as OMS ints, Cloid or hex strings
+
+    def set_resting(self, coin: str, cloids: Iterable):
+        with self.cond:
+            cloids = {raw_cloid(el) for el in cloids}
+            self._forget(self.resting.get(coin, set()) - cloids)
+            self.resting[coin] = cloids
+            self.added_at.update(dict.fromkeys(cloids, time.time()))
+            self.dirty.add(coin)
+            self.cond.notify()
+
+    def add_resting(self, coin: str, cloids: Iterable):
+        with self.cond:
+            cloids = {raw_cloid(el) for el in cloids}
+            self.resting.setdefault(coin, set()).update(cloids)
+            self.added_at.update(dict.fromkeys(cloids, time.time()))
+            self.dirty.add(coin)
+            self.cond.notify()
+
+    def remove_resting(self, coin: str, cloids: Iterable):
+        with self.cond:
+            resting = self.resting.get(coin)
+            if not resting:
+                return
+            gone = resting.intersection(raw_cloid(el) for el in cloids)
+            if gone:
+                resting -= gone
+                self._forget(gone)
+                self.dirty.add(coin)
+                self.cond.notify()
+
+    def _forget(self, cloids):
+        for cloid in cloids:
+            self.added_at.pop(cloid, None)
+
+    def on_bulk_response(self, orders: List[Dict], result: Dict):
+        """Track a bulk order response: orders reported resting join the
+        resting set, those filled at once (IOC, crossing) or rejected (ALO
+        that would cross, margin) leave it."""
+        try:
+            statuses = result["response"]["data"]["statuses"]
+        except (KeyError, TypeError):
+            return
+        resting, done = {}, {}
+        for order, status in zip(orders, statuses):
+            if order.get("cloid") is None:
+                continue
+            side = resting if "resting" in status else done
+            side.setdefault(order["coin"], []).append(order["cloid"])
+        for coin, cloids in resting.items():
+            self.add_resting(coin, cloids)
+        for coin, cloids in done.items():
+            self.remove_resting(coin, cloids)
+
+    def on_order_updates(self, updates: Iterable[Dict]):
+        """orderUpdates messages: filled, cancelled and rejected orders leave
+        the resting set."""
+        done = {}
+        for el in updates:
+            order = el["order"]
+            if el["status"] not in LIVE_STATUSES and order.get("cloid"):
+                done.setdefault(order["coin"], []).append(order["cloid"])
+        for coin, cloids in done.items():
+            self.remove_resting(coin, cloids)
+
+    def resync(self, open_orders: Iterable[Dict], as_of: float):
+        """Drop resting cloids added before as_of that are missing from
+        open_orders (frontendOpenOrders requested at as_of)."""
+        live = {
+            (el["coin"], el["cloid"].lower()) for el in open_orders if el.get("cloid")
+        }
+        with self.cond:
+            for coin, resting in self.resting.items():
+                gone = {
+                    cloid
+                    for cloid in resting
+                    if (coin, cloid) not in live and self.added_at.get(cloid, 0) < as_of
+                }
+                if gone:
+                    resting -= gone
+                    self._forget(gone)
+                    self.dirty.add(coin)
+            self.cond.notify()
+
+    def _maybe_resync(self):
+        if self.open_orders is None or time.time() - self.last_resync < self.resync_s:
+            return
+        self.last_resync = as_of = time.time()
+        try:
+            self.resync(self.open_orders(), as_of)
+        except Exception as e:
+            logger.warning(f"CancelPipeline: open orders resync failed: {e}")
+
+    # signing
+
+    def _sign(self, coin: str, cloids: frozenset):
+        nonce = self.nonces.reserve()
+        seq = self.nonces.used
+        asset = self.coin_to_asset[coin]
+        action = {
+            "type": "cancelByCloid",
+            "cancels": [{"asset": asset, "cloid": cloid} for cloid in sorted(cloids)],
+        }
+        signature = sign_l1_action(
+            self.wallet, action, self.vault_address, nonce, self.is_mainnet
+        )
+        payload = {
+            "action": action,
+            "nonce": nonce,
+            "signature": signature,
+            "vaultAddress": self.vault_address,
+        }
+        return cloids, payload, seq, time.time()
+
+    def _stale(self, entry) -> bool:
+        _, _, seq, ts = entry
+        return (
+            self.nonces.used - seq >= self.refresh_after
+            or time.time() - ts >= self.max_age_s
+        )
+
+    def _refresh(self, coin):
+        with self.cond:
+            cloids = frozenset(self.resting.get(coin, ()))
+        entry = self._sign(coin, cloids) if cloids else None
+        with self.cond:
+            # the set may have moved on (or been pulled) while signing
+            if frozenset(self.resting.get(coin, ())) != cloids:
+                self.dirty.add(coin)
+            elif entry is None:
+                self.presigned.pop(coin, None)
+            else:
+                self.presigned[coin] = entry
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self._maybe_resync()
+            with self.cond:
+                if not self.dirty:
+                    self.cond.wait(timeout=1)
+                dirty, self.dirty = self.dirty, set()
+            dirty.update(
+                coin
+                for coin, entry in list(self.presigned.items())
+                if self._stale(entry)
+            )
+            for coin in dirty:
+                try:
+                    self._refresh(coin)
+                except Exception as e:
+                    logger.error(f"CancelPipeline: failed to sign {coin}: {e}")
+
+    def _take(self, coin: str, cloids: frozenset = None):
+        """Pop the pre-signed payload for coin if it is fresh and, when given,
+        covers exactly `cloids`; sign one inline otherwise. The cancelled
+        cloids leave the resting set."""
+        with self.cond:
+            entry = self.presigned.pop(coin, None)
+            resting = self.resting.setdefault(coin, set())
+            wanted = frozenset(resting) if cloids is None else cloids
+            resting.difference_update(wanted)
+            self._forget(wanted)
+            self.dirty.add(coin)
+            self.cond.notify()
+        if entry is not None and entry[0] == wanted and not self._stale(entry):
+            self.n_presigned_hits += 1
+            return entry[1]
+        if not wanted:
+            return None
+        self.n_signed_inline += 1
+        return self._sign(coin, wanted)[1]
+
+    # posting
+
+    def _post(self, payload) -> Dict:
+        resp = self.session.post(
+            self.base_url + "/exchange", data=json.dumps(payload), timeout=5
+        )
+        return resp.json()
+
+    def submit(self, coin: str, cloids: Iterable = None) -> Future:
+        """Cancel `cloids` on coin (default: everything resting) without
+        waiting. Resolves to the exchange response, None if nothing rests."""
+        if cloids is not None:
+            cloids = frozenset(raw_cloid(el) for el in cloids)
+        payload = self._take(coin, cloids)
+        if payload is None:
+            fut = Future()
+            fut.set_result(None)
+            return fut
+        self.nonces.mark_used()
+        return self.pool.submit(self._post, payload)
+
+    def pull(self, coins: List[str] = None, timeout: float = 5) -> Dict:
+        """Cancel everything resting on coins (default: all), concurrently."""
+        if coins is None:
+            with self.cond:
+                coins = [coin for coin, cloids in self.resting.items() if cloids]
+        futs = {coin: self.submit(coin) for coin in coins}
+        results = {}
+        for coin, fut in futs.items():
+            try:
+                results[coin] = fut.result(timeout=timeout)
+            except Exception as e:
+                logger.error(f"CancelPipeline: pull {coin} failed: {e}")
+                results[coin] = {"error": str(e)}
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            "presigned_hits": self.n_presigned_hits,
+            "signed_inline": self.n_signed_inline,
+            "presigned_coins": len(self.presigned),
+        }
+
+    def close(self):
+        self.stop_event.set()
+        with self.cond:
+            self.cond.notify()
+        self.thread.join(timeout=5)
+        self.pool.shutdown(wait=False)
+        self.session.close()
@@ -51,6 +51,8 @@ class Exchange(API):
         else:
             self.meta = meta
         self.coin_to_asset = {asset_info["name"]: asset for (asset, asset_info) in enumerate(self.meta["universe"])}
+        # nonce source for this instance's actions, see cancel_pipeline.install_nonces
+        self.next_nonce = get_timestamp_ms
 
     def _post_action(self, action, signature, nonce):
         payload = {
@@ -104,7 +106,7 @@ class Exchange(API):
         order_wires: List[OrderWire] = [
             order_request_to_order_wire(order, self.coin_to_asset[order["coin"]]) for order in order_requests
         ]
-        timestamp = get_timestamp_ms()
+        timestamp = self.next_nonce()
 
         order_action = order_wires_to_order_action(order_wires)
 
@@ -148,7 +150,7 @@ class Exchange(API):
         return self.bulk_modify_orders_new([modify])
 
     def bulk_modify_orders_new(self, modify_requests: List[ModifyRequest]) -> Any:
-        timestamp = get_timestamp_ms()
+        timestamp = self.next_nonce()
         modify_wires = [
             {
                 "oid": modify["oid"],
@@ -225,7 +227,7 @@ class Exchange(API):
         return self.bulk_cancel_by_cloid([{"coin": coin, "cloid": cloid}])
 
     def bulk_cancel(self, cancel_requests: List[CancelRequest]) -> Any:
-        timestamp = get_timestamp_ms()
+        timestamp = self.next_nonce()
         cancel_action = {
             "type": "cancel",
             "cancels": [
@@ -251,7 +253,7 @@ class Exchange(API):
         )
 
     def bulk_cancel_by_cloid(self, cancel_requests: List[CancelByCloidRequest]) -> Any:
-        timestamp = get_timestamp_ms()
+        timestamp = self.next_nonce()
 
         cancel_action = {
             "type": "cancelByCloid",
@@ -278,7 +280,7 @@ class Exchange(API):
         )
 
     def update_leverage(self, leverage: int, coin: str, is_cross: bool = True) -> Any:
-        timestamp = get_timestamp_ms()
+        timestamp = self.next_nonce()
         asset = self.coin_to_asset[coin]
         update_leverage_action = {
             "type": "updateLeverage",
@@ -300,7 +302,7 @@ class Exchange(API):
         )
 
     def update_isolated_margin(self, amount: float, coin: str) -> Any:
-        timestamp = get_timestamp_ms()
+        timestamp = self.next_nonce()
         asset = self.coin_to_asset[coin]
         amount = float_to_usd_int(amount)
         update_isolated_margin_action = {
@@ -323,7 +325,7 @@ class Exchange(API):
         )
 
     def set_referrer(self, code: str) -> Any:
-        timestamp = get_timestamp_ms()
+        timestamp = self.next_nonce()
         set_referrer_action = {
             "type": "setReferrer",
             "code": code,
@@ -342,7 +344,7 @@ class Exchange(API):
         )
 
     def usd_transfer(self, amount: float, destination: str) -> Any:
-        timestamp = get_timestamp_ms()
+        timestamp = self.next_nonce()
         payload = {
             "destination": destination,
             "amount": str(amount),
@@ -361,7 +363,7 @@ class Exchange(API):
         )
 
     def withdraw_from_bridge(self, usd: float, destination: str) -> Any:
-        timestamp = get_timestamp_ms()
+        timestamp = self.next_nonce()
         payload = {
             "destination": destination,
             "usd": str(usd),
@@ -390,7 +392,7 @@ class Exchange(API):
             "source": "https://hyperliquid.xyz",
             "connectionId": connection_id,
         }
-        timestamp = get_timestamp_ms()
+        timestamp = self.next_nonce()
         is_mainnet = self.base_url == MAINNET_API_URL
         signature = sign_agent(self.wallet, agent, is_mainnet)
         agent["connectionId"] = to_hex(agent["connectionId"])
@@ -52,6 +52,8 @@ class Exchange(API):
         else:
             self.meta = meta
         self.coin_to_asset = {asset_info["name"]: asset for (asset, asset_info) in enumerate(self.meta["universe"])}
+        # nonce source for this instance's actions, see cancel_pipeline.install_nonces
+        self.next_nonce = get_timestamp_ms
 
     async def _post_action(self, action, signature, nonce):
         payload = {
@@ -105,7 +107,7 @@ class Exchange(API):
         order_wires: List[OrderWire] = [
             order_request_to_order_wire(order, self.coin_to_asset[order["coin"]]) for order in order_requests
         ]
-        timestamp = get_timestamp_ms()
+        timestamp = self.next_nonce()
 
         order_action = order_wires_to_order_action(order_wires)
 
@@ -149,7 +151,7 @@ class Exchange(API):
         return await self.bulk_modify_orders_new([modify])
 
     async def bulk_modify_orders_new(self, modify_requests: List[ModifyRequest]) -> Any:
-        timestamp = get_timestamp_ms()
+        timestamp = self.next_nonce()
         modify_wires = [
             {
                 "oid": modify["oid"],
@@ -226,7 +228,7 @@ class Exchange(API):
         return await self.bulk_cancel_by_cloid([{"coin": coin, "cloid": cloid}])
 
     async def bulk_cancel(self, cancel_requests: List[CancelRequest]) -> Any:
-        timestamp = get_timestamp_ms()
+        timestamp = self.next_nonce()
         cancel_action = {
             "type": "cancel",
             "cancels": [
@@ -252,7 +254,7 @@ class Exchange(API):
         )
 
     async def bulk_cancel_by_cloid(self, cancel_requests: List[CancelByCloidRequest]) -> Any:
-        timestamp = get_timestamp_ms()
+        timestamp = self.next_nonce()
 
         cancel_action = {
             "type": "cancelByCloid",
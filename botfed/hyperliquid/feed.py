@@ -4,6 +4,8 @@ import time
 import threading
 from concurrent.futures import ThreadPoolExecutor
 from .info import Info
+from .l2_poller import INFO_WEIGHT_PER_MIN, AsyncL2Poller, L2Store, min_interval_ms
+from .sharded_ws import ShardedWebsocketManager
 from hyperliquid.utils.types import (
     L2BookMsg,
     Trade,
@@ -52,8 +54,12 @@ class HLStream(Feed):
 
 
 class HLPoller(Feed):
-    def __init__(self):
-        self.info = Info(skip_ws=True)
+    def __init__(self, use_ws_post=False, max_workers=10):
+        """use_ws_post: pipeline polls over the websocket post channel
+        instead of one REST request per coin."""
+        self.use_ws_post = use_ws_post
+        self.info = Info(skip_ws=not use_ws_post)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
         self.tx_feed = HLTxFeed()
         Feed.__init__(self)
         self.listeners = {"all_mark_price": [], "trades": [], "l2_book": []}
@@ -65,25 +71,33 @@ class HLPoller(Feed):
         print(f"Subscribing to {len(self.all_coins)} coins l2book")
         threading.Thread(target=self._poll_l2_book, args=(coins, freq_ms)).start()
 
-    def _poll_l2_book(self, coins, freq_ms=50):
-        """Turns out to be more granular than the subscription method"""
+    def fetch_l2_books(self, coins):
+        """One snapshot per coin, None where the request failed."""
+        if self.use_ws_post:
+            return self.info.post_ws_many([{"type": "l2Book", "coin": c} for c in coins])
 
         def func(coin):
             try:
-                data = self.info.l2_snapshot(coin)
-                data["ts_recv"] = time.time() * 1000
-                self.on_book_update(data)
+                return self.info.l2_snapshot(coin)
             except Exception as e:
                 print(f"Error: {e}")
-                return
+                return None
 
+        if len(coins) == 1:
+            return [func(coins[0])]
+        return list(self.pool.map(func, coins))
+
+    def _poll_l2_book(self, coins, freq_ms=50):
+        """Turns out to be more granular than the subscription method"""
         while True:
-            if len(coins) == 1:
-                func(coins[0])
-            else:
-                with ThreadPoolExecutor(max_workers=10) as exec:
-                    for coin in coins:
-                        exec.submit(func, coin)
+            try:
+                books = self.fetch_l2_books(coins)
+            except Exception as e:
+                print(f"Error: {e}")
+                books = []
+            for data in books:
+                if data:
+                    self.on_book_update(data)
             time.sleep(freq_ms / 1000)
 
     def subscribe_all_mark_price(self, listener, poll_freq_sec=1):
@@ -115,8 +129,13 @@ class HLPoller(Feed):
 
 
 class HLFeed(Feed):
-    def __init__(self):
+    def __init__(self, n_shards=0):
+        """n_shards > 0: l2 book and trades subscriptions go over that many
+        websockets instead of the Info connection."""
         self.info = Info(skip_ws=False)
+        self.sharded_ws = (
+            ShardedWebsocketManager(self.info.base_url, n_shards) if n_shards else None
+        )
         self.tx_feed = HLTxFeed()
         Feed.__init__(self)
         self.listeners = {
@@ -126,9 +145,42 @@ class HLFeed(Feed):
             "all_mids": [],
         }
         self.thread_mark_price = None
+        # latest polled l2 snapshot per coin, see poll_l2_book
+        self.l2_store = L2Store()
+        self.l2_poller = None
         uni = self.info.post("/info", {"type": "metaAndAssetCtxs"})[0]["universe"]
         self.all_coins = [coin["name"] for coin in uni]
 
+    def poll_l2_book(self, coins=[], interval_ms=None, listener=None, **kwargs):
+        """Poll l2 snapshots into self.l2_store, each coin on its own cadence
+        (interval_ms may be a dict per coin; by default the fastest one the
+        weight budget allows, but not under 200ms). Listeners get every
+        snapshot on the poller thread, in the l2Book ws message shape."""
+        if not coins:
+            coins = self.all_coins
+        if interval_ms is None:
+            weight_per_min = kwargs.get("weight_per_min", INFO_WEIGHT_PER_MIN * 0.8)
+            interval_ms = max(200, min_interval_ms(len(coins), weight_per_min))
+        if listener and listener not in self.listeners["l2_book"]:
+            self.listeners["l2_book"].append(listener)
+        if self.l2_poller is None:
+            self.l2_poller = AsyncL2Poller(
+                coins,
+                interval_ms=interval_ms,
+                store=self.l2_store,
+                listener=self._on_polled_book,
+                **kwargs,
+            ).start()
+        return self.l2_store
+
+    def _on_polled_book(self, book):
+        # wrap a copy like the ws messages, the stored snapshot keeps its
+        # own ts_recv
+        data = {k: v for k, v in book.items() if k != "ts_recv"}
+        msg = {"channel": "l2Book", "data": data, "ts_recv": book["ts_recv"]}
+        for listener in self.listeners["l2_book"]:
+            listener(msg)
+
     def subscribe_all_mark_price(self, listener, poll_freq_sec=1):
         if not self.thread_mark_price:
             self.thread_mark_price = threading.Thread(
@@ -140,11 +192,15 @@ class HLFeed(Feed):
 
     def _poll_all_mark_price(self, poll_freq_sec):
         while True:
-            data = self.info.post_ws({"type": "metaAndAssetCtxs"})
-            data = {"data": data}
-            data["ts_recv"] = time.time() * 1000
-            for listener in self.listeners["all_mark_price"]:
-                listener(data)
+            try:
+                data = self.info.post_ws({"type": "metaAndAssetCtxs"})
+                data = {"data": data}
+                data["ts_recv"] = time.time() * 1000
+                for listener in self.listeners["all_mark_price"]:
+                    listener(data)
+            except Exception as e:
+                traceback.print_exc()
+                print(f"Error: {e}")
             time.sleep(poll_freq_sec)
 
     def subscribe_l2_book(self, coins=[], listener=None):
@@ -156,7 +212,7 @@ class HLFeed(Feed):
         subs = [
             ({"type": "l2Book", "coin": coin}, self.on_book_update) for coin in coins
         ]
-        self.info.bulk_subscribe(subs)
+        self._bulk_subscribe(subs)
         if listener and listener not in self.listeners["l2_book"]:
             self.listeners["l2_book"].append(listener)
 
@@ -166,10 +222,16 @@ class HLFeed(Feed):
             coins = self.all_coins
         print(f"Subscribing to {len(coins)} coins trades")
         subs = [({"type": "trades", "coin": coin}, self.on_trade) for coin in coins]
-        self.info.bulk_subscribe(subs)
+        self._bulk_subscribe(subs)
         if listener and listener not in self.listeners["trades"]:
             self.listeners["trades"].append(listener)
 
+    def _bulk_subscribe(self, subs):
+        if self.sharded_ws:
+            self.sharded_ws.bulk_subscribe(subs)
+        else:
+            self.info.bulk_subscribe(subs)
+
     def subscribe_all_txs(self):
         self.tx_feed.add_listener(self)
         self.tx_feed.start()
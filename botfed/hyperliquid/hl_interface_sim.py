@@ -1,18 +1,67 @@
 from typing import Any
+from ..core import time
+from ..core.sim_latency import LatencyModel, SimEventQueue
 from .sim_exchange import SimExchange
 from .meta import meta
 
 
+def _sub_key(sub):
+    return sub["type"], sub.get("coin")
+
+
+def _msg_key(msg):
+    data = msg["data"]
+    if isinstance(data, list):
+        data = data[0] if data else {}
+    return msg["channel"], data.get("coin")
+
+
 class HLInterfaceSim:
-    def __init__(self, sim_exch: SimExchange):
+    """
+    Sim stand-in for HLInterface. With a LatencyModel, order actions reach the
+    exchange after an entry delay, responses and fills reach listeners after
+    an ack delay and market data reaches subscribers after an md delay, all on
+    the sim clock. `events` must then be driven, e.g. added to the EventLoop.
+    Either way submit_* return nothing: responses only reach the order resp
+    listeners.
+    """
+
+    def __init__(self, sim_exch: SimExchange, latency: LatencyModel = None):
         self.exch = sim_exch
+        self.latency = latency
+        self.events = SimEventQueue()
+        self.subscriptions = {}
+
+    def _delayed(self, callback, delay_fn):
+        if self.latency is None:
+            return callback
+
+        def wrapped(msg):
+            self.events.schedule(delay_fn(), callback, msg)
+
+        return wrapped
 
     def subscribe(self, msg, callback):
-        return
+        self.subscriptions.setdefault(_sub_key(msg), []).append(callback)
 
     def subscribe_tc(self, callback):
         return
 
+    def on_market_data(self, msg):
+        """Entry point for recorded market data: the exchange sees it now,
+        subscribers see it after the md delay."""
+        if msg["channel"] == "trades":
+            for trade in msg["data"]:
+                self.exch.on_trade(trade)
+        callbacks = self.subscriptions.get(_msg_key(msg), [])
+        if self.latency is None:
+            for callback in callbacks:
+                callback(msg)
+            return
+        due_ms = time.time_ms() + self.latency.md_ms()
+        for callback in callbacks:
+            self.events.schedule_at(due_ms, callback, msg)
+
     def add_user_listener(self, callback):
         return self.exch.add_user_listener(callback)
 
@@ -20,10 +69,14 @@ class HLInterfaceSim:
         return self.exch.add_orders_listener(callback)
 
     def add_order_resp_listener(self, listener):
-        return self.exch.add_listener_order_resp(listener)
+        return self.exch.add_listener_order_resp(
+            self._delayed(listener, self.latency and self.latency.ack_ms)
+        )
 
     def add_user_events_listener(self, callback):
-        return self.exch.add_listener_user_events(callback)
+        return self.exch.add_listener_user_events(
+            self._delayed(callback, self.latency and self.latency.ack_ms)
+        )
 
     def meta(self):
         return meta
@@ -37,15 +90,23 @@ class HLInterfaceSim:
     def user_state(self):
         return self.exch.user_state()
 
+    def _submit(self, data):
+        # copy so the caller mutating its order dicts after send does not
+        # leak into what the exchange eventually receives
+        data = {**data, "orders": [{**order} for order in data["orders"]]}
+        if self.latency is None:
+            self.exch.on_order(data)
+        else:
+            self.events.schedule(self.latency.entry_ms(), self.exch.on_order, data)
+
     def submit_modify(self, data):
-        return self.exch.on_modify(data)
+        self._submit(data)
 
     def submit_orders(self, data):
-        return self.exch.on_bulk_orders(data)
+        self._submit(data)
 
     def cancel_orders(self, data):
-        return self.exch.on_cancel(data)
-
+        self._submit(data)
 
     def print_orders(self):
         print("Orders: ")
@@ -1,7 +1,11 @@
 from typing import List, Tuple
 from hyperliquid.api import API
 from hyperliquid.utils.types import Any, Callable, Meta, Optional, Subscription, cast, Cloid
+from .sdk_api import API as RestAPI
 from .websocket_manager import WebsocketManager
+from ..logger import get_logger
+
+logger = get_logger(__name__)
 
 """Copy of Info from hyperliquid sdk, but using our monkey patched websocket manager to auto reconnect"""
 
@@ -9,8 +13,13 @@ from .websocket_manager import WebsocketManager
 class Info(API):
     def __init__(self, base_url=None, skip_ws=False):
         super().__init__(base_url)
+        self.ws_manager = None
+        self.rest = None
+        self.n_rest_fallbacks = 0
         if not skip_ws:
             self.ws_manager = WebsocketManager(self.base_url)
+            # pooled REST session for ws post requests that fail
+            self.rest = RestAPI(self.base_url)
 
     def user_state(self, address: str) -> Any:
         """Retrieve trading details about a user.
@@ -56,11 +65,28 @@ class Info(API):
         """
         return self.post("/info", {"type": "clearinghouseState", "user": address})
 
-    def post_ws(self, data):
+    def post_ws(self, data, timeout_s: float = None):
+        """Info request over the ws post channel, REST if that fails."""
+        return self.post_ws_many([data], timeout_s)[0]
+
+    def post_ws_many(self, payloads: List[Any], timeout_s: float = None) -> List[Any]:
+        """Send all info requests over the ws post channel at once and wait
+        for the responses; each one that errors or times out is retried over
+        REST."""
         if self.ws_manager is None:
             raise RuntimeError("Cannot call post_ws since skip_ws was used")
-        else:
-            return self.ws_manager.post(data)
+        futs = [self.ws_manager.post_info(p, timeout_s) for p in payloads]
+        # the manager fails every future by its deadline, this is a backstop
+        wait_s = (timeout_s or self.ws_manager.post_timeout_s) + 1
+        out = []
+        for payload, fut in zip(payloads, futs):
+            try:
+                out.append(fut.result(timeout=wait_s))
+            except Exception as e:
+                self.n_rest_fallbacks += 1
+                logger.warning(f"Info: ws post {payload['type']} failed ({e}), REST")
+                out.append(self.rest.post("/info", payload))
+        return out
 
     def open_orders(self, address: str) -> Any:
         """Retrieve a user's open orders.
@@ -0,0 +1,52 @@
+"""
+Times HLPoller l2 rounds (one snapshot per coin) over REST and over the
+websocket post channel.
+
+    python -m botfed.hyperliquid.l2_poll_bench --coins BTC ETH SOL --rounds 50
+"""
+
+import argparse
+import time
+
+from .feed import HLPoller
+
+
+def bench(poller: HLPoller, coins, rounds: int, freq_ms: float):
+    times = []
+    failed = 0
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        books = poller.fetch_l2_books(coins)
+        times.append((time.perf_counter() - t0) * 1000)
+        failed += sum(book is None for book in books)
+        time.sleep(freq_ms / 1000)
+    times.sort()
+    return {
+        "mean_ms": sum(times) / len(times),
+        "p50_ms": times[len(times) // 2],
+        "p99_ms": times[min(len(times) - 1, int(0.99 * len(times)))],
+        "failed": failed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--coins", nargs="+", default=["BTC", "ETH", "SOL", "HYPE"])
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--freq-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    for use_ws_post in (False, True):
+        poller = HLPoller(use_ws_post=use_ws_post)
+        if use_ws_post:
+            # let the connection come up before timing
+            time.sleep(2)
+        stats = bench(poller, args.coins, args.rounds, args.freq_ms)
+        name = "ws post" if use_ws_post else "rest"
+        print(f"{name:8s} {len(args.coins)} coins/round: {stats}")
+        if use_ws_post:
+            print(f"rest fallbacks: {poller.info.n_rest_fallbacks}")
+
+
+if __name__ == "__main__":
+    main()
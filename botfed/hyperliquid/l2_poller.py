@@ -0,0 +1,248 @@
+"""
+Asyncio L2 snapshot poller for Hyperliquid.
+
+Every coin runs on its own cadence (interval_ms with +-jitter), so cycle
+time does not grow with the number of coins and coins don't fire in
+lockstep. A request is only sent if the previous one for that coin has
+finished; otherwise the tick is dropped. All requests share one keep-alive
+aiohttp session and one token bucket sized to the info weight limit.
+
+Snapshots are stamped with ts_recv and put in an L2Store; readers on other
+threads just read the latest value, no lock involved.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Union
+
+import aiohttp
+from hyperliquid.utils.constants import MAINNET_API_URL
+
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+# info requests: 1200 weight per minute per IP, l2Book costs 2
+INFO_WEIGHT_PER_MIN = 1200
+L2_BOOK_WEIGHT = 2
+
+
+class L2Store:
+    """Latest snapshot per coin.
+
+    put() replaces the dict entry with a new object and never mutates a
+    published one, so readers see either the old or the new snapshot.
+    """
+
+    def __init__(self):
+        self.books: Dict[str, Dict] = {}
+
+    def put(self, coin: str, book: Dict):
+        self.books[coin] = book
+
+    def get(self, coin: str) -> Optional[Dict]:
+        return self.books.get(coin)
+
+    def age_ms(self, coin: str, tnow_ms: float = None) -> Optional[float]:
+        book = self.books.get(coin)
+        if book is None:
+            return None
+        return (tnow_ms or time.time() * 1000) - book["ts_recv"]
+
+    def staleness_ms(self) -> Dict[str, float]:
+        tnow_ms = time.time() * 1000
+        return {coin: tnow_ms - book["ts_recv"] for coin, book in self.books.items()}
+
+
+def min_interval_ms(
+    n_coins: int, weight_per_min: float = INFO_WEIGHT_PER_MIN * 0.8
+) -> float:
+    """Shortest cadence at which n_coins can all be polled within the budget."""
+    return n_coins * L2_BOOK_WEIGHT / weight_per_min * 60 * 1000
+
+
+class AsyncTokenBucket:
+    def __init__(self, rate_per_s: float, burst: float):
+        self.rate = rate_per_s
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+
+    async def acquire(self, n: float = 1):
+        while True:
+            tnow = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (tnow - self.last) * self.rate)
+            self.last = tnow
+            if self.tokens >= n:
+                self.tokens -= n
+                return
+            await asyncio.sleep((n - self.tokens) / self.rate)
+
+
+class CoinStats:
+    def __init__(self):
+        self.n = 0
+        self.errors = 0
+        self.dropped = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+
+class AsyncL2Poller:
+
+    def __init__(
+        self,
+        coins: List[str],
+        interval_ms: Union[float, Dict[str, float]] = 200,
+        jitter: float = 0.1,
+        weight_per_min: float = INFO_WEIGHT_PER_MIN * 0.8,
+        timeout_s: float = 2,
+        stale_ms: float = 2000,
+        base_url: str = MAINNET_API_URL,
+        store: L2Store = None,
+        listener: Callable[[Dict], None] = None,
+        stop_event: threading.Event = None,
+    ):
+        """interval_ms: one cadence for all coins or one per coin."""
+        self.coins = list(coins)
+        if isinstance(interval_ms, dict):
+            self.intervals = dict(interval_ms)
+        else:
+            self.intervals = {coin: interval_ms for coin in self.coins}
+        self.jitter = jitter
+        self.weight_per_min = weight_per_min
+        self.timeout_s = timeout_s
+        self.stale_ms = stale_ms
+        self.url = base_url + "/info"
+        self.store = store or L2Store()
+        self.listener = listener
+        self.stop_event = stop_event or threading.Event()
+        self.stats: Dict[str, CoinStats] = {coin: CoinStats() for coin in self.coins}
+        demand = sum(
+            L2_BOOK_WEIGHT * 60 * 1000 / self.intervals[coin] for coin in self.coins
+        )
+        if demand > weight_per_min:
+            # the token bucket holds requests back and ticks get dropped
+            logger.warning(
+                f"AsyncL2Poller: schedule needs {demand:.0f} weight/min, budget "
+                f"is {weight_per_min:.0f}; {len(self.coins)} coins can be polled "
+                f"every {min_interval_ms(len(self.coins), weight_per_min):.0f}ms"
+            )
+        self.in_flight: Dict[str, bool] = {}
+        self.loop = None
+        self.thread = None
+
+    # polling
+
+    async def _fetch(self, session, budget, coin):
+        stats = self.stats[coin]
+        try:
+            await budget.acquire(L2_BOOK_WEIGHT)
+            t0 = time.perf_counter()
+            async with session.post(
+                self.url, json={"type": "l2Book", "coin": coin}
+            ) as resp:
+                resp.raise_for_status()
+                book = await resp.json()
+            ms = (time.perf_counter() - t0) * 1000
+            book["ts_recv"] = time.time() * 1000
+            self.store.put(coin, book)
+            stats.n += 1
+            stats.total_ms += ms
+            stats.max_ms = max(stats.max_ms, ms)
+            if self.listener:
+                self.listener(book)
+        except Exception as e:
+            stats.errors += 1
+            logger.warning(f"AsyncL2Poller: {coin} failed: {e!r}")
+        finally:
+            self.in_flight[coin] = False
+
+    async def _poll_coin(self, session, budget, coin):
+        interval_s = self.intervals[coin] / 1000
+        # spread the first requests over one interval
+        await asyncio.sleep(random.uniform(0, interval_s))
+        next_t = time.monotonic()
+        while not self.stop_event.is_set():
+            if self.in_flight.get(coin):
+                self.stats[coin].dropped += 1
+            else:
+                self.in_flight[coin] = True
+                asyncio.ensure_future(self._fetch(session, budget, coin))
+            next_t += interval_s * (1 + random.uniform(-self.jitter, self.jitter))
+            # don't burst to catch up after a stall
+            next_t = max(next_t, time.monotonic())
+            await asyncio.sleep(next_t - time.monotonic())
+
+    async def _report(self, every_s=60):
+        while not self.stop_event.is_set():
+            await asyncio.sleep(every_s)
+            stale = {
+                coin: None if age is None else round(age)
+                for coin, age in self.staleness_ms().items()
+                if age is None or age > self.stale_ms
+            }
+            if stale:
+                logger.warning(f"AsyncL2Poller: stale coins (ms) {stale}")
+
+    async def run(self):
+        rate = self.weight_per_min / 60
+        budget = AsyncTokenBucket(rate, burst=max(rate, L2_BOOK_WEIGHT))
+        timeout = aiohttp.ClientTimeout(total=self.timeout_s)
+        connector = aiohttp.TCPConnector(limit=32, keepalive_timeout=60)
+        async with aiohttp.ClientSession(
+            connector=connector, timeout=timeout
+        ) as session:
+            tasks = [
+                asyncio.ensure_future(self._poll_coin(session, budget, coin))
+                for coin in self.coins
+            ]
+            tasks.append(asyncio.ensure_future(self._report()))
+            while not self.stop_event.is_set():
+                await asyncio.sleep(0.1)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def start(self):
+        """Run the poller on its own event loop thread."""
+
+        def _run():
+            self.loop = asyncio.new_event_loop()
+            try:
+                self.loop.run_until_complete(self.run())
+            finally:
+                self.loop.close()
+
+        self.thread = threading.Thread(target=_run, daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        logger.info(f"AsyncL2Poller: closed, {self.summary()}")
+
+    # reporting
+
+    def staleness_ms(self) -> Dict[str, Optional[float]]:
+        """Age of the latest snapshot per coin, None if there is none yet."""
+        tnow_ms = time.time() * 1000
+        return {coin: self.store.age_ms(coin, tnow_ms) for coin in self.coins}
+
+    def summary(self) -> Dict[str, Dict]:
+        ages = self.staleness_ms()
+        return {
+            coin: {
+                "n": stats.n,
+                "errors": stats.errors,
+                "dropped": stats.dropped,
+                "mean_ms": stats.total_ms / stats.n if stats.n else None,
+                "max_ms": stats.max_ms,
+                "age_ms": ages[coin],
+            }
+            for coin, stats in self.stats.items()
+        }
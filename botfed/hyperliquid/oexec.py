@@ -2,6 +2,13 @@ import logging
 import traceback
 from hyperliquid.utils.types import Cloid
 from .hl_interface import setup
+from .exchange import Exchange
+from .cancel_pipeline import (
+    CancelPipeline,
+    NonceAllocator,
+    install_nonces,
+    open_order_cancels,
+)
 
 
 class HyperExec:
@@ -14,11 +21,32 @@ class HyperExec:
         eoa: str,
         secret: str,
         ghost_mode=False,
+        presign_cancels=False,
+        max_in_flight=4,
     ):
         self.address, self.info, self.exchange = setup(eoa, secret, skip_ws=True)
         print(f"Hyper exec acting on behalf of {self.address}")
         self.meta = self.info.meta()
         self.ghost_mode = ghost_mode
+        self.cancels = None
+        if presign_cancels:
+            # the SDK Exchange takes its nonces from a module global, the
+            # local one (same API) per instance
+            self.exchange = Exchange(
+                self.exchange.wallet,
+                self.exchange.base_url,
+                meta=self.meta,
+                vault_address=self.exchange.vault_address,
+                account_address=self.address,
+            )
+            nonces = NonceAllocator()
+            install_nonces(self.exchange, nonces)
+            self.cancels = CancelPipeline.from_exchange(
+                self.exchange,
+                nonces=nonces,
+                max_in_flight=max_in_flight,
+                open_orders=lambda: self.info.frontend_open_orders(self.address),
+            )
 
     def bulk_modify_orders(self, orders):
         orders = [
@@ -47,11 +75,38 @@ class HyperExec:
         ]
         if self.ghost_mode:
             return {"ghost_mode": True}
+        if self.cancels is not None:
+            coins = {el["coin"] for el in orders}
+            if len(coins) == 1:
+                # posts the pre-signed action if it covers exactly these
+                return self.cancels.submit(
+                    coins.pop(), [el["cloid"] for el in orders]
+                ).result()
+            for el in orders:
+                self.cancels.remove_resting(el["coin"], [el["cloid"]])
         return self.exchange.bulk_cancel_by_cloid(cancels)
 
+    def cancel_all(self, coins=None):
+        """Cancel every resting order on coins (default: all); returns
+        coin -> exchange response. Posts the pre-signed actions when the
+        pipeline is on, otherwise signs a single cancel for the account's
+        open orders on those coins (one action: back to back signs could
+        share a millisecond nonce)."""
+        if self.ghost_mode:
+            return {"ghost_mode": True}
+        if self.cancels is not None:
+            return self.cancels.pull(coins)
+        cancels = open_order_cancels(self.info.open_orders(self.address), coins)
+        if not cancels:
+            return {}
+        resp = self.exchange.bulk_cancel(cancels)
+        return {el["coin"]: resp for el in cancels}
+
     def process_order(self, order):
         if order["type"] == "cancel":
             return self.cancel_orders(order["orders"])
+        elif order["type"] == "cancel_all":
+            return self.cancel_all(order.get("coins"))
         elif order["type"] == "market":
             return self.market_open(order["order"])
         elif order["type"] == "modify":
@@ -96,7 +151,10 @@ class HyperExec:
         if self.ghost_mode:
             return {"ghost_mode": True}
         try:
-            return self.exchange.bulk_orders(ors)
+            result = self.exchange.bulk_orders(ors)
+            if self.cancels is not None:
+                self.cancels.on_bulk_response(orders, result)
+            return result
         except Exception as e:
             logging.error(e)
             traceback.print_exc()
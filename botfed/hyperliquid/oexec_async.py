@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import traceback
 import os
@@ -22,6 +23,12 @@ from hyperliquid.utils.types import Cloid
 from eth_account.signers.local import LocalAccount
 from .info import Info
 from .exchange_async import Exchange
+from .cancel_pipeline import (
+    CancelPipeline,
+    NonceAllocator,
+    install_nonces,
+    open_order_cancels,
+)
 
 
 def setup(base_url=None, skip_ws=True):
@@ -45,15 +52,29 @@ class HyperExecAsync:
     def __init__(
         self,
         ghost_mode=False,
+        presign_cancels=False,
+        max_in_flight=4,
     ):
         self.address, self.info, self.exchange = setup(skip_ws=True)
         self.meta = self.info.meta()
         self.ghost_mode = ghost_mode
+        self.cancels = None
+        if presign_cancels:
+            nonces = NonceAllocator()
+            install_nonces(self.exchange, nonces)
+            self.cancels = CancelPipeline.from_exchange(
+                self.exchange,
+                nonces=nonces,
+                max_in_flight=max_in_flight,
+                open_orders=lambda: self.info.frontend_open_orders(self.address),
+            )
         print(f"Hyper exec acting on behalf of {self.address}")
 
     async def process_order(self, order):
         if order["type"] == "cancel":
             return await self.cancel_orders(order["orders"])
+        elif order["type"] == "cancel_all":
+            return await self.cancel_all(order.get("coins"))
         elif order["type"] == "modify":
             return await self.bulk_modify_orders(order["orders"])
         elif order["type"] == "market_close":
@@ -70,8 +91,32 @@ class HyperExecAsync:
         ]
         if self.ghost_mode:
             return {"ghost_mode": True}
+        if self.cancels is not None:
+            coins = {el["coin"] for el in orders}
+            if len(coins) == 1:
+                return await asyncio.wrap_future(
+                    self.cancels.submit(coins.pop(), [el["cloid"] for el in orders])
+                )
+            for el in orders:
+                self.cancels.remove_resting(el["coin"], [el["cloid"]])
         return await self.exchange.bulk_cancel_by_cloid(cancels)
 
+    async def cancel_all(self, coins=None):
+        """As HyperExec.cancel_all."""
+        if self.ghost_mode:
+            return {"ghost_mode": True}
+        loop = asyncio.get_running_loop()
+        if self.cancels is not None:
+            return await loop.run_in_executor(None, self.cancels.pull, coins)
+        open_orders = await loop.run_in_executor(
+            None, self.info.open_orders, self.address
+        )
+        cancels = open_order_cancels(open_orders, coins)
+        if not cancels:
+            return {}
+        resp = await self.exchange.bulk_cancel(cancels)
+        return {el["coin"]: resp for el in cancels}
+
     async def submit_bulk_order(self, orders):
         ors = []
         for order in orders:
@@ -106,7 +151,10 @@ class HyperExecAsync:
         if self.ghost_mode:
             return {"status": "ghost_mode"}
         try:
-            return await self.exchange.bulk_orders(ors)
+            result = await self.exchange.bulk_orders(ors)
+            if self.cancels is not None:
+                self.cancels.on_bulk_response(orders, result)
+            return result
         except Exception as e:
             logging.error(e)
             traceback.print_exc()
@@ -1,14 +1,17 @@
 import logging
-import requests
 import time
-from typing import Mapping, TypedDict, List
+from typing import TypedDict, List
 from hyperliquid.utils.types import (
     UserEventsMsg,
 )
 from ..core.timer_feed import TimerListener
 from ..tradeserver.client import TradeClient
 from ..core.oms import OMS, LocalOrder, OrderStatus
+from ..core.order_store import OrderStore
+from ..core.event_loop import EventLoop
+from ..core.order_batcher import OrderBatcher
 from ..core.fast_bbo import FastBBO
+from ..core.instruments import get_instruments
 from ..logger import get_logger
 
 from .hl_interface import HLInterface
@@ -73,9 +76,20 @@ class HyperOMS(OMS, TimerListener):
         self,
         tc: TradeClient,
         trade_log_file="./trade.log",
+        batch_window_ms=0,
+        event_loop: EventLoop = None,
     ):
         self.tc = tc
-        self.meta = self.fetch_meta()
+        self.batcher = OrderBatcher(
+            self.tc.submit, window_ms=batch_window_ms, on_annulled=self.on_annulled
+        )
+        if batch_window_ms > 0:
+            # held intents are only flushed from the batcher's run_ticks
+            if event_loop is None:
+                raise ValueError("batch_window_ms > 0 needs an event_loop")
+            event_loop.add_feed(self.batcher)
+        self.instruments = get_instruments("hl")
+        self.meta = self.instruments.raw
         self.universe = {el["name"]: el for el in self.meta["universe"]}
         self.positions = {}
         self.open_orders = []
@@ -85,21 +99,13 @@ class HyperOMS(OMS, TimerListener):
         self.trade_log = []
         self.spot_positions = {}
         self.listeners = []
-        self.orders_cloid: Mapping[int, LocalOrder] = {}
+        self.orders_cloid: OrderStore = OrderStore()
         self.curr_orders = []
         self.cloid = max(list(self.orders_cloid.keys()) + [1])
         self.removed_orders = []
         self._ready = False
         self._last_user_event = 0
 
-    def fetch_meta(self):
-        resp = requests.post(
-            "https://api.hyperliquid.xyz/info",
-            json={"type": "meta"},
-            headers={"Content-Type": "application/json"},
-        )
-        return resp.json()
-
     def is_tradeable(self, coin):
         return symbol_to_hl_contract(coin) in self.universe
 
@@ -136,10 +142,13 @@ class HyperOMS(OMS, TimerListener):
                     assert cloid == order["cloid"]
                     new_oid = status["resting"]["oid"]
                     old_oid = self.orders_cloid[cloid].get("oid")
-                    self.orders_cloid[cloid]["oid"] = (
-                        new_oid if old_oid is None or new_oid > old_oid else old_oid
+                    self.orders_cloid.set_fields(
+                        cloid,
+                        oid=(
+                            new_oid if old_oid is None or new_oid > old_oid else old_oid
+                        ),
+                        status=OrderStatus.ACTIVE,
                     )
-                    self.orders_cloid[cloid]["status"] = OrderStatus.ACTIVE
 
     def add_listener(self, listener):
         self.listeners.append(listener)
@@ -152,16 +161,10 @@ class HyperOMS(OMS, TimerListener):
     def get_open_orders(
         self, coin, statuses=[OrderStatus.PENDING_NEW, OrderStatus.ACTIVE]
     ) -> List[LocalOrder]:
-        return [
-            el
-            for el in self.orders_cloid.values()
-            if el["coin"] == coin and el.get("status") in statuses
-        ]
+        return self.orders_cloid.get_orders(coin, statuses)
 
     def sz_decimals(self, coin):
-        for el in self.meta["universe"]:
-            if el["name"] == coin:
-                return el["szDecimals"]
+        return self.instruments.sz_decimals(coin)
 
     def equity(self):
         if self.user_state:
@@ -206,11 +209,10 @@ class HyperOMS(OMS, TimerListener):
         return delta
 
     def valid_qty(self, coin, qty):
-        decimals = self.sz_decimals(coin)
-        return round(qty, decimals)
+        return self.instruments.valid_qty(coin, qty)
 
-    def valid_price(self, _, price):
-        return round(float(f"{price:.5g}"), 6)
+    def valid_price(self, coin, price):
+        return self.instruments.valid_price(coin, price)
 
     def on_user_data(self, user_data):
         self.user_state = user_data
@@ -227,14 +229,15 @@ class HyperOMS(OMS, TimerListener):
             }
 
     def on_orders(self, orders):
-        self.orders_cloid = {}
         self.curr_orders = orders
+        snapshot = {}
         for order in orders:
             if "cloid" in order:
-                self.orders_cloid[int(order["cloid"], 0)] = hl_order_to_local_order(
-                    order
-                )
-                self.orders_cloid[int(order["cloid"], 0)]["status"] = OrderStatus.ACTIVE
+                snapshot[int(order["cloid"], 0)] = {
+                    **hl_order_to_local_order(order),
+                    "status": OrderStatus.ACTIVE,
+                }
+        self.orders_cloid.reconcile(snapshot)
 
     def spot_coin(self, coin):
         return coin.split("/")[0]
@@ -249,8 +252,7 @@ class HyperOMS(OMS, TimerListener):
             order = self.orders_cloid.get(cloid)
             if order is None:
                 continue
-            order["oid"] = fill["oid"]
-            order["filled"] = True
+            self.orders_cloid.set_fields(cloid, oid=fill["oid"], filled=True)
             if float(fill["sz"]) >= float(order["qty"]):
                 self.remove_cloid(cloid)
             else:
@@ -267,6 +269,11 @@ class HyperOMS(OMS, TimerListener):
         for listener in self.listeners:
             listener.on_fills(fills)
 
+    def on_annulled(self, orders):
+        """New orders cancelled before the batcher ever sent them."""
+        for order in orders:
+            self.orders_cloid.pop(order["cloid"], None)
+
     def remove_cloid(self, cloid):
         if cloid in self.orders_cloid:
             logging.debug(f"Removing cloid {cloid} from orders_cloid")
@@ -295,15 +302,9 @@ class HyperOMS(OMS, TimerListener):
         ]
         for arg in args:
             self.orders_cloid[arg[6]["cloid"]] = arg[6]
-            self.orders_cloid[arg[6]["cloid"]]["oid"] = None
+            self.orders_cloid.set_fields(arg[6]["cloid"], oid=None)
 
-        self.tc.submit(
-            {
-                "type": "modify",
-                "exchange": "hl",
-                "orders": orders,
-            }
-        )
+        self.batcher.add("modify", "hl", orders)
 
     def submit_market_order(
         self, coin: str, qty: float, side: str, price: float, max_slippage=0.01
@@ -338,18 +339,12 @@ class HyperOMS(OMS, TimerListener):
     def submit_orders(self, orders: List[LocalOrder], extra={}):
         for idx, order in enumerate(orders):
             order["cloid"] = self.cloid + idx
-            self.orders_cloid[order["cloid"]] = {**order}
-            self.orders_cloid[order["cloid"]]["status"] = OrderStatus.PENDING_NEW
-        self.cloid += len(orders)
-        self.tc.submit(
-            {
-                "type": "bulk",
-                "exchange": "hl",
-                "ts_oms_send": time.time() * 1000,
-                "orders": orders,
-                **extra,
+            self.orders_cloid[order["cloid"]] = {
+                **order,
+                "status": OrderStatus.PENDING_NEW,
             }
-        )
+        self.cloid += len(orders)
+        self.batcher.add("bulk", "hl", orders, extra)
 
     def cancel_all(self, coin):
         self.cancel_orders(self.get_open_orders(coin))
@@ -357,15 +352,9 @@ class HyperOMS(OMS, TimerListener):
     def cancel_orders(self, orders: List[LocalOrder], extra={}):
         if len(orders) == 0:
             return
-        self.tc.submit(
-            {
-                "type": "cancel",
-                "exchange": "hl",
-                "orders": orders,
-                "ts_oms_send": time.time() * 1000,
-                **extra,
-            },
-        )
+        self.batcher.add("cancel", "hl", orders, extra)
         for order in orders:
             if order["cloid"] in self.orders_cloid:
-                self.orders_cloid[order["cloid"]]["status"] = OrderStatus.PENDING_CANCEL
+                self.orders_cloid.set_fields(
+                    order["cloid"], status=OrderStatus.PENDING_CANCEL
+                )
@@ -1,9 +1,30 @@
+"""
+libcurl transport for the Hyperliquid REST API.
+
+CurlTransport drives one CurlMulti from a background thread with the
+socket_action interface, so any number of posts can be in flight at once
+over the multi's shared connection cache (keep-alive, TCP_NODELAY, cached
+DNS and TLS sessions). Easy handles are kept warm and reused. Every request
+returns a Future; per-request DNS, connect, TLS and time-to-first-byte
+timings from curl info are aggregated per endpoint (metrics()) and handed to
+timing listeners for the latency dashboards.
+"""
+
 import json
 import logging
-import pycurl
+import platform
+import selectors
+import socket
+import threading
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+from concurrent.futures import TimeoutError as FutureTimeout
 from io import BytesIO
 from json import JSONDecodeError
-import platform
+from typing import Callable, Dict, List
+from urllib.parse import urlsplit
+
+import pycurl
 
 from hyperliquid.utils.constants import MAINNET_API_URL
 from hyperliquid.utils.error import ClientError, ServerError
@@ -12,23 +33,292 @@ from hyperliquid.utils.types import Any
 is_mac_os = platform.system() == "Darwin"
 ca_cert_path = "/etc/ssl/certs/ca-certificates.crt"
 
+HEADERS = ["Content-Type: application/json"]
+# how much longer than curl's own timeout a blocking caller waits on the
+# transport thread before giving up on the attempt
+RESULT_MARGIN_S = 1.0
+
+# curl info field -> seconds since the start of the request
+_TIMING_INFO = {
+    "dns": pycurl.NAMELOOKUP_TIME,
+    "connect": pycurl.CONNECT_TIME,
+    "tls": pycurl.APPCONNECT_TIME,
+    "pretransfer": pycurl.PRETRANSFER_TIME,
+    "ttfb": pycurl.STARTTRANSFER_TIME,
+    "total": pycurl.TOTAL_TIME,
+}
+
+
+def request_timings(curl) -> Dict:
+    """Per-phase durations in ms. connect / tls are 0 on a reused connection."""
+    t = {k: curl.getinfo(v) * 1000 for k, v in _TIMING_INFO.items()}
+    return {
+        "dns_ms": t["dns"],
+        "connect_ms": max(0.0, t["connect"] - t["dns"]),
+        "tls_ms": max(0.0, t["tls"] - t["connect"]) if t["tls"] else 0.0,
+        "ttfb_ms": max(0.0, t["ttfb"] - t["pretransfer"]),
+        "total_ms": t["total"],
+        "new_connections": curl.getinfo(pycurl.NUM_CONNECTS),
+    }
+
+
+def _settle(fut: Future, result=None, error: Exception = None):
+    """Resolve fut unless the caller gave up on it (cancelled)."""
+    if fut.done():
+        return
+    try:
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class PhaseStats:
+    def __init__(self):
+        self.n = 0
+        self.errors = 0
+        self.new_connections = 0
+        self.sums = {"dns_ms": 0.0, "connect_ms": 0.0, "tls_ms": 0.0, "ttfb_ms": 0.0}
+        self.totals = deque(maxlen=1000)
+
+    def add(self, timing):
+        self.n += 1
+        self.new_connections += timing["new_connections"]
+        for k in self.sums:
+            self.sums[k] += timing[k]
+        self.totals.append(timing["total_ms"])
+
+    def summary(self) -> Dict:
+        totals = sorted(self.totals)
+        out = {
+            "n": self.n,
+            "errors": self.errors,
+            "new_connections": self.new_connections,
+        }
+        out.update({f"mean_{k}": v / self.n if self.n else None for k, v in self.sums.items()})
+        if totals:
+            out["p50_total_ms"] = totals[len(totals) // 2]
+            out["p99_total_ms"] = totals[min(len(totals) - 1, int(0.99 * len(totals)))]
+        return out
+
+
+class CurlTransport:
+    def __init__(
+        self,
+        timeout_ms: int = 1000,
+        max_host_connections: int = 8,
+        stop_event: threading.Event = None,
+    ):
+        self.timeout_ms = timeout_ms
+        self.stop_event = stop_event or threading.Event()
+        self._logger = logging.getLogger(__name__)
+        self.multi = pycurl.CurlMulti()
+        # HTTP/2 streams share a connection; over HTTP/1.1 requests beyond
+        # max_host_connections queue for a free keep-alive connection
+        self.multi.setopt(pycurl.M_PIPELINING, pycurl.PIPE_MULTIPLEX)
+        self.multi.setopt(pycurl.M_MAX_HOST_CONNECTIONS, max_host_connections)
+        self.multi.setopt(pycurl.M_SOCKETFUNCTION, self._on_socket)
+        self.multi.setopt(pycurl.M_TIMERFUNCTION, self._on_timer)
+        self.selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ)
+        self._timeout_s = None
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.idle: List[pycurl.Curl] = []
+        self.active: Dict[pycurl.Curl, tuple] = {}
+        self.stats: Dict[str, PhaseStats] = {}
+        self.timing_listeners: List[Callable] = []
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def add_timing_listener(self, listener: Callable):
+        """listener(endpoint, timing dict) on the transport thread; keep it cheap."""
+        self.timing_listeners.append(listener)
+
+    def post(self, url: str, body: bytes, timeout_ms: int = None) -> Future:
+        """Future resolving to (http status, response text)."""
+        fut = Future()
+        with self.lock:
+            if self.stop_event.is_set():
+                fut.set_exception(pycurl.error("transport stopped"))
+                return fut
+            self.pending.append((url, body, timeout_ms or self.timeout_ms, fut))
+        self._wake_w.send(b"\0")
+        return fut
+
+    # curl callbacks, called from socket_action on the transport thread
+
+    def _on_socket(self, what, fd, multi, data):
+        if what == pycurl.POLL_REMOVE:
+            try:
+                self.selector.unregister(fd)
+            except (KeyError, ValueError):
+                pass
+            return
+        events = 0
+        if what in (pycurl.POLL_IN, pycurl.POLL_INOUT):
+            events |= selectors.EVENT_READ
+        if what in (pycurl.POLL_OUT, pycurl.POLL_INOUT):
+            events |= selectors.EVENT_WRITE
+        try:
+            self.selector.modify(fd, events)
+        except KeyError:
+            self.selector.register(fd, events)
+
+    def _on_timer(self, timeout_ms):
+        self._timeout_s = None if timeout_ms < 0 else timeout_ms / 1000
+
+    # transport thread
+
+    def _handle(self) -> pycurl.Curl:
+        curl = self.idle.pop() if self.idle else pycurl.Curl()
+        curl.reset()
+        curl.setopt(pycurl.POST, 1)
+        curl.setopt(pycurl.HTTPHEADER, HEADERS)
+        curl.setopt(pycurl.TCP_NODELAY, 1)
+        curl.setopt(pycurl.TCP_KEEPALIVE, 1)
+        curl.setopt(pycurl.NOSIGNAL, 1)
+        curl.setopt(pycurl.HTTP_VERSION, pycurl.CURL_HTTP_VERSION_2TLS)
+        curl.setopt(pycurl.PIPEWAIT, 1)
+        if not is_mac_os:
+            curl.setopt(pycurl.CAINFO, ca_cert_path)
+        return curl
+
+    def _start(self, url, body, timeout_ms, fut):
+        if not fut.set_running_or_notify_cancel():
+            return
+        curl = self._handle()
+        buffer = BytesIO()
+        curl.setopt(pycurl.URL, url)
+        curl.setopt(pycurl.POSTFIELDS, body)
+        curl.setopt(pycurl.WRITEDATA, buffer)
+        curl.setopt(pycurl.TIMEOUT_MS, timeout_ms)
+        self.active[curl] = (url, buffer, fut)
+        self.multi.add_handle(curl)
+
+    def _action(self, fd, events):
+        while True:
+            ret, _ = self.multi.socket_action(fd, events)
+            if ret != pycurl.E_CALL_MULTI_PERFORM:
+                break
+
+    def _finish(self, curl, errmsg=None):
+        self.multi.remove_handle(curl)
+        url, buffer, fut = self.active.pop(curl)
+        parts = urlsplit(url)
+        endpoint = parts.netloc + parts.path
+        stats = self.stats.get(endpoint)
+        if stats is None:
+            stats = self.stats[endpoint] = PhaseStats()
+        if errmsg is None:
+            timing = request_timings(curl)
+            stats.add(timing)
+            for listener in self.timing_listeners:
+                try:
+                    listener(endpoint, timing)
+                except Exception as e:
+                    self._logger.error(f"CurlTransport: timing listener error {e}")
+            _settle(
+                fut,
+                (curl.getinfo(pycurl.RESPONSE_CODE), buffer.getvalue().decode("utf-8")),
+            )
+        else:
+            stats.errors += 1
+            _settle(fut, error=pycurl.error(errmsg))
+        self.idle.append(curl)
+
+    def _collect(self):
+        while True:
+            queued, ok, failed = self.multi.info_read()
+            for curl in ok:
+                self._finish(curl)
+            for curl, _, errmsg in failed:
+                self._finish(curl, errmsg)
+            if not queued:
+                break
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            events = self.selector.select(self._timeout_s if self.active else 1)
+            acted = False
+            for key, mask in events:
+                if key.fileobj is self._wake_r:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                flags = 0
+                if mask & selectors.EVENT_READ:
+                    flags |= pycurl.CSELECT_IN
+                if mask & selectors.EVENT_WRITE:
+                    flags |= pycurl.CSELECT_OUT
+                self._action(key.fd, flags)
+                acted = True
+            with self.lock:
+                pending, self.pending = self.pending, deque()
+            for request in pending:
+                self._start(*request)
+            if pending or (not acted and self.active):
+                self._action(pycurl.SOCKET_TIMEOUT, 0)
+            self._collect()
+        for curl in list(self.active):
+            self._finish(curl, "transport stopped")
+        # post() fails requests itself once stop_event is set, these were
+        # queued before that
+        with self.lock:
+            pending, self.pending = self.pending, deque()
+        for _, _, _, fut in pending:
+            _settle(fut, error=pycurl.error("transport stopped"))
+
+    def metrics(self) -> Dict[str, Dict]:
+        return {endpoint: stats.summary() for endpoint, stats in list(self.stats.items())}
+
+    def log_metrics(self):
+        for endpoint, summary in self.metrics().items():
+            self._logger.info(f"CurlTransport {endpoint}: {summary}")
+
+    def close(self):
+        self.stop_event.set()
+        self._wake_w.send(b"\0")
+        self.thread.join(timeout=5)
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> CurlTransport:
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = CurlTransport()
+    return _transport
+
 
 class API:
-    def __init__(self, base_url=None):
+    def __init__(self, base_url=None, transport: CurlTransport = None):
         self.base_url = MAINNET_API_URL
         self._logger = logging.getLogger(__name__)
+        self.transport = transport or get_transport()
         if base_url is not None:
             self.base_url = base_url
 
     def post(self, url_path: str, payload: Any = None, non_blocking: bool = False) -> Any:
-        if payload is None:
-            payload = {}
-        url = self.base_url + url_path
-
-        response, response_available = self._curl_post(url, payload, non_blocking)
-        if non_blocking and not response_available:
+        if non_blocking:
+            fut = self.post_async(url_path, payload)
+            fut.add_done_callback(self._log_failure)
             return {"status": "Request sent, response not awaited"}
 
+        response, response_available = self._curl_post(self.base_url + url_path, payload)
+        if not response_available:
+            response = ""
         self._handle_exception(response)
 
         try:
@@ -36,38 +326,47 @@ class API:
         except JSONDecodeError:
             return {"error": f"Could not parse JSON: {response}"}
 
-    def _curl_post(self, url: str, payload: Any, non_blocking: bool, retries: int = 3, timeout_ms=1000) -> tuple:
-        headers = ["Content-Type: application/json"]
-        data = json.dumps(payload)
-        global is_mac_os
-        global ca_cert_path
+    def post_async(self, url_path: str, payload: Any = None, callback: Callable = None) -> Future:
+        """Send without waiting. The future resolves to the parsed response,
+        or raises ClientError / ServerError / pycurl.error; callback(future)
+        runs on the transport thread when it is done."""
+        result = Future()
 
-        for attempt in range(retries):
+        def on_done(fut):
             try:
-                buffer = BytesIO()
-                curl = pycurl.Curl()
-                curl.setopt(pycurl.URL, url)
-                curl.setopt(pycurl.POST, 1)
-                curl.setopt(pycurl.POSTFIELDS, data)
-                curl.setopt(pycurl.HTTPHEADER, headers)
-                curl.setopt(pycurl.WRITEDATA, buffer)
-                if not is_mac_os:
-                    curl.setopt(pycurl.CAINFO, ca_cert_path)
-                if non_blocking:
-                    curl.setopt(pycurl.TIMEOUT_MS, 1)  # Set a very short timeout
-                else:
-                    curl.setopt(pycurl.TIMEOUT_MS, timeout_ms)  # Set a very short timeout
-                curl.perform()
-                response_code = curl.getinfo(pycurl.RESPONSE_CODE)
-                curl.close()
+                _, response = fut.result()
+                self._handle_exception(response)
+                result.set_result(json.loads(response))
+            except Exception as e:
+                result.set_exception(e)
 
-                response = buffer.getvalue().decode('utf-8')
+        self.transport.post(self.base_url + url_path, json.dumps(payload or {}).encode()).add_done_callback(
+            on_done
+        )
+        if callback:
+            result.add_done_callback(callback)
+        return result
+
+    def _log_failure(self, fut):
+        if fut.exception() is not None:
+            self._logger.warning(f"Non-blocking post failed: {fut.exception()}")
+
+    def _curl_post(self, url: str, payload: Any, retries: int = 3, timeout_ms=1000) -> tuple:
+        data = json.dumps(payload or {}).encode()
+        for attempt in range(retries):
+            try:
+                fut = self.transport.post(url, data, timeout_ms)
+                response_code, response = fut.result(timeout=timeout_ms / 1000 + RESULT_MARGIN_S)
                 if response or 200 <= response_code < 300:
                     return response, True
                 else:
                     self._logger.warning(f"Attempt {attempt+1} failed with status {response_code}")
             except pycurl.error as e:
                 self._logger.warning(f"Attempt {attempt+1} failed with error: {e}")
+            except FutureTimeout:
+                # transport thread stalled or gone, don't hang the caller
+                fut.cancel()
+                self._logger.warning(f"Attempt {attempt+1} got no result from the transport")
         return "", False
 
     def _handle_exception(self, response: str):
@@ -80,12 +379,10 @@ class API:
             status_code = response_json['error'].get('code', 500)
             if 400 <= status_code < 500:
                 raise ClientError(
-                    status_code, 
-                    response_json['error'].get('code'), 
-                    response_json['error'].get('msg'), 
-                    None, 
+                    status_code,
+                    response_json['error'].get('code'),
+                    response_json['error'].get('msg'),
+                    None,
                     response_json['error'].get('data')
                 )
             raise ServerError(status_code, response_json['error'].get('msg'))
-
-
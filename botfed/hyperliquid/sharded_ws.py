@@ -0,0 +1,251 @@
+"""
+Market data subscriptions spread over several Hyperliquid websockets.
+
+One connection means one receive buffer and one thread parsing and
+dispatching every l2Book / trades / bbo message. ShardedWebsocketManager
+opens n_shards connections and places each subscription with a sharding
+policy: the least loaded shard per coin by default, or coin hash, or round
+robin. Each shard reconnects and resubscribes its own subscriptions only.
+
+Dispatch looks callbacks up by an integer key, channel id << COIN_BITS |
+coin id, with coin ids assigned at subscribe time, instead of building an
+identifier string per message.
+
+Per shard, stats() reports dispatch time (receive -> callbacks done), lag
+(exchange time -> receive) and the bytes waiting in the socket receive
+buffer. A growing backlog or lag on one shard means that connection is
+saturated.
+"""
+
+import fcntl
+import struct
+import termios
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Callable, Dict, List, Tuple
+
+import orjson as json
+
+from ..core.websocket_mngr import WebsocketManager as BaseWebsocketManager
+from ..logger import get_logger
+
+logger = get_logger(__name__)
+
+CHANNEL_IDS = {"l2Book": 1, "trades": 2, "bbo": 3, "activeAssetCtx": 4}
+TRADES = CHANNEL_IDS["trades"]
+COIN_BITS = 16
+# FIONREAD costs a syscall, sample the backlog every this many messages
+BACKLOG_EVERY = 64
+
+
+def shard_by_coin(subscription: Dict, n_shards: int) -> int:
+    """All channels of a coin on one shard, coins spread by a stable hash."""
+    return zlib.crc32(subscription.get("coin", "").encode()) % n_shards
+
+
+class LeastLoaded:
+    """All channels of a coin on one shard, each new coin on the shard with
+    the fewest coins. Subscribing the busiest coins first spreads them."""
+
+    def __init__(self):
+        self.coin_shard: Dict[str, int] = {}
+        self.counts: Dict[int, int] = {}
+
+    def __call__(self, subscription: Dict, n_shards: int) -> int:
+        coin = subscription.get("coin", "")
+        shard = self.coin_shard.get(coin)
+        if shard is None:
+            shard = min(range(n_shards), key=lambda i: self.counts.get(i, 0))
+            self.coin_shard[coin] = shard
+            self.counts[shard] = self.counts.get(shard, 0) + 1
+        return shard
+
+
+class RoundRobin:
+    """Subscriptions dealt out in turn, regardless of coin."""
+
+    def __init__(self):
+        self.i = -1
+
+    def __call__(self, subscription: Dict, n_shards: int) -> int:
+        self.i += 1
+        return self.i % n_shards
+
+
+class ShardStats:
+    def __init__(self, n_samples=1000):
+        self.n = 0
+        self.dispatch_ms = deque(maxlen=n_samples)
+        self.lag_ms = deque(maxlen=n_samples)
+        self.backlog_bytes = 0
+        self.max_backlog_bytes = 0
+
+    def summary(self) -> Dict:
+        def pct(samples, q):
+            if not samples:
+                return None
+            samples = sorted(samples)
+            return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+        return {
+            "n": self.n,
+            "p50_dispatch_ms": pct(self.dispatch_ms, 0.5),
+            "p99_dispatch_ms": pct(self.dispatch_ms, 0.99),
+            "p50_lag_ms": pct(self.lag_ms, 0.5),
+            "p99_lag_ms": pct(self.lag_ms, 0.99),
+            "backlog_bytes": self.backlog_bytes,
+            "max_backlog_bytes": self.max_backlog_bytes,
+        }
+
+
+class WsShard(BaseWebsocketManager):
+
+    def __init__(self, ws_url, index: int, router, timeout_thresh=30):
+        self.index = index
+        self.router = router
+        self.subscriptions: List[Dict] = []
+        self.stats = ShardStats()
+        self.ping_sender = threading.Thread(target=self.send_ping, daemon=True)
+        self.ping_sender.start()
+        BaseWebsocketManager.__init__(
+            self, ws_url, timeout_threshold=timeout_thresh, warn_threshold=5
+        )
+
+    def send_ping(self):
+        while True:
+            time.sleep(50)
+            if self.ws.sock and self.ws.sock.connected:
+                self.ws.send(json.dumps({"method": "ping"}))
+
+    def _send_sub(self, subscription):
+        self.ws.send(json.dumps({"method": "subscribe", "subscription": subscription}))
+
+    def subscribe(self, subscription: Dict):
+        self.subscriptions.append(subscription)
+        # otherwise on_open sends it
+        if self.ws.sock and self.ws.sock.connected:
+            self._send_sub(subscription)
+
+    def resubscribe(self):
+        logger.info(
+            f"WsShard {self.index}: resubscribing {len(self.subscriptions)} subs"
+        )
+        for subscription in self.subscriptions:
+            self._send_sub(subscription)
+
+    def _backlog(self) -> int:
+        try:
+            buf = fcntl.ioctl(self.ws.sock.sock.fileno(), termios.FIONREAD, b"\0" * 4)
+            return struct.unpack("i", buf)[0]
+        except Exception:
+            return 0
+
+    def on_message(self, _ws, message):
+        t_recv = time.time()
+        if message[0] != "{":
+            # "Websocket connection established."
+            return
+        msg = json.loads(message)
+        chan_id = CHANNEL_IDS.get(msg.get("channel"))
+        if chan_id is None:
+            # subscriptionResponse, pong, ...
+            return
+        data = msg["data"]
+        if chan_id == TRADES:
+            if not data:
+                return
+            coin = data[0]["coin"]
+            exch_ms = data[-1].get("time")
+        else:
+            coin = data["coin"]
+            exch_ms = data.get("time")
+        callbacks = self.router.routes.get(
+            chan_id << COIN_BITS | self.router.coin_ids.get(coin, 0)
+        )
+        if callbacks:
+            for callback in callbacks:
+                try:
+                    callback(msg)
+                except Exception as e:
+                    logger.error(f"WsShard {self.index}: callback error {e}")
+        stats = self.stats
+        stats.n += 1
+        stats.dispatch_ms.append((time.time() - t_recv) * 1000)
+        if exch_ms:
+            stats.lag_ms.append(t_recv * 1000 - exch_ms)
+        if stats.n % BACKLOG_EVERY == 0:
+            stats.backlog_bytes = self._backlog()
+            stats.max_backlog_bytes = max(stats.max_backlog_bytes, stats.backlog_bytes)
+
+    def close(self):
+        self.stop_event.set()
+        self.ws.close()
+
+
+class ShardedWebsocketManager:
+
+    def __init__(
+        self,
+        base_url,
+        n_shards: int = 4,
+        policy: Callable[[Dict, int], int] = None,
+        timeout_thresh=30,
+    ):
+        self.ws_url = "ws" + base_url[len("http") :] + "/ws"
+        self.policy = policy or LeastLoaded()
+        # routing tables, read by every shard thread
+        self.coin_ids: Dict[str, int] = {}
+        self.routes: Dict[int, List[Callable[[Any], None]]] = {}
+        self.placement: Dict[Tuple[str, str], int] = {}
+        self.lock = threading.Lock()
+        self.shards = [
+            WsShard(self.ws_url, i, self, timeout_thresh) for i in range(n_shards)
+        ]
+
+    def route_key(self, channel: str, coin: str) -> int:
+        coin_id = self.coin_ids.get(coin)
+        if coin_id is None:
+            coin_id = self.coin_ids[coin] = len(self.coin_ids) + 1
+        return CHANNEL_IDS[channel] << COIN_BITS | coin_id
+
+    def subscribe(self, subscription: Dict, callback: Callable[[Any], None]) -> int:
+        """Returns the shard the subscription lives on."""
+        channel, coin = subscription["type"], subscription["coin"]
+        if channel not in CHANNEL_IDS:
+            raise ValueError(f"ShardedWebsocketManager: unsupported {channel}")
+        with self.lock:
+            key = self.route_key(channel, coin)
+            # copy on write, shard threads may be iterating the old list
+            self.routes[key] = self.routes.get(key, []) + [callback]
+            shard = self.placement.get((channel, coin))
+            if shard is not None:
+                return shard
+            shard = self.placement[(channel, coin)] = self.policy(
+                subscription, len(self.shards)
+            )
+        self.shards[shard].subscribe(subscription)
+        return shard
+
+    def bulk_subscribe(self, subs: List[Tuple[Dict, Callable[[Any], None]]]):
+        for subscription, callback in subs:
+            self.subscribe(subscription, callback)
+
+    def stats(self) -> List[Dict]:
+        return [
+            {
+                "shard": shard.index,
+                "subscriptions": len(shard.subscriptions),
+                **shard.stats.summary(),
+            }
+            for shard in self.shards
+        ]
+
+    def log_stats(self):
+        for stats in self.stats():
+            logger.info(f"ShardedWebsocketManager: {stats}")
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
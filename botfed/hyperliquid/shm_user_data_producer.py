@@ -1,3 +1,15 @@
+"""
+Hyperliquid user state (clearinghouseState, openOrders) for shm_user_feed.
+
+UserDataProducer polls both over REST once a second. WsUserDataProducer
+subscribes to the userFills / orderUpdates (optionally webData2) websocket
+channels and applies them to the last REST snapshot as they arrive, so fills
+reach the strategy within one hop; REST snapshots only reconcile, every
+reconcile_s and after a (re)subscribe. Both write the same payloads to the
+same shared memory segments. Published user state carries "eventTime", the
+exchange time of the newest event applied, for event -> OMS latency.
+"""
+
 import logging
 import posix_ipc
 import orjson as json
@@ -8,12 +20,19 @@ import signal
 import sys
 import asyncio
 import aiohttp
+import threading
+from collections import deque
+from typing import Dict, List
+
+from hyperliquid.utils.constants import MAINNET_API_URL
 
-import time
 from .hl_interface import setup
+from .websocket_manager import WebsocketManager
+from ..core.http_client import EndpointStats, get_client
 from ..core.shm_utils import create_shared_memory, delete_semaphore
+from ..logger import get_logger
 
-
+logger = get_logger(__name__)
 
 
 url = "https://api.hyperliquid.xyz/info"
@@ -26,6 +45,21 @@ async def post(url, session, data):
         return await response.json()
 
 
+def write_shm(lock, SHM_NAME, data):
+    encoded_data = json.dumps(data)
+    # Write to shared memory
+    timestamp_bytes = int(time.time() * 1000).to_bytes(8, "big")
+    lock.acquire(timeout=1)
+    try:
+        shm = shared_memory.SharedMemory(name=SHM_NAME)
+        shm.buf[:8] = timestamp_bytes
+        shm.buf[8:16] = len(encoded_data).to_bytes(8, "big")
+        shm.buf[16 : 16 + len(encoded_data)] = encoded_data
+        shm.close()
+    finally:
+        lock.release()
+
+
 async def poll_user_data(lock, session, stop_event, SHM_NAME, address, sleep=1):
     try:
         while True:
@@ -34,18 +68,7 @@ async def poll_user_data(lock, session, stop_event, SHM_NAME, address, sleep=1):
             data = await post(
                 url, session, {"type": "clearinghouseState", "user": address}
             )
-            encoded_data = json.dumps(data)
-            # Write to shared memory
-            timestamp_bytes = int(time.time() * 1000).to_bytes(8, "big")
-            lock.acquire(timeout=1)
-            try:
-                shm = shared_memory.SharedMemory(name=SHM_NAME)
-                shm.buf[:8] = timestamp_bytes
-                shm.buf[8:16] = len(encoded_data).to_bytes(8, "big")
-                shm.buf[16 : 16 + len(encoded_data)] = encoded_data
-                shm.close()
-            finally:
-                lock.release()
+            write_shm(lock, SHM_NAME, data)
             await asyncio.sleep(sleep)
     except asyncio.CancelledError:
         print("Poll user data canceled.")
@@ -59,18 +82,7 @@ async def poll_user_orders(lock, session, stop_event, SHM_NAME, address, sleep=1
             if stop_event.is_set():
                 break
             data = await post(url, session, {"type": "openOrders", "user": address})
-            encoded_data = json.dumps(data)
-            # Write to shared memory
-            timestamp_bytes = int(time.time() * 1000).to_bytes(8, "big")
-            lock.acquire(timeout=1)
-            try:
-                shm = shared_memory.SharedMemory(name=SHM_NAME)
-                shm.buf[:8] = timestamp_bytes
-                shm.buf[8:16] = len(encoded_data).to_bytes(8, "big")
-                shm.buf[16 : 16 + len(encoded_data)] = encoded_data
-                shm.close()
-            finally:
-                lock.release()
+            write_shm(lock, SHM_NAME, data)
             await asyncio.sleep(sleep)
     except asyncio.CancelledError:
         print("Poll user orders canceled.")
@@ -87,12 +99,12 @@ def signal_handler(signum, frame, stop_event):
 class UserDataProducer:
 
     def __init__(self, shm_name="hyp_user", shm_size=102400):
-        self.address, _, _ = setup(skip_ws=True)
+        self.address, _, _ = setup(None, None, skip_ws=True)
         self.shm_name_user = shm_name + "_data"
         self.shm_name_orders = shm_name + "_orders"
         self.shm_size = shm_size
 
-    async def _start(self, stop_event):
+    def _open_shm(self):
         delete_semaphore(f"/{self.shm_name_user}.sem")
         delete_semaphore(f"/{self.shm_name_orders}.sem")
         self.lock1 = posix_ipc.Semaphore(
@@ -104,15 +116,22 @@ class UserDataProducer:
 
         shm1 = create_shared_memory(self.shm_name_user, self.shm_size)
         shm2 = create_shared_memory(self.shm_name_orders, self.shm_size)
+        return shm1, shm2
+
+    def _close_shm(self, shm1, shm2):
+        # Cleanup shared memory when done
+        print("Cleaning up shared memory", self.shm_name_user, self.shm_name_orders)
+        shm1.close()
+        shm1.unlink()
+        shm2.close()
+        shm2.unlink()
+
+    async def _start(self, stop_event):
+        shm1, shm2 = self._open_shm()
         try:
             await self.run(stop_event)
         finally:
-            # Cleanup shared memory when done
-            print("Cleaning up shared memory", self.shm_name_user, self.shm_name_orders)
-            shm1.close()
-            shm1.unlink()
-            shm2.close()
-            shm2.unlink()
+            self._close_shm(shm1, shm2)
 
     async def run(self, stop_event):
         # Setup for catching SIGINT gracefully
@@ -156,6 +175,248 @@ class UserDataProducer:
         asyncio.run(self._start(stop_event))
 
 
+def _fmt(x: float) -> str:
+    # the API sends numbers as strings
+    return f"{x:.12g}"
+
+
+def _is_perp(coin: str) -> bool:
+    return not coin.startswith("@") and "/" not in coin
+
+
+class UserState:
+    """
+    clearinghouseState and openOrders of one user, moved forward by fills and
+    order updates between snapshots.
+
+    Events newer than a snapshot are kept for replay_s and re-applied on top
+    of it, so a snapshot that lags the stream does not undo a fill. Positions
+    are marked at the last fill price until the next snapshot; margin
+    summaries only change with snapshots.
+    """
+
+    def __init__(self, replay_s: float = 60):
+        self.lock = threading.Lock()
+        self.replay_ms = replay_s * 1000
+        self.clearinghouse: Dict = None
+        self.orders: Dict[int, Dict] = {}
+        self.snapshot_ms = 0
+        self.event_ms = 0
+        self.fills = deque()
+        self.fill_tids = set()
+        self.updates = deque()
+
+    @property
+    def ready(self) -> bool:
+        return self.clearinghouse is not None
+
+    def _prune(self, now_ms):
+        while self.fills and self.fills[0]["time"] < now_ms - self.replay_ms:
+            self.fill_tids.discard(self.fills.popleft()["tid"])
+        while (
+            self.updates
+            and self.updates[0]["statusTimestamp"] < now_ms - self.replay_ms
+        ):
+            self.updates.popleft()
+
+    def on_snapshot(self, clearinghouse: Dict, open_orders: List[Dict]):
+        with self.lock:
+            self.clearinghouse = clearinghouse
+            self.orders = {order["oid"]: order for order in open_orders}
+            self.snapshot_ms = clearinghouse["time"]
+            self.event_ms = max(self.event_ms, self.snapshot_ms)
+            self._prune(self.snapshot_ms)
+            for update in self.updates:
+                if update["statusTimestamp"] > self.snapshot_ms:
+                    self._apply_update(update)
+            for fill in self.fills:
+                if fill["time"] > self.snapshot_ms:
+                    self._apply_fill(fill)
+
+    def on_fills(self, fills: List[Dict]) -> bool:
+        changed = False
+        with self.lock:
+            for fill in fills:
+                if fill["tid"] in self.fill_tids:
+                    continue
+                self.fill_tids.add(fill["tid"])
+                self.fills.append(fill)
+                self.event_ms = max(self.event_ms, fill["time"])
+                if self.ready:
+                    self._apply_fill(fill)
+                    changed = True
+        return changed
+
+    def on_order_updates(self, updates: List[Dict]) -> bool:
+        with self.lock:
+            for update in updates:
+                self.updates.append(update)
+                self.event_ms = max(self.event_ms, update["statusTimestamp"])
+                if self.ready:
+                    self._apply_update(update)
+            return self.ready and bool(updates)
+
+    def _apply_update(self, update):
+        order = update["order"]
+        if update["status"] == "open":
+            self.orders[order["oid"]] = order
+        else:
+            self.orders.pop(order["oid"], None)
+
+    def _apply_fill(self, fill):
+        resting = self.orders.get(fill["oid"])
+        if resting is not None:
+            sz = float(resting["sz"]) - float(fill["sz"])
+            if sz <= 0:
+                del self.orders[fill["oid"]]
+            else:
+                self.orders[fill["oid"]] = {**resting, "sz": _fmt(sz)}
+        coin = fill["coin"]
+        if not _is_perp(coin):
+            return
+        positions = self.clearinghouse["assetPositions"]
+        idx = next(
+            (i for i, el in enumerate(positions) if el["position"]["coin"] == coin),
+            None,
+        )
+        pos = positions[idx]["position"] if idx is not None else {"coin": coin}
+        px = float(fill["px"])
+        old = float(pos.get("szi", 0))
+        new = old + float(fill["sz"]) * (1 if fill["side"] == "B" else -1)
+        if abs(new) < 1e-12:
+            if idx is not None:
+                del positions[idx]
+            return
+        if old == 0 or (old > 0) != (new > 0):
+            # opened or flipped
+            entry = px
+        elif abs(new) > abs(old):
+            entry = (old * float(pos["entryPx"]) + (new - old) * px) / new
+        else:
+            entry = float(pos["entryPx"])
+        pos.update(
+            szi=_fmt(new),
+            entryPx=_fmt(entry),
+            positionValue=_fmt(abs(new) * px),
+            unrealizedPnl=_fmt(new * (px - entry)),
+        )
+        if idx is None:
+            positions.append({"type": "oneWay", "position": pos})
+
+    def payloads(self):
+        """(clearinghouseState with eventTime, openOrders) to publish."""
+        with self.lock:
+            user = {**self.clearinghouse, "eventTime": self.event_ms}
+            return user, list(self.orders.values())
+
+
+class WsUserDataProducer(UserDataProducer):
+
+    def __init__(
+        self,
+        shm_name="hyp_user",
+        shm_size=102400,
+        base_url=MAINNET_API_URL,
+        # well inside HyperOMS.is_stale's 60s when nothing trades
+        reconcile_s: float = 20,
+        web_data: bool = False,
+    ):
+        UserDataProducer.__init__(self, shm_name, shm_size)
+        self.base_url = base_url
+        self.reconcile_s = reconcile_s
+        self.web_data = web_data
+        self.state = UserState()
+        self.reconcile_needed = threading.Event()
+        # ws thread and reconcile loop both publish; one at a time, so the
+        # later write always carries the later state and both segments match
+        self.publish_lock = threading.Lock()
+        self.ws_manager = None
+        # exchange event -> shared memory, in ms
+        self.latency = EndpointStats()
+        self.n_reconciles = 0
+
+    def _subscribe(self):
+        subs = [("userFills", self.on_fills), ("orderUpdates", self.on_order_updates)]
+        if self.web_data:
+            subs.append(("webData2", self.on_web_data))
+        self.ws_manager = WebsocketManager(self.base_url)
+        for sub_type, callback in subs:
+            self.ws_manager.add_subscription(
+                {"type": sub_type, "user": self.address}, callback
+            )
+        # subscriptions are (re)sent on open, unless it already happened
+        ws = self.ws_manager.ws
+        if ws.sock and ws.sock.connected:
+            self.ws_manager.subscribe_queued()
+
+    def publish(self):
+        if not self.state.ready:
+            return
+        with self.publish_lock:
+            user, orders = self.state.payloads()
+            write_shm(self.lock1, self.shm_name_user, user)
+            write_shm(self.lock2, self.shm_name_orders, orders)
+        self.latency.add(time.time() * 1000 - user["eventTime"])
+
+    def on_fills(self, ws_msg):
+        data = ws_msg["data"]
+        if data.get("isSnapshot"):
+            # first message after a (re)subscribe, events may have been missed
+            self.reconcile_needed.set()
+            return
+        if self.state.on_fills(data["fills"]):
+            self.publish()
+
+    def on_order_updates(self, ws_msg):
+        if self.state.on_order_updates(ws_msg["data"]):
+            self.publish()
+
+    def on_web_data(self, ws_msg):
+        data = ws_msg["data"]
+        self.state.on_snapshot(data["clearinghouseState"], data["openOrders"])
+        self.publish()
+
+    def reconcile(self):
+        self.n_reconciles += 1
+        client = get_client()
+        user = client.post(
+            url, json={"type": "clearinghouseState", "user": self.address}
+        )
+        orders = client.post(url, json={"type": "openOrders", "user": self.address})
+        user.raise_for_status()
+        orders.raise_for_status()
+        self.state.on_snapshot(user.json(), orders.json())
+        self.publish()
+
+    def start(self, stop_event):
+        shm1, shm2 = self._open_shm()
+        try:
+            self._subscribe()
+            last_reconcile = 0
+            last_log = time.time()
+            while not stop_event.is_set():
+                tnow = time.time()
+                if self.reconcile_needed.is_set() or (
+                    tnow - last_reconcile >= self.reconcile_s
+                ):
+                    self.reconcile_needed.clear()
+                    last_reconcile = tnow
+                    try:
+                        self.reconcile()
+                    except Exception as e:
+                        logger.error(f"WsUserDataProducer: reconcile failed: {e}")
+                        self.reconcile_needed.set()
+                if tnow - last_log >= 60:
+                    last_log = tnow
+                    logger.info(
+                        f"WsUserDataProducer: reconciles {self.n_reconciles}, "
+                        f"event -> shm latency {self.latency.summary()}"
+                    )
+                stop_event.wait(1)
+        finally:
+            self._close_shm(shm1, shm2)
+
+
 if __name__ == "__main__":
     import dotenv
 
@@ -164,7 +425,7 @@ if __name__ == "__main__":
     stop_event = Event()
     signal.signal(signal.SIGINT, lambda s, f: signal_handler(s, f, stop_event))
     tickers = ["BTC", "ETH", "kPEPE"]
-    producer = UserDataProducer()
+    producer = UserDataProducer() if "--poll" in sys.argv else WsUserDataProducer()
     # Start the WebSocket listener process
     ws_process = Process(target=producer.start, args=(stop_event,))
     ws_process.start()
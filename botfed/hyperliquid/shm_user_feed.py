@@ -1,4 +1,5 @@
 import logging
+import time
 import posix_ipc
 import orjson as json
 
@@ -6,6 +7,7 @@ import orjson as json
 from ..core import shared_memory
 
 from .feed import Feed
+from ..core.http_client import EndpointStats
 
 
 class UserFeed(Feed):
@@ -28,6 +30,8 @@ class UserFeed(Feed):
         self.last_update_orders = {}
         self.user_listeners = []
         self.orders_listeners = []
+        # ms from the exchange event (WsUserDataProducer) to the listeners
+        self.latency = EndpointStats()
 
     def add_user_listener(self, listener):
         self.user_listeners.append(listener)
@@ -66,6 +70,8 @@ class UserFeed(Feed):
         if data:
             for listener in self.user_listeners:
                 listener(data)
+            if "eventTime" in data:
+                self.latency.add(time.time() * 1000 - data["eventTime"])
 
     def run_user_orders(self):
         data_bytes = None
@@ -83,9 +89,9 @@ class UserFeed(Feed):
         if not data_bytes:
             return
         timestamp = int.from_bytes(data_bytes[0:8])
-        if timestamp <= self.last_update.get("user", 0):
+        if timestamp <= self.last_update.get("orders", 0):
             return
-        self.last_update["user"] = timestamp
+        self.last_update["orders"] = timestamp
         len_enc = int.from_bytes(data_bytes[8:16])
         data = json.loads(data_bytes[16 : 16 + len_enc].decode("utf-8"))
         for listener in self.orders_listeners:
@@ -93,3 +99,4 @@ class UserFeed(Feed):
 
     def close(self):
         print("Closing UserFeed", self.shm_name_user, self.shm_name_orders)
+        logging.info(f"UserFeed: event -> listener latency {self.latency.summary()}")
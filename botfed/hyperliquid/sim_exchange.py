@@ -81,6 +81,7 @@ class SimExchange:
                 resp_orders.append(
                     {"cancelled": {"oid": order["oid"], "cloid": order["cloid"]}}
                 )
+        return resp
 
     def on_bulk_orders(self, msg) -> Dict:
         resp = self._base_resp()
@@ -123,6 +124,7 @@ class SimExchange:
                     resp_orders.append(
                         {"resting": {"oid": self.oid, "cloid": order["cloid"]}}
                     )
+        return resp
 
     def on_trade(self, trade):
         coin = trade["coin"]
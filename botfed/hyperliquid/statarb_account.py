@@ -14,6 +14,7 @@ from ..binance.universe import binance_contract_to_coin
 from ..logger import get_logger
 from ..statarb.universe import hl_symbol_to_uni_symbol, uni_symbol_to_coin
 from ..core import time
+from ..core.instruments import get_instruments
 from .hl_interface import setup
 
 
@@ -69,19 +70,17 @@ class HLOrderUtil:
 
     def __init__(self, info):
         self.info = info
-        self.meta = self.info.meta()
+        self.instruments = get_instruments("hl")
+        self.meta = self.instruments.raw
 
     def sz_decimals(self, coin):
-        for el in self.meta["universe"]:
-            if el["name"] == coin:
-                return el["szDecimals"]
+        return self.instruments.sz_decimals(coin)
 
     def valid_qty(self, coin, qty):
-        decimals = self.sz_decimals(coin)
-        return round(qty, decimals)
+        return self.instruments.valid_qty(coin, qty)
 
-    def valid_price(self, _, price):
-        return round(float(f"{price:.5g}"), 6)
+    def valid_price(self, coin, price):
+        return self.instruments.valid_price(coin, price)
 
 
 class HyperStatArbAccount(AccountBase):
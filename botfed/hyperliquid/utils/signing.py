@@ -1,19 +1,51 @@
 import time
 
 from decimal import Decimal
-from eth_account.messages import encode_structured_data
+from eth_keys import keys
 from eth_utils import keccak, to_hex
 import msgpack
 
-from hyperliquid.utils.types import Literal, Optional, TypedDict, Union, Cloid, NotRequired
+try:
+    import coincurve
+except ImportError:
+    coincurve = None
+
+try:
+    from eth_account.messages import encode_structured_data
+except ImportError:
+    # removed in eth-account 0.13
+    from eth_account.messages import encode_typed_data
+
+    def encode_structured_data(data):
+        return encode_typed_data(full_message=data)
+
+
+from hyperliquid.utils.types import (
+    Literal,
+    Optional,
+    TypedDict,
+    Union,
+    Cloid,
+    NotRequired,
+)
 
 Tif = Union[Literal["Alo"], Literal["Ioc"], Literal["Gtc"]]
 Tpsl = Union[Literal["tp"], Literal["sl"]]
 LimitOrderType = TypedDict("LimitOrderType", {"tif": Tif})
-TriggerOrderType = TypedDict("TriggerOrderType", {"triggerPx": float, "isMarket": bool, "tpsl": Tpsl})
-TriggerOrderTypeWire = TypedDict("TriggerOrderTypeWire", {"triggerPx": str, "isMarket": bool, "tpsl": Tpsl})
-OrderType = TypedDict("OrderType", {"limit": LimitOrderType, "trigger": TriggerOrderType}, total=False)
-OrderTypeWire = TypedDict("OrderTypeWire", {"limit": LimitOrderType, "trigger": TriggerOrderTypeWire}, total=False)
+TriggerOrderType = TypedDict(
+    "TriggerOrderType", {"triggerPx": float, "isMarket": bool, "tpsl": Tpsl}
+)
+TriggerOrderTypeWire = TypedDict(
+    "TriggerOrderTypeWire", {"triggerPx": str, "isMarket": bool, "tpsl": Tpsl}
+)
+OrderType = TypedDict(
+    "OrderType", {"limit": LimitOrderType, "trigger": TriggerOrderType}, total=False
+)
+OrderTypeWire = TypedDict(
+    "OrderTypeWire",
+    {"limit": LimitOrderType, "trigger": TriggerOrderTypeWire},
+    total=False,
+)
 OrderRequest = TypedDict(
     "OrderRequest",
     {
@@ -40,7 +72,15 @@ CancelByCloidRequest = TypedDict("CancelByCloidRequest", {"coin": str, "cloid":
 
 Grouping = Union[Literal["na"], Literal["normalTpsl"], Literal["positionTpsl"]]
 Order = TypedDict(
-    "Order", {"asset": int, "isBuy": bool, "limitPx": float, "sz": float, "reduceOnly": bool, "cloid": Optional[Cloid]}
+    "Order",
+    {
+        "asset": int,
+        "isBuy": bool,
+        "limitPx": float,
+        "sz": float,
+        "reduceOnly": bool,
+        "cloid": Optional[Cloid],
+    },
 )
 
 
@@ -99,7 +139,70 @@ def construct_phantom_agent(hash, is_mainnet):
     return {"source": "a" if is_mainnet else "b", "connectionId": hash}
 
 
+# EIP-712 pieces of the L1 action signature, fixed for every action
+EIP712_DOMAIN_TYPEHASH = keccak(
+    b"EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)"
+)
+AGENT_TYPEHASH = keccak(b"Agent(string source,bytes32 connectionId)")
+
+
+def domain_separator(name, version, chain_id, verifying_contract):
+    return keccak(
+        EIP712_DOMAIN_TYPEHASH
+        + keccak(name.encode())
+        + keccak(version.encode())
+        + chain_id.to_bytes(32, "big")
+        + bytes(12)
+        + address_to_bytes(verifying_contract)
+    )
+
+
+L1_DOMAIN_SEPARATOR = domain_separator(
+    "Exchange", "1", 1337, "0x0000000000000000000000000000000000000000"
+)
+_AGENT_SOURCE_HASH = {True: keccak(b"a"), False: keccak(b"b")}
+
+_signing_keys = {}
+
+
+def _signing_key(wallet):
+    key = _signing_keys.get(wallet.address)
+    if key is None:
+        raw = bytes(wallet.key)
+        key = coincurve.PrivateKey(raw) if coincurve else keys.PrivateKey(raw)
+        _signing_keys[wallet.address] = key
+    return key
+
+
+def sign_digest(wallet, digest: bytes):
+    key = _signing_key(wallet)
+    if coincurve:
+        sig = key.sign_recoverable(digest, hasher=None)
+        r = int.from_bytes(sig[:32], "big")
+        s = int.from_bytes(sig[32:64], "big")
+        v = sig[64]
+    else:
+        signed = key.sign_msg_hash(digest)
+        r, s, v = signed.r, signed.s, signed.v
+    return {"r": to_hex(r), "s": to_hex(s), "v": v + 27}
+
+
+def l1_action_digest(action, active_pool, nonce, is_mainnet):
+    """EIP-712 digest of the phantom agent, without building the typed dict."""
+    struct_hash = keccak(
+        AGENT_TYPEHASH
+        + _AGENT_SOURCE_HASH[is_mainnet]
+        + action_hash(action, active_pool, nonce)
+    )
+    return keccak(b"\x19\x01" + L1_DOMAIN_SEPARATOR + struct_hash)
+
+
 def sign_l1_action(wallet, action, active_pool, nonce, is_mainnet):
+    """Signs the digest directly; same signature as sign_l1_action_eip712."""
+    return sign_digest(wallet, l1_action_digest(action, active_pool, nonce, is_mainnet))
+
+
+def sign_l1_action_eip712(wallet, action, active_pool, nonce, is_mainnet):
     hash = action_hash(action, active_pool, nonce)
     phantom_agent = construct_phantom_agent(hash, is_mainnet)
     data = {
@@ -213,7 +316,7 @@ def sign_inner(wallet, data):
     return {"r": to_hex(signed["r"]), "s": to_hex(signed["s"]), "v": signed["v"]}
 
 
-def float_to_wire(x: float) -> str:
+def float_to_wire_decimal(x: float) -> str:
     rounded = "{:.8f}".format(x)
     if abs(float(rounded) - x) >= 1e-12:
         raise ValueError("float_to_wire causes rounding", x)
@@ -223,6 +326,14 @@ def float_to_wire(x: float) -> str:
     return f"{normalized:f}"
 
 
+def float_to_wire(x: float) -> str:
+    """Same output as float_to_wire_decimal without going through Decimal."""
+    rounded = "{:.8f}".format(x)
+    if abs(float(rounded) - x) >= 1e-12:
+        raise ValueError("float_to_wire causes rounding", x)
+    return rounded.rstrip("0").rstrip(".")
+
+
 def float_to_int_for_hashing(x: float) -> int:
     return float_to_int(x, 8)
 
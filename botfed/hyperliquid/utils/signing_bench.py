@@ -0,0 +1,60 @@
+"""
+Times the fast L1 signing path against the EIP-712 reference; tests/
+test_signing.py checks that both give the same signatures.
+
+    python -m botfed.hyperliquid.utils.signing_bench --n 2000
+"""
+
+import argparse
+import random
+import timeit
+
+import eth_account
+
+from .signing import (
+    float_to_wire,
+    float_to_wire_decimal,
+    order_wires_to_order_action,
+    sign_l1_action,
+    sign_l1_action_eip712,
+)
+
+# well-known throwaway key, never funded
+TEST_KEY = "0x" + "01" * 32
+
+
+def order_action(rng: random.Random, n_orders: int = 2):
+    wires = []
+    for _ in range(n_orders):
+        px = round(rng.uniform(0.001, 100_000), rng.randint(0, 5))
+        sz = round(rng.uniform(0.001, 1000), rng.randint(0, 4))
+        wires.append(
+            {
+                "a": rng.randint(0, 200),
+                "b": rng.random() < 0.5,
+                "p": float_to_wire(px),
+                "s": float_to_wire(sz),
+                "r": False,
+                "t": {"limit": {"tif": "Alo"}},
+                "c": "0x%032x" % rng.getrandbits(128),
+            }
+        )
+    return order_wires_to_order_action(wires)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="L1 signing benchmark")
+    parser.add_argument("--n", type=int, default=2000)
+    args = parser.parse_args()
+
+    wallet = eth_account.Account.from_key(TEST_KEY)
+    action = order_action(random.Random(7))
+    vault, nonce, is_mainnet = "0x" + "ab" * 20, 1_700_000_000_000, True
+    for name, fn in [("eip712", sign_l1_action_eip712), ("fast", sign_l1_action)]:
+        secs = timeit.timeit(
+            lambda: fn(wallet, action, vault, nonce, is_mainnet), number=args.n
+        )
+        print(f"{name:>7} sign_l1_action: {secs / args.n * 1e6:8.1f} us")
+    for name, fn in [("decimal", float_to_wire_decimal), ("fast", float_to_wire)]:
+        secs = timeit.timeit(lambda: fn(1234.5678), number=args.n * 50)
+        print(f"{name:>7} float_to_wire: {secs / (args.n * 50) * 1e6:8.2f} us")
@@ -4,6 +4,7 @@ import logging
 import threading
 import time
 from collections import defaultdict
+from concurrent.futures import Future, InvalidStateError
 from ..core.ssl_context import context
 from ..core.websocket_mngr import WebsocketManager as BaseWebsocketManager
 
@@ -25,6 +26,25 @@ ActiveSubscription = NamedTuple(
 )
 
 
+class PostError(Exception):
+    """A ws post request failed: error response, timeout or lost connection."""
+
+
+def _settle(fut: Future, result=None, error: Exception = None):
+    """Resolve fut unless it already is: timed out, cancelled by the
+    caller, or answered twice."""
+    if fut.done():
+        return
+    try:
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+    except InvalidStateError:
+        # cancelled between the check and the set
+        pass
+
+
 def subscription_to_identifier(subscription: Subscription) -> str:
     if subscription["type"] == "allMids":
         return "allMids"
@@ -34,6 +54,9 @@ def subscription_to_identifier(subscription: Subscription) -> str:
         return f'trades:{subscription["coin"]}'
     elif subscription["type"] == "userEvents":
         return "userEvents"
+    elif subscription["type"] in ("userFills", "orderUpdates", "webData2"):
+        # one user per connection, like userEvents
+        return subscription["type"]
 
 
 def identifier_to_sub(identifier: str) -> {}:
@@ -62,12 +85,16 @@ def ws_msg_to_identifier(ws_msg: WsMsg) -> Optional[str]:
             return f'trades:{trades[0]["coin"]}'
     elif ws_msg["channel"] == "user":
         return "userEvents"
+    elif ws_msg["channel"] in ("userFills", "orderUpdates", "webData2"):
+        return ws_msg["channel"]
     elif ws_msg["channel"] == "post":
         return "post"
 
 
 class WebsocketManager(BaseWebsocketManager):
-    def __init__(self, base_url, timeout_thresh=30, sub_timeout=30):
+    def __init__(
+        self, base_url, timeout_thresh=30, sub_timeout=30, post_timeout_s=2.0
+    ):
         self.sub_timeout = sub_timeout
         self.subscription_id_counter = 0
         self.queued_subscriptions: List[Tuple[Subscription, ActiveSubscription]] = []
@@ -75,11 +102,21 @@ class WebsocketManager(BaseWebsocketManager):
             list
         )
         self.confirmed_subs = {}
+        # identifier -> subscription as sent, user subscriptions need the user
+        self.subscriptions: Dict[str, Subscription] = {}
         self.post_listeners = []
         self.ws_url = "ws" + base_url[len("http") :] + "/ws"
         self.ping_sender = threading.Thread(target=self.send_ping)
         self.ping_sender.start()
         self.post_id = 0
+        # post id -> (future, deadline), resolved by id in on_message
+        self.post_timeout_s = post_timeout_s
+        self.post_lock = threading.Lock()
+        self.pending_posts: Dict[int, Tuple[Future, float]] = {}
+        # set by close(), stops the post reaper
+        self.closed = threading.Event()
+        self.post_reaper = threading.Thread(target=self._expire_posts, daemon=True)
+        self.post_reaper.start()
         BaseWebsocketManager.__init__(
             self, self.ws_url, timeout_threshold=timeout_thresh, warn_threshold=5
         )
@@ -97,7 +134,9 @@ class WebsocketManager(BaseWebsocketManager):
                     and data["last_sub"] < time.time() - self.sub_timeout
                 ):
                     logging.info(f"Never got sub resp, resubscribing to {identifier}")
-                    sub = identifier_to_sub(identifier)
+                    sub = self.subscriptions.get(identifier) or identifier_to_sub(
+                        identifier
+                    )
                     self.send_sub(sub)
 
     def test_close(self):
@@ -106,15 +145,100 @@ class WebsocketManager(BaseWebsocketManager):
             print("Testing close")
             self.ws.close()
 
+    def _next_post_id(self) -> int:
+        with self.post_lock:
+            self.post_id += 1
+            return self.post_id
+
     def post(self, data) -> int:
-        self.post_id += 1
+        """Fire and forget, the response goes to post_listeners."""
+        post_id = self._next_post_id()
         request = {
             "method": "post",
-            "id": self.post_id,
+            "id": post_id,
             "request": data,
         }
         self.ws.send(json.dumps(request))
-        return self.post_id
+        return post_id
+
+    def post_request(
+        self, request_type: str, payload: Any, timeout_s: float = None
+    ) -> Future:
+        """Send an "info" or "action" request; the future resolves to the
+        response payload (the data of an info response) or raises PostError.
+        Any number of requests may be in flight."""
+        fut = Future()
+        deadline = time.time() + (timeout_s or self.post_timeout_s)
+        with self.post_lock:
+            self.post_id += 1
+            post_id = self.post_id
+            self.pending_posts[post_id] = (fut, deadline)
+        request = {
+            "method": "post",
+            "id": post_id,
+            "request": {"type": request_type, "payload": payload},
+        }
+        try:
+            self.ws.send(json.dumps(request))
+        except Exception as e:
+            self._fail_post(post_id, PostError(f"send failed: {e}"))
+        return fut
+
+    def post_info(self, payload: Any, timeout_s: float = None) -> Future:
+        return self.post_request("info", payload, timeout_s)
+
+    def _fail_post(self, post_id, error):
+        with self.post_lock:
+            entry = self.pending_posts.pop(post_id, None)
+        if entry is not None:
+            _settle(entry[0], error=error)
+
+    def _resolve_post(self, data):
+        with self.post_lock:
+            entry = self.pending_posts.pop(data.get("id"), None)
+        if entry is None:
+            return
+        response = data["response"]
+        if response["type"] == "error":
+            _settle(entry[0], error=PostError(response["payload"]))
+        elif response["type"] == "info":
+            _settle(entry[0], response["payload"]["data"])
+        else:
+            _settle(entry[0], response["payload"])
+
+    def _fail_all_posts(self, reason):
+        with self.post_lock:
+            pending, self.pending_posts = self.pending_posts, {}
+        for fut, _ in pending.values():
+            _settle(fut, error=PostError(reason))
+
+    def _expire_posts(self):
+        while not self.closed.wait(0.05):
+            tnow = time.time()
+            with self.post_lock:
+                expired = [
+                    post_id
+                    for post_id, (_, deadline) in self.pending_posts.items()
+                    if deadline < tnow
+                ]
+            for post_id in expired:
+                self._fail_post(post_id, PostError(f"post {post_id} timed out"))
+
+    def on_close(self, *args):
+        # responses to requests sent on this connection will never come
+        self._fail_all_posts("connection closed")
+        BaseWebsocketManager.on_close(self, *args)
+
+    def close(self):
+        """Close the connection for good: no reconnect, the post reaper
+        exits and pending posts fail."""
+        self.closed.set()
+        self.stop_event.set()
+        try:
+            self.ws.close()
+        except Exception as e:
+            logging.error(f"Error closing websocket connection: {e}")
+        self._fail_all_posts("manager closed")
 
     def send_ping(self):
         while True:
@@ -151,6 +275,7 @@ class WebsocketManager(BaseWebsocketManager):
             logging.debug("Websocket not handling empty message")
             return
         if identifier == "post":
+            self._resolve_post(ws_msg["data"])
             for listener in self.post_listeners:
                 listener(ws_msg)
             return
@@ -204,6 +329,7 @@ class WebsocketManager(BaseWebsocketManager):
             self.subscription_id_counter += 1
             subscription_id = self.subscription_id_counter
         identifier = subscription_to_identifier(subscription)
+        self.subscriptions[identifier] = subscription
         if subscription["type"] == "userEvents":
             # TODO: ideally the userEvent messages would include the user so that we can support multiplexing them
             if len(self.active_subscriptions[identifier]) != 0:
@@ -216,7 +342,7 @@ class WebsocketManager(BaseWebsocketManager):
 
     def subscribe_queued(self):
         for identifier in self.active_subscriptions:
-            sub = identifier_to_sub(identifier)
+            sub = self.subscriptions.get(identifier) or identifier_to_sub(identifier)
             logging.info(f"Resubscribing to {identifier}")
             self.send_sub(sub)
             time.sleep(0.1)
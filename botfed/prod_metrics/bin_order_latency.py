@@ -5,6 +5,7 @@ from binance.client import Client
 from dotenv import load_dotenv
 import os
 import argparse
+from ..core.sim_latency import LatencyDist
 
 # Load environment variables
 load_dotenv()
@@ -108,6 +109,7 @@ def process_local_data(data):
                         "price": order.get("price"),
                         "cancellation_attempt": cancellation_attempt,
                         "error_message": None,
+                        "ts_oms_send": entry.get("ts_oms_send"),
                     }
                 )
     return pd.DataFrame(processed_data)
@@ -125,6 +127,18 @@ def merge_data(binance_df, local_df):
     return merged_df
 
 
+def entry_latency_ms(merged_df):
+    """OMS send -> exchange order creation, per accepted new order."""
+    df = merged_df[~merged_df["cancellation_attempt"]]
+    df = df.dropna(subset=["ts_oms_send"])
+    return (df["time"].astype(float) - df["ts_oms_send"].astype(float)).tolist()
+
+
+def fit_entry_latency(merged_df, kind="lognormal"):
+    """Entry-delay distribution for the sim latency model."""
+    return LatencyDist.from_samples(entry_latency_ms(merged_df), kind=kind)
+
+
 # Main execution
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -143,3 +157,8 @@ if __name__ == "__main__":
 
     # Display merged data
     print(merged_df)
+    latency = fit_entry_latency(merged_df)
+    print(
+        f"Entry latency fit: mu={latency.mu:.3f} sigma={latency.sigma:.3f} "
+        f"p50={latency.quantile(0.5):.1f}ms p99={latency.quantile(0.99):.1f}ms"
+    )
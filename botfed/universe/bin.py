@@ -2,9 +2,8 @@ import pandas as pd
 import json
 import datetime as dt
 import logging
-import requests
 from ..backfill.binance_markets import get_bin_uni
-
+from ..core.http_client import get_client
 
 OUTDIR = "../data/universe_bin/"
 
@@ -21,12 +20,12 @@ def load_uni_perps_top_N_usdt(N, outdir=OUTDIR):
 
 
 def fetch_24hr_spot_stats():
-    resp = requests.get("https://api.binance.com/api/v3/ticker/24hr")
+    resp = get_client().get("https://api.binance.com/api/v3/ticker/24hr", weight=80)
     return resp.json()
 
 
 def fetch_24hr_perp_stats():
-    resp = requests.get("https://fapi.binance.com/fapi/v1/ticker/24hr")
+    resp = get_client().get("https://fapi.binance.com/fapi/v1/ticker/24hr", weight=40)
     return resp.json()
 
 
@@ -81,7 +80,7 @@ def save_spot(rows, outdir, spot_stats):
 
 
 def get_funding_adj():
-    resp = requests.get("https://fapi.binance.com/fapi/v1/fundingInfo")
+    resp = get_client().get("https://fapi.binance.com/fapi/v1/fundingInfo")
     return resp.json()
 
 
@@ -0,0 +1,247 @@
+import datetime as dt
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from botfed.backfill.ohlcv_store import MS_PER_DAY, OHLCVStore, to_ms
+from botfed.backfill.synthetic import synthetic_agg_trades
+from botfed.backfill.trade_store import TradeStore
+from botfed.binance.bar_aggregator import GRACE_MS, BarAggregator
+from botfed.core import time
+from botfed.core.kline import KLineStore
+
+TICKER = "BTCUSDT"
+START = to_ms(dt.datetime(2024, 2, 1, tzinfo=dt.timezone.utc))
+END = START + 6 * 3600 * 1000
+
+KLINE_FIELDS = {
+    "open": "open",
+    "high": "high",
+    "low": "low",
+    "close": "close",
+    "volume": "volume",
+    "quote_volume": "quote_asset_volume",
+    "buy_volume": "taker_buy_base_asset_volume",
+    "trades": "num_trades",
+}
+
+
+class _Recorder:
+    def __init__(self):
+        self.bars = []
+
+    def on_event(self, event):
+        self.bars.append(event["data"])
+
+
+def trade_events(ticker: str, trades: pd.DataFrame):
+    """TradeStore rows as aggTrade messages."""
+    for row in trades.itertuples(index=False):
+        yield row.transact_time, {
+            "e": "aggTrade",
+            "s": ticker,
+            "p": str(row.price),
+            "q": str(row.quantity),
+            "T": row.transact_time,
+            "m": row.is_buyer_maker,
+            "f": row.first_trade_id,
+            "l": row.last_trade_id,
+        }
+
+
+def replay(
+    trades,
+    quotes=(),
+    interval_ms=60_000,
+    end_ms=None,
+    trade_latency_ms=30,
+    quote_latency_ms=10,
+    grace_ms=GRACE_MS,
+) -> BarAggregator:
+    """Feed (exchange ts, message) streams to a BarAggregator in sim time,
+    each message arriving latency ms after its exchange time, with
+    run_ticks() before every message. Quotes arrive ahead of trades."""
+    arrivals = [(ts + trade_latency_ms, 0, msg) for ts, msg in trades]
+    arrivals += [(ts + quote_latency_ms, 1, msg) for ts, msg in quotes]
+    arrivals.sort(key=lambda a: (a[0], a[1]))
+    agg = BarAggregator(interval_ms, grace_ms=grace_ms)
+    agg.add_listener(_Recorder())
+    was_sim = time.sim
+    time.sim = True
+    try:
+        for ts, kind, msg in arrivals:
+            time.set_time_ms(ts)
+            agg.run_ticks()
+            if kind == 0:
+                agg.on_agg_trade(msg)
+            else:
+                agg.on_book_update(msg)
+        if end_ms is not None:
+            time.set_time_ms(end_ms + grace_ms)
+            agg.run_ticks()
+    finally:
+        time.sim = was_sim
+    return agg
+
+
+def bars_frame(agg: BarAggregator) -> pd.DataFrame:
+    return pd.DataFrame(agg.listeners[0].bars).set_index("open_time")
+
+
+def compare(bars: pd.DataFrame, klines: pd.DataFrame, fields=KLINE_FIELDS):
+    """Bars against klines (OHLCVStore columns) from the first bar on."""
+    klines = klines.set_index("open_time")
+    klines = klines[klines.index >= bars.index[0]]
+    assert bars.index.equals(klines.index), (len(bars), len(klines))
+    for ours, theirs in fields.items():
+        np.testing.assert_allclose(
+            bars[ours].to_numpy(float),
+            klines[theirs].to_numpy(float),
+            rtol=1e-9,
+            err_msg=ours,
+        )
+
+
+# generated data
+
+
+def reference_bars(trades, start_ms, end_ms, step) -> pd.DataFrame:
+    """Kline columns per bar from trades with pandas, empty bars flat at the
+    previous close."""
+    t = trades["transact_time"].to_numpy()
+    key = t - t % step
+    p, q = trades["price"], trades["quantity"]
+    g = p.groupby(key)
+    df = pd.DataFrame(
+        {
+            "open": g.first(),
+            "high": g.max(),
+            "low": g.min(),
+            "close": g.last(),
+            "volume": q.groupby(key).sum(),
+            "quote_asset_volume": (p * q).groupby(key).sum(),
+            "taker_buy_base_asset_volume": q.where(~trades["is_buyer_maker"], 0)
+            .groupby(key)
+            .sum(),
+            "num_trades": (trades["last_trade_id"] - trades["first_trade_id"] + 1)
+            .groupby(key)
+            .sum(),
+        }
+    )
+    df = df.reindex(np.arange(start_ms, end_ms, step))
+    df["close"] = df["close"].ffill()
+    for col in ("open", "high", "low"):
+        df[col] = df[col].fillna(df["close"])
+    df = df.fillna(
+        {
+            "volume": 0,
+            "quote_asset_volume": 0,
+            "taker_buy_base_asset_volume": 0,
+            "num_trades": 0,
+        }
+    )
+    return df.rename_axis("open_time").reset_index()
+
+
+def make_quotes(rng, ticker, start_ms, end_ms, n):
+    ts = np.sort(rng.integers(start_ms, end_ms, n))
+    mid = 100 + rng.normal(0, 1, n).cumsum() / 100
+    half = rng.uniform(0.005, 0.02, n)
+    df = pd.DataFrame(
+        {"T": ts, "b": mid - half, "a": mid + half, "B": rng.uniform(1, 10, n)}
+    )
+    df["A"] = rng.uniform(1, 10, n)
+    msgs = [
+        (row.T, {"e": "bookTicker", "s": ticker, **row._asdict()})
+        for row in df.itertuples(index=False)
+    ]
+    return df, msgs
+
+
+@pytest.fixture(scope="module")
+def trades():
+    # sparse enough that some 5s and 1m bars have no trades
+    return synthetic_agg_trades(np.random.default_rng(0), START, END, 20_000)
+
+
+@pytest.fixture(scope="module")
+def quotes():
+    return make_quotes(np.random.default_rng(1), TICKER, START, END, 20_000)
+
+
+@pytest.mark.parametrize("step", [60_000, 5_000])
+def test_bars_match_pandas(trades, quotes, step):
+    quote_df, quote_msgs = quotes
+    agg = replay(list(trade_events(TICKER, trades)), quote_msgs, step, end_ms=END)
+    assert agg.late == 0
+    bars = bars_frame(agg)
+    compare(bars, reference_bars(trades, START, END, step))
+    # closing mid per bar, carried over bars without quotes
+    t = quote_df["T"].to_numpy()
+    mid = ((quote_df["b"] + quote_df["a"]) / 2).groupby(t - t % step).last()
+    mid = mid.reindex(bars.index).ffill()
+    np.testing.assert_allclose(bars["mid_close"], mid, rtol=1e-12)
+
+
+def test_late_trades_are_dropped(trades):
+    # trades arriving later than the grace period are counted, not merged
+    agg = replay(
+        list(trade_events(TICKER, trades)),
+        interval_ms=5_000,
+        trade_latency_ms=GRACE_MS + 5_000,
+        end_ms=END,
+    )
+    assert agg.late > 0
+
+
+def test_quote_only_bars(trades, quotes):
+    _, quote_msgs = quotes
+    # no trades in the first hour, quotes throughout
+    first_trade = START + 3600 * 1000
+    trades = trades[trades["transact_time"] >= first_trade]
+    agg = replay(list(trade_events(TICKER, trades)), quote_msgs, 60_000, end_ms=END)
+    bars = bars_frame(agg)
+    before = bars[bars.index < first_trade]
+    assert len(before) == 60
+    assert before["close"].isna().all() and before["mid_close"].notna().all()
+    assert (before["volume"] == 0).all()
+    compare(
+        bars[bars.index >= first_trade],
+        reference_bars(trades, first_trade, END, 60_000),
+    )
+
+    # KLineStore starts at the first bar with a trade price
+    store = KLineStore(N=1000, freq_ms=60_000, hedge_coin="BTC")
+    for bar in agg.listeners[0].bars:
+        store.on_event({"e": "kline", "timestamp": bar["open_time"], "data": dict(bar)})
+    df = store.get_dfs()["BTC"]
+    assert df["c"].notna().all()
+    assert df["T"].iloc[0] == first_trade
+
+
+RECORDED = ("BARS_TICKER", "BARS_DAY", "BARS_TRADE_ROOT", "BARS_OHLCV_ROOT")
+
+
+@pytest.mark.skipif(
+    not all(os.environ.get(k) for k in RECORDED),
+    reason="recorded aggTrades / klines: set " + ", ".join(RECORDED),
+)
+def test_recorded_bars_match_klines():
+    """1m bars from recorded aggTrades (TradeStore) against the exchange
+    klines of the same day (OHLCVStore)."""
+    ticker = os.environ["BARS_TICKER"]
+    exchange = os.environ.get("BARS_EXCHANGE", "binance_perps")
+    start = to_ms(os.environ["BARS_DAY"])
+    end = start + MS_PER_DAY
+    trades = TradeStore(os.environ["BARS_TRADE_ROOT"], exchange).read(
+        ticker, start, end
+    )
+    klines = OHLCVStore(os.environ["BARS_OHLCV_ROOT"], exchange, "1m").read_ticker(
+        ticker, start, end
+    )
+    assert trades is not None and klines is not None, "no recorded data"
+    agg = replay(list(trade_events(ticker, trades)), end_ms=end)
+    assert agg.late == 0
+    compare(bars_frame(agg), klines)
@@ -0,0 +1,167 @@
+import datetime as dt
+import functools
+import hashlib
+import io
+import os
+import threading
+import zipfile
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from botfed.backfill.binance_archive import archive_path, import_archives
+from botfed.backfill.ohlcv_store import OHLCVStore
+from botfed.backfill.synthetic import synthetic_agg_trades, synthetic_klines
+from botfed.backfill.trade_store import TradeStore
+
+KLINE_HEADER = (
+    "open_time,open,high,low,close,volume,close_time,quote_volume,count,"
+    "taker_buy_volume,taker_buy_quote_volume,ignore"
+)
+TRADE_HEADER = (
+    "agg_trade_id,price,quantity,first_trade_id,last_trade_id,transact_time,"
+    "is_buyer_maker"
+)
+
+
+def _write_zip(root, rel_path, csv_text):
+    fpath = os.path.join(root, rel_path)
+    os.makedirs(os.path.dirname(fpath), exist_ok=True)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(os.path.basename(fpath)[:-4] + ".csv", csv_text)
+    data = buf.getvalue()
+    with open(fpath, "wb") as f:
+        f.write(data)
+    with open(fpath + ".CHECKSUM", "w") as f:
+        f.write(f"{hashlib.sha256(data).hexdigest()}  {os.path.basename(fpath)}\n")
+
+
+def make_archive_tree(
+    root,
+    tickers,
+    months=("2024-01",),
+    days=("2024-02-01", "2024-02-02"),
+    market="perps",
+    interval="1m",
+    trades_per_day=1000,
+    seed=0,
+):
+    """Monthly archives for `months`, daily ones for `days`, both kinds.
+    Returns {(kind, ticker): DataFrame} of everything written."""
+    rng = np.random.default_rng(seed)
+    spot = market == "spot"
+    ts_mult = 1000 if spot else 1
+    written = {}
+    for ticker in tickers:
+        for kind in ("klines", "aggTrades"):
+            frames = []
+            next_id = 1
+            for period, dates in (("monthly", months), ("daily", days)):
+                for date in dates:
+                    start = pd.Timestamp(date + ("-01" if period == "monthly" else ""))
+                    end = start + (
+                        pd.offsets.MonthBegin(1)
+                        if period == "monthly"
+                        else pd.Timedelta(days=1)
+                    )
+                    start_ms = int(start.tz_localize("UTC").timestamp() * 1000)
+                    end_ms = int(end.tz_localize("UTC").timestamp() * 1000)
+                    if kind == "klines":
+                        df = synthetic_klines(rng, start_ms, end_ms, interval, ts_mult)
+                        header = KLINE_HEADER
+                    else:
+                        df = synthetic_agg_trades(
+                            rng, start_ms, end_ms, trades_per_day, ts_mult, next_id
+                        )
+                        next_id += len(df)
+                        header = TRADE_HEADER
+                    csv = df.to_csv(index=False, header=False)
+                    if not spot:
+                        csv = header + "\n" + csv
+                    rel = archive_path(market, kind, period, ticker, date, interval)
+                    _write_zip(root, rel, csv)
+                    frames.append(df)
+            written[(kind, ticker)] = pd.concat(frames, ignore_index=True)
+    return written
+
+
+def _check_store(written, store_root, market, tickers):
+    """Store contents against the generated archives."""
+    kstore = OHLCVStore(store_root, f"binance_{market}", "1m")
+    tstore = TradeStore(store_root, f"binance_{market}")
+    div = 1000 if market == "spot" else 1
+    for ticker in tickers:
+        klines = kstore.read_ticker(ticker)
+        ref = written[("klines", ticker)]
+        assert len(klines) == len(ref)
+        np.testing.assert_array_equal(klines["open_time"], ref["open_time"] // div)
+        np.testing.assert_allclose(klines["close"], ref["close"])
+        trades = tstore.read(ticker, "2000-01-01", "2100-01-01")
+        ref = written[("aggTrades", ticker)]
+        assert len(trades) == len(ref)
+        np.testing.assert_array_equal(
+            trades["transact_time"], ref["transact_time"] // div
+        )
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+TICKERS = ["BTCUSDT", "ETHUSDT"]
+SDATE, EDATE = dt.date(2024, 1, 1), dt.date(2024, 2, 2)
+
+
+@pytest.mark.parametrize("market", ["perps", "spot"])
+def test_local_import(tmp_path, market):
+    mirror = str(tmp_path / "mirror")
+    written = make_archive_tree(mirror, TICKERS, market=market)
+    store_root = str(tmp_path / "store")
+    for kind in ("klines", "aggTrades"):
+        summary = import_archives(
+            mirror, None, SDATE, EDATE, market, kind, store_root=store_root
+        )
+        n = sum(len(written[(kind, t)]) for t in TICKERS)
+        assert not summary["errors"] and summary["rows"] == n, summary
+        # rerun: everything is held by the store
+        again = import_archives(
+            mirror, None, SDATE, EDATE, market, kind, store_root=store_root
+        )
+        assert again["archives"] == 0 and again["skipped"] > 0, again
+    _check_store(written, store_root, market, TICKERS)
+
+
+@pytest.fixture
+def http_mirror(tmp_path):
+    """A perps tree served over HTTP, one archive corrupted."""
+    mirror = str(tmp_path / "mirror")
+    make_archive_tree(mirror, TICKERS)
+    bad = archive_path("perps", "klines", "daily", "ETHUSDT", "2024-02-02")
+    with open(os.path.join(mirror, bad), "r+b") as f:
+        f.seek(100)
+        f.write(b"\0\0\0\0")
+    handler = functools.partial(_QuietHandler, directory=mirror)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", bad
+    server.shutdown()
+
+
+def test_http_import_rejects_bad_checksum(tmp_path, http_mirror):
+    url, bad = http_mirror
+    summary = import_archives(
+        url,
+        TICKERS + ["NOPEUSDT"],
+        SDATE,
+        EDATE,
+        "perps",
+        "klines",
+        store_root=str(tmp_path / "store"),
+    )
+    assert summary["bad_checksum"] == [bad], summary
+    # one month + two days for NOPEUSDT
+    assert summary["not_found"] == 3, summary
@@ -0,0 +1,158 @@
+import asyncio
+import time
+
+import eth_account
+import pytest
+from hyperliquid.exchange import Exchange as SdkExchange
+from hyperliquid.utils.constants import MAINNET_API_URL
+
+from botfed.hyperliquid.cancel_pipeline import (
+    CancelPipeline,
+    NonceAllocator,
+    install_nonces,
+    raw_cloid,
+)
+from botfed.hyperliquid.exchange import Exchange
+from botfed.hyperliquid.oexec import HyperExec
+from botfed.hyperliquid.oexec_async import HyperExecAsync
+from botfed.hyperliquid.utils.signing import get_timestamp_ms
+
+OPEN_ORDERS = [
+    {"coin": "BTC", "oid": 1},
+    {"coin": "ETH", "oid": 2},
+    {"coin": "BTC", "oid": 3},
+]
+
+
+class FakeInfo:
+    def open_orders(self, address):
+        return OPEN_ORDERS
+
+
+class FakeExchange:
+    def __init__(self):
+        self.cancelled = []
+
+    def bulk_cancel(self, cancels):
+        self.cancelled.append(cancels)
+        return {"status": "ok"}
+
+
+class FakeAsyncExchange(FakeExchange):
+    async def bulk_cancel(self, cancels):
+        return FakeExchange.bulk_cancel(self, cancels)
+
+
+def bare(cls, exchange):
+    """An executor without the network setup and without the pipeline."""
+    ex = object.__new__(cls)
+    ex.ghost_mode = False
+    ex.cancels = None
+    ex.address = "0x0"
+    ex.info = FakeInfo()
+    ex.exchange = exchange
+    return ex
+
+
+def test_cancel_all_without_pipeline():
+    ex = bare(HyperExec, FakeExchange())
+    assert ex.process_order({"type": "cancel_all", "coins": ["BTC"]}) == {
+        "BTC": {"status": "ok"}
+    }
+    assert ex.exchange.cancelled == [
+        [{"coin": "BTC", "oid": 1}, {"coin": "BTC", "oid": 3}]
+    ]
+    # everything, in one signed action
+    assert set(ex.process_order({"type": "cancel_all"})) == {"BTC", "ETH"}
+    assert len(ex.exchange.cancelled[-1]) == 3
+    assert ex.process_order({"type": "cancel_all", "coins": ["SOL"]}) == {}
+
+
+def test_cancel_all_without_pipeline_async():
+    ex = bare(HyperExecAsync, FakeAsyncExchange())
+    out = asyncio.run(ex.process_order({"type": "cancel_all", "coins": ["ETH"]}))
+    assert out == {"ETH": {"status": "ok"}}
+    assert ex.exchange.cancelled == [[{"coin": "ETH", "oid": 2}]]
+
+
+def local_exchange():
+    """A local Exchange without the meta download, recording posted nonces."""
+    ex = object.__new__(Exchange)
+    ex.wallet = eth_account.Account.from_key("0x" + "01" * 32)
+    ex.vault_address = None
+    ex.base_url = MAINNET_API_URL
+    ex.coin_to_asset = {"BTC": 0}
+    ex.next_nonce = get_timestamp_ms
+    ex.posted = []
+    ex._post_action = lambda action, signature, nonce: ex.posted.append(nonce)
+    return ex
+
+
+def test_install_nonces_is_per_instance():
+    piped, other = local_exchange(), local_exchange()
+    nonces = NonceAllocator()
+    nonces.last = 10**15  # far ahead of the clock
+    install_nonces(piped, nonces)
+    for _ in range(3):
+        piped.bulk_cancel([{"coin": "BTC", "oid": 1}])
+        other.bulk_cancel([{"coin": "BTC", "oid": 1}])
+    assert piped.posted == [10**15 + 1, 10**15 + 2, 10**15 + 3]
+    assert all(nonce < 10**15 for nonce in other.posted)
+    assert nonces.used == 3
+
+
+def test_install_nonces_rejects_the_sdk_exchange():
+    with pytest.raises(TypeError):
+        install_nonces(object.__new__(SdkExchange), NonceAllocator())
+
+
+@pytest.fixture
+def pipeline():
+    wallet = eth_account.Account.from_key("0x" + "01" * 32)
+    pipe = CancelPipeline(wallet, {"BTC": 0, "ETH": 1})
+    yield pipe
+    pipe.close()
+
+
+def bulk_result(*statuses):
+    return {"status": "ok", "response": {"data": {"statuses": list(statuses)}}}
+
+
+def test_resting_set_follows_bulk_responses(pipeline):
+    orders = [{"coin": "BTC", "cloid": i} for i in (1, 2, 3)]
+    pipeline.on_bulk_response(
+        orders,
+        bulk_result(
+            {"resting": {"oid": 11}},
+            {"filled": {"oid": 12, "totalSz": "1", "avgPx": "1"}},
+            {"error": "Post only order would have immediately matched"},
+        ),
+    )
+    assert pipeline.resting["BTC"] == {raw_cloid(1)}
+    # a modify that crosses comes back filled, the cloid leaves the set
+    pipeline.on_bulk_response(orders[:1], bulk_result({"filled": {"oid": 11}}))
+    assert pipeline.resting["BTC"] == set()
+    assert pipeline.added_at == {}
+
+
+def test_order_updates_drop_terminal_orders(pipeline):
+    pipeline.add_resting("BTC", [1, 2])
+    pipeline.add_resting("ETH", [3])
+    pipeline.on_order_updates(
+        [
+            {"order": {"coin": "BTC", "cloid": raw_cloid(1)}, "status": "filled"},
+            {"order": {"coin": "BTC", "cloid": raw_cloid(2)}, "status": "open"},
+            {"order": {"coin": "ETH", "cloid": raw_cloid(3)}, "status": "canceled"},
+        ]
+    )
+    assert pipeline.resting == {"BTC": {raw_cloid(2)}, "ETH": set()}
+
+
+def test_resync_keeps_orders_newer_than_the_snapshot(pipeline):
+    pipeline.add_resting("BTC", [1, 2])
+    as_of = time.time() + 1e-3
+    pipeline.add_resting("BTC", [3])
+    pipeline.added_at[raw_cloid(3)] = as_of + 1
+    # 1 filled, 2 is still open, 3 was placed after the snapshot was taken
+    pipeline.resync([{"coin": "BTC", "oid": 12, "cloid": raw_cloid(2)}], as_of)
+    assert pipeline.resting["BTC"] == {raw_cloid(2), raw_cloid(3)}
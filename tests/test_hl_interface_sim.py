@@ -0,0 +1,57 @@
+import pytest
+
+from botfed.core import time
+from botfed.core.sim_latency import LatencyDist, LatencyModel
+from botfed.hyperliquid.hl_interface_sim import HLInterfaceSim
+from botfed.hyperliquid.sim_exchange import SimExchange
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(time, "sim", True)
+    time.set_time_ms(1_000)
+    return time
+
+
+def sim_exchange():
+    exch = object.__new__(SimExchange)
+    exch.mock_bids, exch.mock_asks = [], []
+    exch.listeners_order_resp = []
+    exch.oid = 0
+    return exch
+
+
+def order(cloid, price=1.0):
+    return {"coin": "BTC", "cloid": cloid, "side": "buy", "price": price, "qty": 1}
+
+
+def session(iface):
+    resps = []
+    iface.add_order_resp_listener(resps.append)
+    sent = [
+        iface.submit_orders({"type": "bulk", "orders": [order(1), order(2)]}),
+        iface.submit_modify({"type": "modify", "orders": [order(1, price=2.0)]}),
+        iface.cancel_orders({"type": "cancel", "orders": [order(2)]}),
+    ]
+    return sent, resps
+
+
+def test_zero_latency_delivers_through_listeners(clock):
+    sent, resps = session(HLInterfaceSim(sim_exchange()))
+    assert sent == [None, None, None]
+    assert len(resps) == 3
+
+
+def test_latency_delivers_the_same_responses(clock):
+    _, direct = session(HLInterfaceSim(sim_exchange()))
+    latency = LatencyModel(entry=LatencyDist.const(5), ack=LatencyDist.const(3))
+    iface = HLInterfaceSim(sim_exchange(), latency=latency)
+    sent, resps = session(iface)
+    assert sent == [None, None, None]
+    for ts in (1_004, 1_005, 1_007):
+        clock.set_time_ms(ts)
+        iface.events.run_until(ts)
+        assert resps == []
+    clock.set_time_ms(1_008)
+    iface.events.run_until(1_008)
+    assert resps == direct
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+import requests
+
+from botfed.core.http_client import HttpClient, RateBudget, RetryPolicy
+
+URL = "https://fapi.binance.com/fapi/v1/ping"
+RETRY = RetryPolicy(total=2, backoff_s=0)
+
+
+def response(status, headers=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers or {})
+    return resp
+
+
+class FakeSession:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def client(outcomes, weight_limits={}):
+    c = HttpClient(retry=RETRY, weight_limits=weight_limits)
+    c.session = FakeSession(outcomes)
+    return c
+
+
+@pytest.mark.parametrize("status", [418, 429, 500, 502, 503, 504])
+def test_retryable_status(status):
+    c = client([response(status), response(200)])
+    assert c.get(URL).status_code == 200
+    assert c.session.calls == 2
+
+
+@pytest.mark.parametrize("status", [400, 401, 404])
+def test_client_errors_are_not_retried(status):
+    c = client([response(status)])
+    assert c.get(URL).status_code == status
+    assert c.session.calls == 1
+
+
+def test_last_response_returned_when_retries_run_out():
+    c = client([response(503)] * 3)
+    assert c.get(URL).status_code == 503
+    assert c.session.calls == 3
+
+
+def test_connection_errors_retried_then_raised():
+    c = client([requests.ConnectionError("reset"), response(200)])
+    assert c.get(URL).status_code == 200
+    c = client([requests.ConnectionError("reset")] * 3)
+    with pytest.raises(requests.ConnectionError):
+        c.get(URL)
+    assert c.session.calls == 3
+
+
+def test_throttle_blocks_the_host_budget():
+    c = client([response(429, {"Retry-After": "7"})], {"fapi.binance.com": 2400})
+    c.request("GET", URL, retry=RetryPolicy(total=0))
+    blocked_s = c.budget("fapi.binance.com").blocked_until - time.time()
+    assert blocked_s == pytest.approx(7, abs=1)
+
+
+def test_weight_header_updates_budget():
+    c = client(
+        [response(200, {"X-MBX-USED-WEIGHT-1M": "1000"})], {"fapi.binance.com": 2400}
+    )
+    c.get(URL)
+    assert c.budget("fapi.binance.com").used == 1000
+
+
+def test_budget_remaining_respects_headroom():
+    budget = RateBudget(100, headroom=0.5)
+    budget.acquire(20)
+    assert budget.remaining() == 30
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from botfed.core.kline import KLineStore
+
+FREQ_MS = 10_000
+N_BARS = 2000
+WINDOW = 500
+COINS = ["ETH"] + [f"C{i}" for i in range(9)]
+KWARGS = dict(N=N_BARS, freq_ms=FREQ_MS, sig_window=WINDOW, beta_window=WINDOW)
+
+
+def reference_stats(store: KLineStore):
+    dfs = store.get_dfs()
+    sigmas, betas = {}, {}
+    rets = {}
+    for coin, df in dfs.items():
+        df["r"] = np.log(1 + df["c"].pct_change())
+        sigmas[coin] = df["r"].rolling(store.sig_window).std().iloc[-1]
+        rets[coin] = df.set_index(df["T"] // store.freq_ms)["r"].dropna()
+    hedge = rets[store.hedge_coin]
+    for coin, r in rets.items():
+        if coin == store.hedge_coin:
+            continue
+        pairs = pd.concat([hedge, r], axis=1, join="inner").tail(store.beta_window)
+        x, y = pairs.iloc[:, 0], pairs.iloc[:, 1]
+        betas[coin] = x.cov(y) / x.var()
+    return sigmas, betas
+
+
+def make_events(coins, n_bars, freq_ms, seed=0, skip=0.05):
+    """Interleaved kline events; each coin misses ~skip of the slots and
+    arrives at a random offset within the slot."""
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 1e-3, n_bars)
+    events = []
+    for k, coin in enumerate(coins):
+        beta = 0.5 + k / len(coins)
+        r = beta * market + rng.normal(0, 1e-3, n_bars)
+        close = 100 * np.exp(np.cumsum(r))
+        keep = rng.random(n_bars) >= skip
+        offset = rng.integers(1, freq_ms // 2, n_bars)
+        for i in np.nonzero(keep)[0]:
+            events.append(
+                {
+                    "e": "kline",
+                    "timestamp": int((i + 1) * freq_ms + offset[i]),
+                    "data": {
+                        "exch": "bin",
+                        "coin": coin,
+                        "open": close[i - 1] if i else close[i],
+                        "close": close[i],
+                        "high": close[i] * 1.001,
+                        "low": close[i] * 0.999,
+                        "volume": 1.0,
+                    },
+                }
+            )
+    events.sort(key=lambda e: e["timestamp"])
+    return events
+
+
+def assert_matches(store, ref=None, tol=1e-8):
+    """ref: store holding the full history, when store's rings have wrapped
+    (the beta window runs over pairs that may be older than the ring)."""
+    store.compute_stats()
+    ref_sig, ref_beta = reference_stats(ref or store)
+    for coin, sig in ref_sig.items():
+        got = store.sigmas[coin]
+        if np.isnan(sig):
+            assert np.isnan(got), coin
+        else:
+            assert got == pytest.approx(sig, abs=tol), coin
+    for coin, beta in ref_beta.items():
+        got = store.betas[coin][store.hedge_coin]
+        assert got == pytest.approx(beta, abs=tol), coin
+
+
+@pytest.fixture(scope="module")
+def events():
+    return make_events(COINS, N_BARS, FREQ_MS)
+
+
+@pytest.fixture(scope="module")
+def streamed(events):
+    store = KLineStore(**KWARGS)
+    for event in events:
+        store.on_event(event)
+    return store
+
+
+def test_streaming_matches_pandas(streamed):
+    assert_matches(streamed)
+
+
+def test_bulk_load_matches_pandas(streamed):
+    bulk = KLineStore(**KWARGS)
+    for coin, df in streamed.get_dfs().items():
+        bulk.load_arrays(
+            coin,
+            df["T"].to_numpy(np.int64),
+            df["o"],
+            df["h"],
+            df["l"],
+            df["c"],
+            df["v"],
+        )
+    assert_matches(bulk)
+
+
+def test_wrapped_rings_match_full_history(events, streamed):
+    small = KLineStore(**{**KWARGS, "N": WINDOW + WINDOW // 2})
+    for event in events:
+        small.on_event(event)
+    assert_matches(small, ref=streamed)
@@ -0,0 +1,71 @@
+import datetime as dt
+
+from botfed.backfill.binance_common import ticker_outpath
+from botfed.backfill.kline_engine import PERPS_MAX_LIMIT, SPOT_MAX_LIMIT, KlineBackfill
+from botfed.backfill.kline_standin import KlineStandIn
+from botfed.core.http_client import HttpClient, RateBudget, RetryPolicy
+
+WEIGHT_LIMIT = 40
+WINDOW_S = 1
+TICKERS = [f"T{i}USDT" for i in range(4)]
+DAYS = 3
+
+
+def backfill(tmp_path, client_limit, headroom, spot=False):
+    standin = KlineStandIn(WEIGHT_LIMIT, WINDOW_S, latency_ms=5).start()
+    client = HttpClient(weight_limits={})
+    client.budgets[standin.host] = RateBudget(client_limit, headroom, WINDOW_S)
+    sdate = dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc)
+    partitions = [
+        (t, day, ticker_outpath(t, day, str(tmp_path)))
+        for t in TICKERS
+        for day in (sdate + dt.timedelta(days=d) for d in range(DAYS))
+    ]
+    engine = KlineBackfill(
+        "1m",
+        url=standin.base_url + ("/api/v3/klines" if spot else "/fapi/v1/klines"),
+        max_limit=SPOT_MAX_LIMIT if spot else PERPS_MAX_LIMIT,
+        max_in_flight=8,
+        client=client,
+        spot=spot,
+        retry=RetryPolicy(backoff_s=0.1, backoff_max_s=1),
+    )
+    try:
+        summary = engine.run(partitions, dt.timedelta(days=1))
+    finally:
+        standin.close()
+    return summary, standin.summary()
+
+
+def test_stays_within_the_server_limit(tmp_path):
+    summary, server = backfill(tmp_path, WEIGHT_LIMIT, 0.9)
+    assert summary["failed_pages"] == 0
+    assert summary["partitions"] == len(TICKERS) * DAYS
+    assert summary["klines"] == len(TICKERS) * DAYS * 1440
+    assert server["n_429"] == server["n_418"] == 0
+    assert server["peak_window_weight"] <= WEIGHT_LIMIT
+
+
+def test_recovers_from_throttling(tmp_path):
+    # the client thinks it has twice the weight the server allows
+    summary, server = backfill(tmp_path, 2 * WEIGHT_LIMIT, 1.0)
+    assert server["n_429"] > 0
+    assert summary["throttled"] > 0
+    assert summary["failed_pages"] == 0
+    assert summary["partitions"] == len(TICKERS) * DAYS
+    assert server["peak_window_weight"] <= WEIGHT_LIMIT
+
+
+def test_spot_weight_model(tmp_path):
+    summary, server = backfill(tmp_path, WEIGHT_LIMIT, 0.9, spot=True)
+    assert summary["failed_pages"] == 0
+    assert summary["klines"] == len(TICKERS) * DAYS * 1440
+    # a spot 1m day is two pages of 720 at weight 2
+    assert summary["weight"] == len(TICKERS) * DAYS * 2 * 2
+    assert server["n_429"] == 0
+    assert server["peak_window_weight"] <= WEIGHT_LIMIT
+
+
+def test_spot_is_explicit():
+    assert KlineBackfill(spot=True).weight(1000) == 2
+    assert KlineBackfill(max_limit=1000).weight(1000) == 5
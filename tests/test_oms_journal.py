@@ -0,0 +1,68 @@
+import os
+
+from botfed.core.oms_journal import (
+    ORDER_REMOVE,
+    ORDER_UPSERT,
+    POSITIONS,
+    OMSJournal,
+    encode_record,
+    recover,
+)
+
+
+def write_segment(journal_dir, seq, records):
+    fpath = os.path.join(journal_dir, f"journal-{seq:08d}.bin")
+    with open(fpath, "wb") as f:
+        for kind, payload in records:
+            f.write(encode_record(kind, payload, ts=1.0))
+    return fpath
+
+
+def test_round_trip(tmp_path):
+    journal = OMSJournal(str(tmp_path), snapshot_every_s=3600)
+    journal.order_upsert("a", {"coin": "BTC", "status": "open"})
+    journal.order_upsert("b", {"coin": "ETH", "status": "open"})
+    journal.order_remove("a")
+    journal.positions({"BTC": 1.5})
+    journal.close()
+    state = recover(str(tmp_path))
+    assert state["orders"] == {"b": {"coin": "ETH", "status": "open", "cloid": "b"}}
+    assert state["positions"] == {"BTC": 1.5}
+    # a new journal starts from what the last one left
+    assert OMSJournal(str(tmp_path)).recovered == state
+
+
+def test_recovery_stops_at_torn_tail(tmp_path):
+    fpath = write_segment(
+        str(tmp_path),
+        1,
+        [
+            (ORDER_UPSERT, {"cloid": "a", "status": "open"}),
+            (POSITIONS, {"BTC": 1.0}),
+            (ORDER_REMOVE, "a"),
+        ],
+    )
+    # the last record was only half written
+    size = os.path.getsize(fpath)
+    with open(fpath, "r+b") as f:
+        f.truncate(size - 3)
+    state = recover(str(tmp_path))
+    assert state["orders"] == {"a": {"cloid": "a", "status": "open"}}
+    assert state["positions"] == {"BTC": 1.0}
+
+
+def test_recovery_stops_at_corrupt_record(tmp_path):
+    fpath = write_segment(
+        str(tmp_path),
+        1,
+        [
+            (POSITIONS, {"BTC": 1.0}),
+            (POSITIONS, {"BTC": 2.0}),
+        ],
+    )
+    with open(fpath, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+    assert recover(str(tmp_path))["positions"] == {"BTC": 1.0}
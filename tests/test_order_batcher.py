@@ -0,0 +1,138 @@
+import pytest
+
+from botfed.binance import oms as bin_oms
+from botfed.core import time
+from botfed.core.event_loop import EventLoop
+from botfed.core.order_batcher import OrderBatcher
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(time, "sim", True)
+    time.set_time_ms(1_000)
+    return time
+
+
+def new(cloid, price=1.0, qty=1.0):
+    return {"cloid": cloid, "coin": "BTC", "side": "buy", "price": price, "qty": qty}
+
+
+def batcher(window_ms=10, **kwargs):
+    sent, annulled = [], []
+    b = OrderBatcher(sent.append, window_ms, on_annulled=annulled.extend, **kwargs)
+    return b, sent, annulled
+
+
+def test_window_coalesces_into_one_message(clock):
+    b, sent, _ = batcher()
+    b.add("bulk", "bin", [new("a")])
+    b.add("bulk", "bin", [new("b")])
+    b.run_ticks()
+    assert sent == []
+    clock.set_time_ms(1_010)
+    b.run_ticks()
+    assert len(sent) == 1
+    assert [o["cloid"] for o in sent[0]["orders"]] == ["a", "b"]
+    assert b.stats()["requests"] == 1
+
+
+def test_chunks_to_max_batch_cancels_first(clock):
+    b, sent, _ = batcher()
+    b.add("bulk", "bin", [new(i) for i in range(7)])
+    b.add("cancel", "bin", [new("x")])
+    b.flush()
+    assert [(m["type"], len(m["orders"])) for m in sent] == [
+        ("cancel", 1),
+        ("bulk", 5),
+        ("bulk", 2),
+    ]
+
+
+def test_new_then_cancel_annuls_both(clock):
+    b, sent, annulled = batcher()
+    b.add("bulk", "bin", [new("a")])
+    b.add("cancel", "bin", [new("a")])
+    b.flush()
+    assert sent == []
+    assert [o["cloid"] for o in annulled] == ["a"]
+    assert b.stats()["annulled"] == 2
+
+
+def test_new_then_modify_sends_modified_new(clock):
+    b, sent, _ = batcher()
+    b.add("bulk", "bin", [new("a", price=1.0)])
+    b.add("modify", "bin", [new("a", price=2.0)])
+    b.flush()
+    assert [(m["type"], m["orders"]) for m in sent] == [("bulk", [new("a", price=2.0)])]
+
+
+def test_modify_chains_resolve_to_last_intent(clock):
+    b, sent, _ = batcher()
+    b.add("modify", "bin", [new("a", price=2.0)])
+    b.add("modify", "bin", [new("a", price=3.0)])
+    b.flush()
+    assert [o["price"] for o in sent[0]["orders"]] == [3.0]
+    b.add("modify", "bin", [new("b")])
+    b.add("cancel", "bin", [new("b")])
+    b.add("modify", "bin", [new("b")])
+    b.flush()
+    assert [m["type"] for m in sent[1:]] == ["cancel"]
+
+
+def test_zero_window_flushes_on_add(clock):
+    b, sent, _ = batcher(window_ms=0)
+    b.add("bulk", "bin", [new("a")])
+    assert len(sent) == 1
+
+
+def test_exchanges_do_not_coalesce(clock):
+    b, sent, annulled = batcher()
+    b.add("bulk", "bin", [new("a")])
+    b.add("cancel", "hl", [new("a")])
+    b.flush()
+    assert sorted((m["exchange"], m["type"]) for m in sent) == [
+        ("bin", "bulk"),
+        ("hl", "cancel"),
+    ]
+    assert annulled == []
+
+
+def test_new_order_dedupes_across_groups(clock):
+    b, sent, _ = batcher()
+    b.add("bulk", "bin", [new("a", price=1.0)])
+    b.add("bulk", "bin", [new("a", price=2.0)], extra={"tif": "Ioc"})
+    b.flush()
+    assert [(m.get("tif"), m["orders"]) for m in sent] == [
+        ("Ioc", [new("a", price=2.0)])
+    ]
+
+
+def test_new_order_on_live_cloid_is_dropped(clock):
+    b, sent, annulled = batcher()
+    b.add("cancel", "bin", [new("a")])
+    b.add("bulk", "bin", [new("a")])
+    b.flush()
+    assert [m["type"] for m in sent] == ["cancel"]
+    assert annulled == []
+
+
+class FakeTradeClient:
+    def __init__(self):
+        self.sent = []
+
+    def submit(self, data):
+        self.sent.append(data)
+
+    def add_listener(self, listener):
+        pass
+
+
+def test_bin_oms_needs_an_event_loop_to_batch(monkeypatch):
+    monkeypatch.setattr(bin_oms, "get_instruments", lambda exchange: None)
+    with pytest.raises(ValueError):
+        bin_oms.BinOMS(FakeTradeClient(), None, journal_dir=None, batch_window_ms=5)
+    loop = EventLoop()
+    oms = bin_oms.BinOMS(
+        FakeTradeClient(), None, journal_dir=None, batch_window_ms=5, event_loop=loop
+    )
+    assert loop.feeds == [oms.batcher]
@@ -0,0 +1,79 @@
+from botfed.core.order_store import OrderStore
+
+
+def order(coin="BTC", status="open", oid=None, **fields):
+    return {"coin": coin, "status": status, "oid": oid, "side": "buy", **fields}
+
+
+def test_set_fields_reindexes():
+    store = OrderStore()
+    store["a"] = order(oid=1)
+    store["b"] = order(coin="ETH")
+    store.set_fields("a", status="filled", oid=2)
+    assert store.get_orders("BTC", ["open"]) == []
+    assert store.get_orders("BTC", ["filled"]) == [store["a"]]
+    assert store.get_by_oid(1) is None
+    assert store.get_by_oid(2) is store["a"]
+    assert store.status_counts() == {"filled": 1, "open": 1}
+
+
+def test_reassign_and_delete_reindex():
+    store = OrderStore()
+    store["a"] = order(oid=1)
+    store["a"] = order(coin="ETH", oid=1)
+    assert store.get_orders("BTC", ["open"]) == []
+    assert store.get_orders("ETH", ["open"]) == [store["a"]]
+    del store["a"]
+    assert store.get_by_oid(1) is None
+    assert store.get_orders("ETH", ["open"]) == []
+    assert store.status_counts() == {}
+
+
+def test_untracked_fields_mutate_in_place():
+    store = OrderStore()
+    store["a"] = order(price=1.0)
+    store["a"]["price"] = 2.0
+    assert store.get_orders("BTC", ["open"])[0]["price"] == 2.0
+
+
+def test_reconcile_diffs_against_snapshot():
+    store = OrderStore()
+    store["keep"] = order(oid=1, qty=1, created_at=5)
+    store["change"] = order(oid=2, qty=1, created_at=6)
+    store["gone"] = order(oid=3, qty=1)
+    snapshot = {
+        "keep": order(oid=1, qty=1),
+        "change": order(status="partially_filled", oid=2, qty=1),
+        "new": order(coin="ETH", oid=4, qty=1),
+    }
+    assert store.reconcile(snapshot) == (1, 1, 1)
+    assert set(store) == {"keep", "change", "new"}
+    assert store.get_by_oid(3) is None
+    assert store.get_orders("BTC", ["partially_filled"]) == [store["change"]]
+    # locally known fields survive the snapshot
+    assert store["change"]["created_at"] == 6
+    assert store.status_counts() == {"open": 2, "partially_filled": 1}
+
+
+class FakeJournal:
+    def __init__(self):
+        self.events = []
+
+    def order_upsert(self, cloid, order):
+        self.events.append(("upsert", cloid, order["status"]))
+
+    def order_remove(self, cloid):
+        self.events.append(("remove", cloid))
+
+
+def test_journal_sees_every_change():
+    journal = FakeJournal()
+    store = OrderStore(journal)
+    store["a"] = order()
+    store.set_fields("a", status="filled")
+    del store["a"]
+    assert journal.events == [
+        ("upsert", "a", "open"),
+        ("upsert", "a", "filled"),
+        ("remove", "a"),
+    ]
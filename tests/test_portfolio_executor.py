@@ -0,0 +1,47 @@
+import threading
+import time
+
+from botfed.binance.portfolio_executor import PortfolioExecutor
+
+
+class FakeOMS:
+    """Records market orders and fails if two calls ever overlap."""
+
+    ready = True
+
+    def __init__(self, positions):
+        self.positions = positions
+        self.orders = []
+        self.busy = threading.Lock()
+        self.overlaps = 0
+
+    def get_position(self, coin):
+        return {"qty": self.positions.get(coin, 0)}
+
+    def equity(self):
+        return 1e6
+
+    def submit_market_order(self, coin, qty, side, price=None):
+        if not self.busy.acquire(blocking=False):
+            self.overlaps += 1
+            return
+        try:
+            time.sleep(0.001)
+            self.orders.append((coin, qty, side))
+        finally:
+            self.busy.release()
+
+
+def test_orders_go_to_the_oms_one_at_a_time():
+    coins = [f"C{i}" for i in range(40)]
+    oms = FakeOMS({coin: 1.0 for coin in coins})
+    ex = PortfolioExecutor(oms)
+    ex.get_prices = lambda coins: {coin: 100.0 for coin in coins}
+    ex.execute({coin: 2.0 if i % 2 else 0.0 for i, coin in enumerate(coins)})
+    ex.queue.pool.shutdown(wait=True)
+    assert oms.overlaps == 0
+    # submitted in plan order
+    assert [coin for coin, _, _ in oms.orders] == coins
+    assert {side for _, _, side in oms.orders[1::2]} == {"buy"}
+    assert {side for _, _, side in oms.orders[::2]} == {"sell"}
+    assert ex.last_plan()["pending_submit"] == 0
@@ -0,0 +1,47 @@
+from concurrent.futures import Future
+
+import pycurl
+import pytest
+
+from botfed.hyperliquid.sdk_api_curl import CurlTransport, _settle
+
+# TEST-NET-1, never answers
+BLACKHOLE = "http://192.0.2.1/info"
+
+
+def test_close_fails_requests_in_flight():
+    transport = CurlTransport(timeout_ms=30_000)
+    futs = [transport.post(BLACKHOLE, b"{}") for _ in range(3)]
+    # one the caller gave up on
+    futs[0].cancel()
+    transport.close()
+    assert not transport.thread.is_alive()
+    for fut in futs[1:]:
+        with pytest.raises(pycurl.error):
+            fut.result(timeout=1)
+
+
+def test_post_after_close_fails_at_once():
+    transport = CurlTransport()
+    transport.close()
+    with pytest.raises(pycurl.error):
+        transport.post(BLACKHOLE, b"{}").result(timeout=0)
+
+
+def test_requests_queued_at_stop_are_failed():
+    transport = CurlTransport()
+    transport.close()
+    fut = Future()
+    # queued just before the stop, the exiting transport loop fails it
+    transport.pending.append((BLACKHOLE, b"{}", 1000, fut))
+    transport._run()
+    with pytest.raises(pycurl.error):
+        fut.result(timeout=0)
+
+
+def test_settle_skips_cancelled_futures():
+    fut = Future()
+    fut.cancel()
+    _settle(fut, (200, "{}"))
+    _settle(fut, error=pycurl.error("late"))
+    assert fut.cancelled()
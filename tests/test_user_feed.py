@@ -0,0 +1,43 @@
+import threading
+import time
+
+from botfed.binance.user_feed import UserFeed
+
+
+def feed(last_reconcile, snapshot_every_s=60):
+    f = object.__new__(UserFeed)
+    f.stop_event = threading.Event()
+    f.reconcile_needed = threading.Event()
+    f.min_reconcile_s = 5
+    f.snapshot_every_s = snapshot_every_s
+    f.last_reconcile = last_reconcile
+    f.listen_key = None
+    f.snapshots = 0
+
+    def fetch_initial_data():
+        f.snapshots += 1
+        f.stop_event.set()
+
+    f.fetch_initial_data = fetch_initial_data
+    return f
+
+
+def maintain(f, timeout_s=1.5):
+    t = threading.Thread(target=f._maintain, daemon=True)
+    t.start()
+    t.join(timeout_s)
+    f.stop_event.set()
+    t.join()
+    return f.snapshots
+
+
+def test_periodic_snapshot():
+    assert maintain(feed(time.time() - 61)) == 1
+
+
+def test_no_snapshot_before_due():
+    assert maintain(feed(time.time() - 10)) == 0
+
+
+def test_periodic_snapshot_disabled():
+    assert maintain(feed(time.time() - 61, snapshot_every_s=None)) == 0
@@ -0,0 +1,87 @@
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from botfed.hyperliquid.websocket_manager import (
+    PostError,
+    WebsocketManager,
+    _settle,
+)
+
+
+class FakeWs:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, msg):
+        self.sent.append(msg)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def manager():
+    """The post machinery only, no connection."""
+    ws = object.__new__(WebsocketManager)
+    ws.ws = FakeWs()
+    ws.post_id = 0
+    ws.post_timeout_s = 0.05
+    ws.post_lock = threading.Lock()
+    ws.pending_posts = {}
+    ws.closed = threading.Event()
+    ws.stop_event = threading.Event()
+    ws.post_reaper = threading.Thread(target=ws._expire_posts, daemon=True)
+    ws.post_reaper.start()
+    yield ws
+    ws.closed.set()
+
+
+def info_response(post_id, data):
+    return {"id": post_id, "response": {"type": "info", "payload": {"data": data}}}
+
+
+def test_post_resolves_by_id(manager):
+    a = manager.post_info({"type": "meta"}, timeout_s=5)
+    b = manager.post_info({"type": "allMids"}, timeout_s=5)
+    manager._resolve_post(info_response(2, "mids"))
+    manager._resolve_post(info_response(1, "meta"))
+    assert (a.result(1), b.result(1)) == ("meta", "mids")
+
+
+def test_late_response_after_timeout(manager):
+    fut = manager.post_info({"type": "meta"})
+    with pytest.raises(PostError):
+        fut.result(2)
+    # the entry is gone, a late answer is ignored
+    manager._resolve_post(info_response(1, "late"))
+    assert isinstance(fut.exception(), PostError)
+
+
+def test_caller_cancelled_future(manager):
+    fut = manager.post_info({"type": "meta"}, timeout_s=5)
+    assert fut.cancel()
+    manager._resolve_post(info_response(1, "meta"))
+    other = manager.post_info({"type": "meta"}, timeout_s=5)
+    assert other.cancel()
+    manager._fail_all_posts("connection closed")
+    assert manager.pending_posts == {}
+
+
+def test_close_stops_the_reaper_and_fails_posts(manager):
+    fut = manager.post_info({"type": "meta"}, timeout_s=60)
+    manager.close()
+    with pytest.raises(PostError):
+        fut.result(1)
+    manager.post_reaper.join(1)
+    assert not manager.post_reaper.is_alive()
+    assert manager.stop_event.is_set()
+
+
+def test_settle_ignores_resolved_futures():
+    fut = Future()
+    fut.set_result(1)
+    _settle(fut, 2)
+    _settle(fut, error=PostError("x"))
+    assert fut.result() == 1
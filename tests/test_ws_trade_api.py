@@ -0,0 +1,111 @@
+from concurrent.futures import Future
+
+import pytest
+
+from botfed.binance.ws_trade_api import (
+    BinWsTradeClient,
+    _num,
+    local_order_to_ws_request,
+)
+
+ORDER = {"coin": "BTCUSDT", "side": "buy", "qty": 0.001, "price": 0.1 + 0.2}
+
+
+@pytest.mark.parametrize(
+    "x, wire",
+    [
+        (1e-05, "0.00001"),
+        (0.1 + 0.2, "0.3"),
+        (100.0, "100"),
+        (12345.678, "12345.678"),
+        (3, "3"),
+        ("0.5", "0.5"),
+    ],
+)
+def test_num(x, wire):
+    assert _num(x) == wire
+
+
+def test_bulk_is_post_only_limit():
+    method, params = local_order_to_ws_request("bulk", {**ORDER, "cloid": "c1"})
+    assert method == "order.place"
+    assert params == {
+        "symbol": "BTCUSDT",
+        "side": "BUY",
+        "type": "LIMIT",
+        "timeInForce": "GTX",
+        "quantity": "0.001",
+        "price": "0.3",
+        "newClientOrderId": "c1",
+    }
+
+
+def test_bulk_without_cloid():
+    _, params = local_order_to_ws_request("bulk", ORDER)
+    assert "newClientOrderId" not in params
+
+
+def test_market_cancel_modify():
+    assert local_order_to_ws_request("market", {**ORDER, "side": "sell"}) == (
+        "order.place",
+        {"symbol": "BTCUSDT", "side": "SELL", "type": "MARKET", "quantity": "0.001"},
+    )
+    assert local_order_to_ws_request("cancel", {**ORDER, "cloid": "c1"}) == (
+        "order.cancel",
+        {"symbol": "BTCUSDT", "origClientOrderId": "c1"},
+    )
+    method, params = local_order_to_ws_request("modify", {**ORDER, "cloid": "c1"})
+    assert method == "order.modify"
+    assert params["origClientOrderId"] == "c1"
+    assert (params["quantity"], params["price"]) == ("0.001", "0.3")
+
+
+def test_unknown_type():
+    with pytest.raises(ValueError):
+        local_order_to_ws_request("stop", ORDER)
+
+
+class FlakyClient:
+    """Order client whose connection drops after n_ok sends."""
+
+    def __init__(self, n_ok):
+        self.n_ok = n_ok
+        self.futs = []
+
+    def request(self, method, params):
+        if len(self.futs) == self.n_ok:
+            raise ConnectionError("ws order connection lost")
+        fut = Future()
+        fut.params = params
+        self.futs.append(fut)
+        return fut
+
+
+def submit(n_ok, n_orders=3):
+    client = FlakyClient(n_ok)
+    tc = BinWsTradeClient(client)
+    msgs = []
+    tc.add_listener(msgs.append)
+    orders = [{**ORDER, "cloid": f"c{i}"} for i in range(n_orders)]
+    tc.submit({"type": "bulk", "exchange": "bin", "orders": orders})
+    return client, msgs
+
+
+def test_partial_send_drops_only_unsent():
+    client, msgs = submit(n_ok=2)
+    assert len(msgs) == 1
+    assert msgs[0]["resp"] == "dropped"
+    assert [o["cloid"] for o in msgs[0]["order"]["orders"]] == ["c2"]
+    for fut in client.futs:
+        fut.set_result(
+            {"clientOrderId": fut.params["newClientOrderId"], "status": "NEW"}
+        )
+    assert len(msgs) == 2
+    assert [o["cloid"] for o in msgs[1]["orders"]] == ["c0", "c1"]
+    assert [r["cloid"] for r in msgs[1]["resp"]] == ["c0", "c1"]
+
+
+def test_nothing_sent_drops_all():
+    _, msgs = submit(n_ok=0)
+    assert [m["resp"] for m in msgs] == ["dropped"]
+    assert len(msgs[0]["order"]["orders"]) == 3